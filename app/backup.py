@@ -1,37 +1,150 @@
 import os
+import copy
+import math
+import shutil
 import subprocess
 import gzip
-import shutil
-from datetime import datetime
-from typing import Optional, List
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, Optional, List, Tuple
 import psycopg2
+from psycopg2 import sql
+from psycopg2.extensions import ISOLATION_LEVEL_REPEATABLE_READ
 from alembic import command
 from alembic.config import Config as AlembicConfig
-from .models import BackupInfo, BackupStatus, DatabaseConfig, BackupConfig
+from .models import BackupInfo, BackupStatus, DatabaseConfig, BackupConfig, RetentionPreview
 import json
 import asyncio
+from .compression import open_codec
+from .coordinator import Operation, coordinator
+from .dump_errors import RETRYABLE_DUMP_ERRORS, DumpError, backoff_delay, classify_dump_error
+from .jobs import catalog_key, catalog_locks
+from .encryption import EncryptingWriter, EncryptionError, key_id, load_encryption_key
+from .metrics import PhaseTimer, catalog_collector, record_failure, record_transfer
+from .profiling import RunProfiler
+from .replica import BackupSource, dump_host, select_backup_source, wait_for_replica
+from .retention import plan_retention, prune_backups, schedule_prune
+from .sql_filter import STREAM_CHUNK_SIZE
+from .storage import LocalStorage, StorageBackend, create_storage
+from .throttle import BACKUP_APPLICATION_NAME, ThrottledWriter, io_throttle
+
+
+DUMP_ENGINES = ("pg_dump", "parallel_copy")
+PARALLEL_MANIFEST = "manifest.json"
+PARALLEL_SCHEMA_PRE = "schema_pre.sql"
+PARALLEL_SCHEMA_POST = "schema_post.sql"
+PARALLEL_SEQUENCES = "sequences.sql"
+STORAGE_LAYOUTS = ("flat", "date")
+BACKUP_ID_FORMAT = '%Y%m%d_%H%M%S'
+
+# 备份目录键 -> 已预留但信息文件可能尚未写入的备份ID（进行中的备份和导入）
+_reserved_backup_ids: Dict[str, set] = {}
+
+
+def backup_partition(backup_id: str) -> Optional[Tuple[str, str, str]]:
+    """由备份ID（%Y%m%d_%H%M%S）得到日期分区 (YYYY, MM, DD)，ID不符合格式时返回None"""
+    if len(backup_id) >= 8 and backup_id[:8].isdigit():
+        return backup_id[:4], backup_id[4:6], backup_id[6:8]
+    return None
+
+
+class CountingWriter:
+    """统计写入字节数的文件包装器"""
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.bytes_written = 0
+    
+    def write(self, data):
+        self.bytes_written += len(data)
+        return self.fileobj.write(data)
 
 
 class BackupManager:
     def __init__(self, db_config: DatabaseConfig, backup_config: BackupConfig):
         self.db_config = db_config
         self.backup_config = backup_config
+        self.object_storage: Optional[StorageBackend] = None
         self.ensure_backup_directory()
     
     def ensure_backup_directory(self):
         """确保备份目录存在"""
         os.makedirs(self.backup_config.storage_path, exist_ok=True)
     
+    def connect_database(self, for_dump: bool = False):
+        """创建数据库连接，for_dump为真时按导出配置设置lock_timeout和statement_timeout"""
+        return psycopg2.connect(
+            host=self.db_config.host,
+            port=self.db_config.port,
+            database=self.db_config.database,
+            user=self.db_config.username,
+            password=self.db_config.password,
+            application_name=BACKUP_APPLICATION_NAME,
+            options=self.get_dump_session_options() if for_dump else None
+        )
+    
+    def get_dump_session_options(self) -> Optional[str]:
+        """导出连接的会话参数，未配置超时时返回None"""
+        options = []
+        if self.backup_config.dump_lock_wait_timeout_s > 0:
+            options.append(f"-c lock_timeout={self.backup_config.dump_lock_wait_timeout_s * 1000}")
+        if self.backup_config.dump_statement_timeout_s > 0:
+            options.append(f"-c statement_timeout={self.backup_config.dump_statement_timeout_s * 1000}")
+        return " ".join(options) or None
+    
+    def build_pg_dump_command(self, *extra_args: str) -> List[str]:
+        """构建pg_dump基础命令（按限速配置加上nice/ionice前缀，配置了锁等待时间时加上 --lock-wait-timeout）"""
+        lock_wait = self.backup_config.dump_lock_wait_timeout_s
+        return io_throttle.command_prefix() + [
+            'pg_dump',
+            f'--host={self.db_config.host}',
+            f'--port={self.db_config.port}',
+            f'--username={self.db_config.username}',
+            f'--dbname={self.db_config.database}',
+            *([f'--lock-wait-timeout={lock_wait * 1000}'] if lock_wait > 0 else []),
+            *extra_args
+        ]
+    
+    def get_dump_deadline(self) -> Optional[float]:
+        """pg_dump进程的运行截止时间（单调时钟），未配置运行时间上限时返回None
+        
+        pg_dump会在自己的会话中把statement_timeout设为0，因此以进程运行时间作为上限。
+        """
+        limit = self.backup_config.dump_statement_timeout_s
+        return time.monotonic() + limit if limit > 0 else None
+    
+    def dump_timeout_error(self) -> DumpError:
+        return DumpError(f"备份失败: pg_dump 运行超过 {self.backup_config.dump_statement_timeout_s} 秒", "statement_timeout")
+    
+    async def wait_dump_process(self, process, deadline: Optional[float]) -> Tuple[bytes, bytes]:
+        """等待pg_dump结束并读取全部输出，超过运行时间上限时终止进程"""
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise self.dump_timeout_error()
+    
+    async def read_dump_chunk(self, process, deadline: Optional[float]) -> bytes:
+        """读取pg_dump的下一块输出，超过运行时间上限时抛出DumpError（由调用方终止进程）"""
+        timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        try:
+            return await asyncio.wait_for(process.stdout.read(STREAM_CHUNK_SIZE), timeout)
+        except asyncio.TimeoutError:
+            raise self.dump_timeout_error()
+    
+    def get_pg_env(self) -> dict:
+        """获取带密码的子进程环境变量"""
+        env = os.environ.copy()
+        env['PGPASSWORD'] = self.db_config.password
+        env['PGAPPNAME'] = BACKUP_APPLICATION_NAME
+        return env
+    
     def get_alembic_version(self) -> Optional[str]:
         """获取当前Alembic版本"""
         try:
-            conn = psycopg2.connect(
-                host=self.db_config.host,
-                port=self.db_config.port,
-                database=self.db_config.database,
-                user=self.db_config.username,
-                password=self.db_config.password
-            )
+            conn = self.connect_database()
             cursor = conn.cursor()
             cursor.execute("SELECT version_num FROM alembic_version ORDER BY version_num DESC LIMIT 1")
             result = cursor.fetchone()
@@ -53,16 +166,182 @@ class BackupManager:
         extension = ".sql.gz" if compress else ".sql"
         return base_name + extension
     
-    async def create_backup(self, description: Optional[str] = None, compress: Optional[bool] = None) -> BackupInfo:
-        """创建数据库备份"""
-        timestamp = datetime.now()
-        backup_id = timestamp.strftime('%Y%m%d_%H%M%S')
+    def generate_backup_dirname(self, timestamp: datetime) -> str:
+        """生成并行COPY备份的目录名"""
+        return f"backup_{timestamp.strftime('%Y%m%d_%H%M%S')}.dir"
+    
+    def get_backup_dir(self, backup_id: str) -> str:
+        """备份文件、信息文件和剖析文件所在的目录，date布局下为 YYYY/MM/DD 分区"""
+        partition = backup_partition(backup_id) if self.backup_config.storage_layout == "date" else None
+        if partition:
+            return os.path.join(self.backup_config.storage_path, *partition)
+        return self.backup_config.storage_path
+    
+    def get_info_path(self, backup_id: str) -> str:
+        """获取备份信息文件路径"""
+        return os.path.join(self.get_backup_dir(backup_id), f"{backup_id}.json")
+    
+    def reserve_backup_timestamp(self, started: datetime) -> datetime:
+        """在备份目录锁内选出未被已有备份和进行中的备份/导入占用的时间戳（冲突时顺延一秒）
+
+        用完后调用release_backup_id；预留期间写入的信息文件同样会阻止其他备份使用该ID。
+        """
+        key = catalog_key(self)
+        with catalog_locks.get(key):
+            reserved = _reserved_backup_ids.setdefault(key, set())
+            timestamp = started.replace(microsecond=0)
+            while (timestamp.strftime(BACKUP_ID_FORMAT) in reserved
+                   or os.path.exists(self.get_info_path(timestamp.strftime(BACKUP_ID_FORMAT)))):
+                timestamp += timedelta(seconds=1)
+            reserved.add(timestamp.strftime(BACKUP_ID_FORMAT))
+        return timestamp
+    
+    def release_backup_id(self, backup_id: str):
+        key = catalog_key(self)
+        with catalog_locks.get(key):
+            _reserved_backup_ids.get(key, set()).discard(backup_id)
+    
+    def get_payload_dir(self, backup_info: BackupInfo) -> str:
+        """备份文件所在目录：冷存储中的备份始终按 YYYY/MM/DD 分区存放"""
+        if backup_info.tier == "cold" and self.backup_config.cold_storage_path:
+            partition = backup_partition(backup_info.id) or ()
+            return os.path.join(self.backup_config.cold_storage_path, *partition)
+        return self.get_backup_dir(backup_info.id)
+    
+    def get_backup_path(self, backup_info: BackupInfo) -> str:
+        """获取备份文件（或并行备份目录）的完整路径"""
+        return os.path.join(self.get_payload_dir(backup_info), backup_info.filename)
+    
+    def get_encryption_key(self, backup_info: Optional[BackupInfo] = None) -> Optional[bytes]:
+        """新备份（backup_info为空）或已有加密备份使用的密钥，不需要加密时返回None"""
+        if backup_info is None:
+            if not self.backup_config.encryption_enabled:
+                return None
+            return load_encryption_key(self.backup_config.encryption_key_file)
+        if not backup_info.encrypted:
+            return None
+        key = load_encryption_key(self.backup_config.encryption_key_file)
+        if backup_info.key_id and key_id(key) != backup_info.key_id:
+            raise EncryptionError(f"密钥不匹配：备份 {backup_info.id} 使用密钥 {backup_info.key_id}，当前密钥为 {key_id(key)}")
+        return key
+    
+    def get_object_storage(self) -> StorageBackend:
+        """对象存储后端（首次使用时创建，boto3客户端线程安全，可在多个线程间共享）"""
+        if self.object_storage is None:
+            self.object_storage = create_storage(self.backup_config.model_copy(update={"storage_backend": "s3"}))
+        return self.object_storage
+    
+    def get_payload_storage(self, backup_info: BackupInfo) -> Tuple[StorageBackend, str]:
+        """备份文件所在的存储后端和键：对象存储中按 YYYY/MM/DD/文件名 存放"""
+        if backup_info.storage == "s3":
+            partition = backup_partition(backup_info.id) or ()
+            return self.get_object_storage(), "/".join((*partition, backup_info.filename))
+        return LocalStorage(self.get_payload_dir(backup_info)), backup_info.filename
+    
+    def get_profile_path(self, backup_info: BackupInfo, name: str) -> Optional[str]:
+        """获取备份关联的性能剖析文件路径，仅允许访问元数据中登记过的文件"""
+        if name not in backup_info.profile_files:
+            return None
+        return os.path.join(self.get_backup_dir(backup_info.id), name)
+    
+    def get_path_size(self, path: str) -> int:
+        """获取文件或目录的总大小"""
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                total += os.path.getsize(os.path.join(root, name))
+        return total
+    
+    @property
+    def database_key(self) -> str:
+        """协调器中区分数据库的键"""
+        return f"{self.db_config.host}:{self.db_config.port}/{self.db_config.database}"
+    
+    def submit_backup(self, source: str = "manual", description: Optional[str] = None) -> Operation:
+        """在协调器中登记一次备份，定时备份重复时抛出OperationSkipped"""
+        return coordinator.submit(self.database_key, "backup", source, description,
+                                  self.backup_config.max_concurrent_backups, self.db_config.host)
+    
+    def for_source(self, source: BackupSource) -> "BackupManager":
+        """从指定节点导出数据的管理器（共享存储配置，只替换连接的数据库节点）"""
+        if source.db_config is self.db_config:
+            return self
+        dumper = copy.copy(self)
+        dumper.db_config = source.db_config
+        return dumper
+    
+    async def create_backup(self, description: Optional[str] = None, compress: Optional[bool] = None,
+                            engine: Optional[str] = None, profile: bool = False,
+                            profile_memory: bool = False, operation: Optional[Operation] = None) -> BackupInfo:
+        """排队等待同一数据库上的恢复和其他备份后创建备份，operation为空时作为手动备份登记"""
+        operation = operation or self.submit_backup("manual", description)
+        try:
+            # 副本延迟过大且配置为defer时，在排队之前等待，不占用备份名额
+            await wait_for_replica(self.db_config, self.backup_config,
+                                   lambda reason: setattr(operation, "waiting_reason", reason))
+            # 按实际导出的主机占用每个主机的并发名额：从副本导出时不占用主库的名额
+            operation.host = await asyncio.to_thread(dump_host, self.db_config, self.backup_config)
+        except BaseException as e:
+            coordinator.abandon(operation, e)
+            raise
+        async with coordinator.acquire(operation):
+            backup_info = await self.run_backup(description, compress, engine, profile, profile_memory, operation)
+            operation.result = backup_info.id
+            return backup_info
+    
+    async def run_backup(self, description: Optional[str] = None, compress: Optional[bool] = None,
+                         engine: Optional[str] = None, profile: bool = False,
+                         profile_memory: bool = False, operation: Optional[Operation] = None) -> BackupInfo:
+        """创建数据库备份，profile/profile_memory为真时对本次运行进行CPU/内存剖析"""
+        # 在备份目录锁内预留ID，同一秒内开始的备份和导入不会使用同一个ID
+        timestamp = self.reserve_backup_timestamp(datetime.now())
+        try:
+            return await self.run_reserved_backup(timestamp, description, compress, engine, profile,
+                                                  profile_memory, operation)
+        finally:
+            self.release_backup_id(timestamp.strftime(BACKUP_ID_FORMAT))
+    
+    async def run_reserved_backup(self, timestamp: datetime, description: Optional[str], compress: Optional[bool],
+                                  engine: Optional[str], profile: bool, profile_memory: bool,
+                                  operation: Optional[Operation]) -> BackupInfo:
+        """使用已预留的时间戳执行备份"""
+        backup_id = timestamp.strftime(BACKUP_ID_FORMAT)
         
         # 确定是否压缩：优先使用用户选择，否则使用配置默认值
         should_compress = compress if compress is not None else self.backup_config.compression
         
-        filename = self.generate_backup_filename_with_compression(timestamp, should_compress)
-        filepath = os.path.join(self.backup_config.storage_path, filename)
+        dump_engine = engine or self.backup_config.dump_engine
+        if dump_engine not in DUMP_ENGINES:
+            raise ValueError(f"不支持的备份引擎: {dump_engine}")
+        
+        storage_backend = self.backup_config.storage_backend
+        if storage_backend != "local" and dump_engine != "pg_dump":
+            raise ValueError(f"{storage_backend}存储只支持pg_dump备份引擎")
+        
+        # 密钥缺失时在开始导出前失败
+        encryption_key = self.get_encryption_key()
+        
+        if dump_engine == "parallel_copy":
+            filename = self.generate_backup_dirname(timestamp)
+        else:
+            filename = self.generate_backup_filename_with_compression(timestamp, should_compress)
+        backup_dir = self.get_backup_dir(backup_id)
+        os.makedirs(backup_dir, exist_ok=True)
+        filepath = os.path.join(backup_dir, filename)
+        profiler = RunProfiler(backup_dir, f"{backup_id}.backup", profile, profile_memory)
+        profiler.start()
+        timer = PhaseTimer("backup", profiler)
+        
+        with timer.phase("connect"):
+            # 配置了副本时优先从副本导出，导出、负载检测都连接选中的节点
+            source = await asyncio.to_thread(select_backup_source, self.db_config, self.backup_config)
+            if operation and operation.host != source.db_config.host:
+                # 排队期间副本状态发生变化，名额改记到实际导出的主机
+                await coordinator.set_host(operation, source.db_config.host)
+            dumper = self.for_source(source)
+            alembic_version = dumper.get_alembic_version()
         
         # 创建备份信息对象
         backup_info = BackupInfo(
@@ -71,44 +350,125 @@ class BackupManager:
             created_at=timestamp,
             size=0,
             status=BackupStatus.RUNNING,
-            alembic_version=self.get_alembic_version(),
+            alembic_version=alembic_version,
             compressed=should_compress,
-            description=description
+            codec="gzip" if should_compress else "none",
+            description=description,
+            format="parallel_copy" if dump_engine == "parallel_copy" else "plain",
+            storage=storage_backend,
+            encrypted=encryption_key is not None,
+            key_id=key_id(encryption_key) if encryption_key else None,
+            source_role=source.role,
+            source_node=source.node,
+            source_lsn=source.lsn,
+            source_lag_s=source.lag
         )
         
+        mode = self.get_dump_mode(dump_engine, backup_info, encryption_key)
         try:
             # 保存备份状态
             self.save_backup_info(backup_info)
             
-            # 执行备份
-            await self.execute_backup(filepath, should_compress)
+            # 执行备份（限速器据此检测数据库负载），锁超时、连接中断按指数退避重试
+            with io_throttle.session(dumper.connect_database, dumper.database_key):
+                retries = 0
+                while True:
+                    attempt: Dict[str, Any] = {
+                        "attempt": len(backup_info.attempts) + 1,
+                        "mode": mode,
+                        "started_at": datetime.now().isoformat()
+                    }
+                    backup_info.attempts.append(attempt)
+                    started = time.monotonic()
+                    try:
+                        raw_bytes = await dumper.run_dump(mode, backup_info, filepath, should_compress, timer,
+                                                          encryption_key)
+                        attempt["duration_s"] = round(time.monotonic() - started, 3)
+                        break
+                    except Exception as e:
+                        kind = classify_dump_error(e)
+                        attempt.update(duration_s=round(time.monotonic() - started, 3), kind=kind, error=str(e).strip())
+                        if kind in RETRYABLE_DUMP_ERRORS and retries < self.backup_config.dump_max_retries:
+                            retries += 1
+                            delay = backoff_delay(retries, self.backup_config.dump_retry_base_delay_s,
+                                                  self.backup_config.dump_retry_max_delay_s)
+                            attempt["retry_in_s"] = round(delay, 3)
+                            print(f"备份 {backup_id} 导出失败（{kind}），{delay:.0f} 秒后第 {retries} 次重试: {str(e).strip()}")
+                            self.discard_partial_dump(mode, filepath)
+                            self.save_backup_info(backup_info)
+                            await asyncio.sleep(delay)
+                        elif kind == "error" and mode in ("parallel_copy", "memory") and self.backup_config.dump_fallback:
+                            print(f"备份 {backup_id} 导出失败，改用fallback模式: {str(e).strip()}")
+                            self.discard_partial_dump(mode, filepath)
+                            if mode == "parallel_copy":
+                                backup_info.filename = self.generate_backup_filename_with_compression(timestamp, should_compress)
+                                backup_info.format = "plain"
+                                filepath = os.path.join(backup_dir, backup_info.filename)
+                                dump_engine = "pg_dump"
+                            mode = "fallback"
+                            self.save_backup_info(backup_info)
+                        else:
+                            raise
             
             # 更新备份信息
-            backup_info.size = os.path.getsize(filepath)
             backup_info.status = BackupStatus.COMPLETED
+            backup_info.timings = timer.finish()
+            backup_info.profile_files = profiler.stop()
             self.save_backup_info(backup_info)
+            record_transfer("backup", dump_engine, raw_bytes, backup_info.size, backup_info.timings["total"])
             
-            # 清理旧备份
-            self.cleanup_old_backups()
+            # 按保留策略在后台清理旧备份，不阻塞本次备份的返回
+            schedule_prune(self)
             
             return backup_info
             
         except Exception as e:
             backup_info.status = BackupStatus.FAILED
             backup_info.error_message = str(e)
+            backup_info.timings = timer.finish()
+            backup_info.profile_files = profiler.stop()
             self.save_backup_info(backup_info)
+            record_failure("backup", e)
             raise e
     
+    def get_dump_mode(self, dump_engine: str, backup_info: BackupInfo, encryption_key: Optional[bytes]) -> str:
+        """导出方式：parallel_copy、streaming（流式管道逐块读写，可以加密和限速）或 memory（整体读入内存后写盘）"""
+        if dump_engine == "parallel_copy":
+            return "parallel_copy"
+        if backup_info.storage != "local" or encryption_key or io_throttle.enabled or io_throttle.load_aware:
+            return "streaming"
+        return "memory"
+    
+    async def run_dump(self, mode: str, backup_info: BackupInfo, filepath: str, compress: bool,
+                       timer: PhaseTimer, encryption_key: Optional[bytes] = None) -> int:
+        """按导出方式执行一次导出并更新备份大小，返回未压缩字节数"""
+        if mode == "streaming":
+            storage, key = self.get_payload_storage(backup_info)
+            raw_bytes = await self.execute_streaming_backup(storage, key, compress, timer, encryption_key)
+            backup_info.size = storage.size(key)
+            return raw_bytes
+        if mode == "parallel_copy":
+            raw_bytes = await self.execute_parallel_backup(filepath, compress, timer, encryption_key)
+        elif mode == "fallback":
+            raw_bytes = await self.execute_backup_fallback(filepath, compress, timer, encryption_key)
+        else:
+            raw_bytes = await self.execute_backup(filepath, compress, timer)
+        backup_info.size = self.get_path_size(filepath)
+        return raw_bytes
+    
+    def discard_partial_dump(self, mode: str, filepath: str):
+        """重试或改用fallback模式前删除失败导出留下的文件（流式导出失败时已放弃写入）"""
+        if mode == "streaming":
+            return
+        if os.path.isdir(filepath):
+            shutil.rmtree(filepath, ignore_errors=True)
+        elif os.path.exists(filepath):
+            os.remove(filepath)
+    
     def get_database_version(self) -> str:
         """获取数据库版本"""
         try:
-            conn = psycopg2.connect(
-                host=self.db_config.host,
-                port=self.db_config.port,
-                database=self.db_config.database,
-                user=self.db_config.username,
-                password=self.db_config.password
-            )
+            conn = self.connect_database()
             cursor = conn.cursor()
             cursor.execute("SELECT version()")
             result = cursor.fetchone()
@@ -143,217 +503,606 @@ class BackupManager:
             print(f"获取pg_dump版本失败: {e}")
             return "15"  # 默认返回15
     
-    async def execute_backup(self, filepath: str, compress: Optional[bool] = None):
-        """执行备份命令"""
-        # 获取数据库版本
-        db_version = self.get_database_version()
-        print(f"检测到数据库版本: {db_version}")
-        
-        # 获取pg_dump版本
-        pg_dump_version = self.get_pg_dump_version()
-        print(f"pg_dump版本: {pg_dump_version}")
+    async def execute_backup(self, filepath: str, compress: Optional[bool] = None,
+                             timer: Optional[PhaseTimer] = None) -> int:
+        """执行备份命令，返回未压缩的备份字节数"""
+        timer = timer or PhaseTimer("backup")
+        with timer.phase("connect"):
+            # 获取数据库版本
+            db_version = self.get_database_version()
+            print(f"检测到数据库版本: {db_version}")
+            
+            # 获取pg_dump版本
+            pg_dump_version = self.get_pg_dump_version()
+            print(f"pg_dump版本: {pg_dump_version}")
         
         # 构建pg_dump命令（不加任何兼容参数）
-        cmd = [
-            'pg_dump',
-            f'--host={self.db_config.host}',
-            f'--port={self.db_config.port}',
-            f'--username={self.db_config.username}',
-            f'--dbname={self.db_config.database}',
-            '--clean',
-            '--if-exists',
-            '--create'
-        ]
+        cmd = self.build_pg_dump_command('--clean', '--if-exists', '--create')
         
         # 设置环境变量
-        env = os.environ.copy()
-        env['PGPASSWORD'] = self.db_config.password
-        
-        # 执行pg_dump命令
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env
-        )
+        env = self.get_pg_env()
         
-        stdout, stderr = await process.communicate()
+        with timer.phase("dump"):
+            # 执行pg_dump命令
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=env
+            )
+            
+            stdout, stderr = await self.wait_dump_process(process, self.get_dump_deadline())
         
         if process.returncode != 0:
             error_msg = stderr.decode()
-            raise Exception(f"备份失败: {error_msg}")
+            raise DumpError(f"备份失败: {error_msg}")
         
-        # 保存备份数据
-        backup_data = stdout.decode('utf-8')
+        # 校验备份数据编码，写入时直接使用原始字节，避免再次编码
+        with timer.phase("decode"):
+            stdout.decode('utf-8')
         
         # 确定是否压缩：优先使用传入参数，否则使用配置默认值
         should_compress = compress if compress is not None else self.backup_config.compression
         
+        payload = stdout
         if should_compress:
-            # 保存为压缩文件
-            with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-                f.write(backup_data)
-        else:
-            # 保存为普通文件
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(backup_data)
+            # 压缩为gzip格式
+            with timer.phase("compress"):
+                payload = gzip.compress(stdout, compresslevel=self.backup_config.hot_compression_level)
+        
+        with timer.phase("write"):
+            with open(filepath, 'wb') as f:
+                f.write(payload)
+        
+        return len(stdout)
     
-    async def execute_backup_fallback(self, filepath: str, compress: Optional[bool] = None):
-        """执行备份命令（fallback模式，使用基础参数）"""
+    async def execute_streaming_backup(self, storage: StorageBackend, key: str, compress: Optional[bool] = None,
+                                       timer: Optional[PhaseTimer] = None,
+                                       encryption_key: Optional[bytes] = None) -> int:
+        """pg_dump的输出边压缩（边加密）边写入存储后端（对象存储为并行分段上传），不在本地落盘，返回未压缩字节数
+
+        pg_dump失败时放弃写入，存储中不会留下不完整的备份。
+        """
+        timer = timer or PhaseTimer("backup")
+        should_compress = compress if compress is not None else self.backup_config.compression
+        cmd = self.build_pg_dump_command('--clean', '--if-exists', '--create')
+        
+        raw_bytes = 0
+        deadline = self.get_dump_deadline()
+        with timer.phase("dump"):
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=self.get_pg_env()
+            )
+            # 同时读取stderr，避免pg_dump输出大量警告时管道写满而互相等待
+            stderr_task = asyncio.create_task(process.stderr.read())
+            writer = None
+            try:
+                writer = await asyncio.to_thread(storage.open_writer, key)
+                # 压缩 -> 加密 -> 写入限速 -> 存储，加密层按块写入，不缓存整个备份
+                throttled = ThrottledWriter(writer, io_throttle.consume_write)
+                sink = EncryptingWriter(throttled, encryption_key) if encryption_key else throttled
+                out = gzip.GzipFile(fileobj=sink, mode='wb', compresslevel=self.backup_config.hot_compression_level) \
+                    if should_compress else sink
+                
+                def write_chunk(data: bytes):
+                    # 读取限速按pg_dump输出的字节数计算，等待期间不再读取，pg_dump随管道写满而暂停
+                    io_throttle.consume_read(len(data))
+                    out.write(data)
+                
+                while True:
+                    chunk = await self.read_dump_chunk(process, deadline)
+                    if not chunk:
+                        break
+                    raw_bytes += len(chunk)
+                    # 限速、压缩和上传在工作线程中进行，在途分段已满时在此等待
+                    await asyncio.to_thread(write_chunk, chunk)
+                stderr = await stderr_task
+                await process.wait()
+                if process.returncode != 0:
+                    raise DumpError(f"备份失败: {stderr.decode()}")
+                # 写入gzip尾部和加密结束块（不关闭底层写入流）
+                if out is not sink:
+                    await asyncio.to_thread(out.close)
+                if sink is not throttled:
+                    await asyncio.to_thread(sink.close)
+                # 提交：对象存储在此等待剩余分段上传完成并合并
+                await asyncio.to_thread(writer.commit)
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                stderr_task.cancel()
+                if writer is not None:
+                    await asyncio.to_thread(writer.abort)
+                raise
+        return raw_bytes
+    
+    async def execute_backup_fallback(self, filepath: str, compress: Optional[bool] = None,
+                                      timer: Optional[PhaseTimer] = None,
+                                      encryption_key: Optional[bytes] = None) -> int:
+        """执行备份命令（fallback模式）：pg_dump的输出逐块压缩（加密）后写入本地文件，不整体读入内存，返回未压缩字节数
+
+        并行COPY或内存中导出因非暂时性错误失败时使用，不校验编码，失败时删除写了一半的文件。
+        """
         print("使用fallback模式执行备份...")
+        timer = timer or PhaseTimer("backup")
+        should_compress = compress if compress is not None else self.backup_config.compression
+        cmd = self.build_pg_dump_command('--clean', '--if-exists', '--create')
         
-        # 构建基础pg_dump命令，不使用兼容性参数
-        cmd = [
-            'pg_dump',
-            f'--host={self.db_config.host}',
-            f'--port={self.db_config.port}',
-            f'--username={self.db_config.username}',
-            f'--dbname={self.db_config.database}',
-            '--clean',
-            '--if-exists',
-            '--create',
-            '--no-sync'  # 添加no-sync参数避免同步问题
+        raw_bytes = 0
+        deadline = self.get_dump_deadline()
+        with timer.phase("dump"):
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                env=self.get_pg_env()
+            )
+            stderr_task = asyncio.create_task(process.stderr.read())
+            try:
+                codec = "gzip" if should_compress else "none"
+                with open(filepath, 'wb') as f:
+                    # 与流式管道相同：读取限速按pg_dump输出计算，写入限速按压缩（加密）后落盘的字节计算
+                    throttled = ThrottledWriter(f, io_throttle.consume_write)
+                    out = open_codec(throttled, codec, 'wb', self.backup_config.hot_compression_level, encryption_key)
+                    
+                    def write_chunk(data: bytes):
+                        io_throttle.consume_read(len(data))
+                        out.write(data)
+                    
+                    while True:
+                        chunk = await self.read_dump_chunk(process, deadline)
+                        if not chunk:
+                            break
+                        raw_bytes += len(chunk)
+                        await asyncio.to_thread(write_chunk, chunk)
+                    # 写入gzip尾部和加密结束块
+                    if out is not throttled:
+                        await asyncio.to_thread(out.close)
+                stderr = await stderr_task
+                await process.wait()
+                if process.returncode != 0:
+                    raise DumpError(f"备份失败（fallback模式）: {stderr.decode()}")
+            except BaseException:
+                if process.returncode is None:
+                    process.kill()
+                    await process.wait()
+                stderr_task.cancel()
+                if os.path.exists(filepath):
+                    os.remove(filepath)
+                raise
+        return raw_bytes
+    
+    async def execute_parallel_backup(self, backup_dir: str, compress: Optional[bool] = None,
+                                      timer: Optional[PhaseTimer] = None,
+                                      encryption_key: Optional[bytes] = None) -> int:
+        """执行并行COPY备份：导出快照后由多个连接在同一快照下并行导出各表数据，返回未压缩字节数"""
+        timer = timer or PhaseTimer("backup")
+        should_compress = compress if compress is not None else self.backup_config.compression
+        os.makedirs(os.path.join(backup_dir, "data"), exist_ok=True)
+        
+        # 持有快照的连接必须在所有工作连接完成前保持事务打开
+        with timer.phase("connect"):
+            snapshot_conn = self.connect_database(for_dump=True)
+        try:
+            with timer.phase("connect"):
+                snapshot_conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+                cursor = snapshot_conn.cursor()
+                tables = self.list_dump_tables(cursor)
+                # 与pg_dump相同，在导出快照的事务中对所有表加ACCESS SHARE锁并保持到所有工作连接完成，
+                # 导出期间其他会话不能TRUNCATE、ALTER或DROP这些表，表结构与数据保持一致
+                self.lock_dump_tables(cursor, tables)
+                cursor.execute("SELECT pg_export_snapshot()")
+                snapshot_id = cursor.fetchone()[0]
+                print(f"已导出快照: {snapshot_id}")
+                
+                for table in tables:
+                    table["chunks"] = self.plan_table_chunks(cursor, table)
+                sequences = self.list_sequence_values(cursor)
+            
+            # 表结构使用pg_dump导出，拆分为数据前后两部分，索引和约束在数据加载后再创建
+            # 启用加密时表结构和序列文件与数据文件一样加密（不压缩）
+            with timer.phase("schema"):
+                await self.dump_schema_section(os.path.join(backup_dir, PARALLEL_SCHEMA_PRE), snapshot_id, "pre-data",
+                                               encryption_key)
+                await self.dump_schema_section(os.path.join(backup_dir, PARALLEL_SCHEMA_POST), snapshot_id, "post-data",
+                                               encryption_key)
+                self.write_parallel_file(os.path.join(backup_dir, PARALLEL_SEQUENCES),
+                                         ('\n'.join(sequences) + '\n').encode('utf-8'), encryption_key)
+            
+            # 数据导出阶段中压缩与写盘在各工作线程内交替进行
+            with timer.phase("dump"):
+                entries = await asyncio.to_thread(
+                    self.copy_tables_parallel, snapshot_id, tables, backup_dir, should_compress, encryption_key
+                )
+        finally:
+            snapshot_conn.close()
+        
+        manifest = {
+            "format": "parallel_copy",
+            "snapshot": snapshot_id,
+            "compressed": should_compress,
+            "codec": "gzip" if should_compress else "none",
+            "encrypted": encryption_key is not None,
+            "schema_encrypted": encryption_key is not None,
+            "schema_pre": PARALLEL_SCHEMA_PRE,
+            "schema_post": PARALLEL_SCHEMA_POST,
+            "sequences": PARALLEL_SEQUENCES,
+            "tables": entries
+        }
+        with timer.phase("write"):
+            with open(os.path.join(backup_dir, PARALLEL_MANIFEST), 'w', encoding='utf-8') as f:
+                json.dump(manifest, f, indent=2, ensure_ascii=False)
+        print(f"并行备份完成，共导出 {len(entries)} 个表")
+        return sum(entry["raw_bytes"] for entry in entries)
+    
+    def list_dump_tables(self, cursor) -> List[dict]:
+        """列出需要导出数据的普通表（按大小降序，大表优先调度）"""
+        cursor.execute("""
+            SELECT n.nspname, c.relname, pg_relation_size(c.oid),
+                   array_agg(a.attname::text ORDER BY a.attnum), c.oid
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            JOIN pg_attribute a ON a.attrelid = c.oid
+                AND a.attnum > 0 AND NOT a.attisdropped AND a.attgenerated = ''
+            WHERE c.relkind = 'r'
+              AND n.nspname NOT IN ('pg_catalog', 'information_schema')
+              AND n.nspname NOT LIKE 'pg_toast%'
+              AND n.nspname NOT LIKE 'pg_temp%'
+              AND NOT EXISTS (
+                  SELECT 1 FROM pg_depend d
+                  WHERE d.classid = 'pg_class'::regclass AND d.objid = c.oid AND d.deptype = 'e'
+              )
+            GROUP BY n.nspname, c.relname, c.oid
+            ORDER BY pg_relation_size(c.oid) DESC
+        """)
+        return [
+            {"schema": row[0], "table": row[1], "relation_size": row[2], "columns": row[3], "oid": row[4]}
+            for row in cursor.fetchall()
         ]
+    
+    def lock_dump_tables(self, cursor, tables: List[dict]):
+        """对需要导出的表加ACCESS SHARE锁（等待时间受lock_timeout限制）"""
+        if not tables:
+            return
+        relations = sql.SQL(', ').join(sql.Identifier(table["schema"], table["table"]) for table in tables)
+        cursor.execute(sql.SQL("LOCK TABLE {} IN ACCESS SHARE MODE").format(relations))
+    
+    def plan_table_chunks(self, cursor, table: dict) -> List[Optional[dict]]:
+        """为超过阈值的大表规划分段范围，返回 [None] 表示不拆分"""
+        threshold = self.backup_config.split_threshold_mb * 1024 * 1024
+        if threshold <= 0 or table["relation_size"] <= threshold:
+            return [None]
         
-        # 设置环境变量
-        env = os.environ.copy()
-        env['PGPASSWORD'] = self.db_config.password
+        chunk_count = min(
+            max(2, self.backup_config.split_max_chunks),
+            math.ceil(table["relation_size"] / threshold)
+        )
+        strategy = self.backup_config.split_strategy
+        
+        chunks = None
+        if strategy in ("auto", "pk"):
+            chunks = self.plan_pk_chunks(cursor, table, chunk_count)
+        if chunks is None and strategy in ("auto", "ctid"):
+            chunks = self.plan_ctid_chunks(cursor, table, chunk_count)
+        if chunks is None:
+            print(f"   ⚠️ 表 {table['schema']}.{table['table']} 无法拆分，按整表导出")
+            return [None]
+        
+        print(f"   ✂️ 表 {table['schema']}.{table['table']} 拆分为 {len(chunks)} 段 ({chunks[0]['kind']})")
+        return chunks
+    
+    def plan_pk_chunks(self, cursor, table: dict, chunk_count: int) -> Optional[List[dict]]:
+        """按单列主键在pg_stats直方图中的分位点划分范围"""
+        cursor.execute("""
+            SELECT a.attname::text, format_type(a.atttypid, a.atttypmod)
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = %s AND i.indisprimary
+        """, (table["oid"],))
+        pk_columns = cursor.fetchall()
+        if len(pk_columns) != 1:
+            return None
+        column, column_type = pk_columns[0]
+        
+        cursor.execute("""
+            SELECT histogram_bounds::text::text[]
+            FROM pg_stats
+            WHERE schemaname = %s AND tablename = %s AND attname = %s
+        """, (table["schema"], table["table"], column))
+        result = cursor.fetchone()
+        bounds = result[0] if result and result[0] else []
+        if len(bounds) < 3:
+            return None
+        
+        # 在直方图边界中等距选取分割点，相邻重复的分割点合并
+        split_points = []
+        for i in range(1, chunk_count):
+            value = bounds[round(i * (len(bounds) - 1) / chunk_count)]
+            if not split_points or split_points[-1] != value:
+                split_points.append(value)
         
-        # 执行pg_dump命令
+        edges = [None] + split_points + [None]
+        return [
+            {"kind": "pk", "column": column, "type": column_type, "lower": edges[i], "upper": edges[i + 1]}
+            for i in range(len(edges) - 1)
+        ]
+    
+    def plan_ctid_chunks(self, cursor, table: dict, chunk_count: int) -> Optional[List[dict]]:
+        """按物理页号(ctid)划分范围，依赖PostgreSQL 14+ 的TID范围扫描"""
+        cursor.execute("SELECT current_setting('server_version_num')::int, current_setting('block_size')::int")
+        server_version, block_size = cursor.fetchone()
+        if server_version < 140000:
+            return None
+        
+        pages = max(1, table["relation_size"] // block_size)
+        step = math.ceil(pages / chunk_count)
+        edges = [None] + [i * step for i in range(1, chunk_count)] + [None]
+        return [
+            {"kind": "ctid", "lower": edges[i], "upper": edges[i + 1]}
+            for i in range(len(edges) - 1)
+        ]
+    
+    def build_chunk_predicate(self, chunk: dict) -> sql.Composable:
+        """根据分段描述构建WHERE条件"""
+        conditions = []
+        if chunk["kind"] == "pk":
+            column = sql.Identifier(chunk["column"])
+            cast = sql.SQL("::" + chunk["type"])
+            if chunk["lower"] is not None:
+                conditions.append(sql.SQL("{} >= {}{}").format(column, sql.Literal(chunk["lower"]), cast))
+            if chunk["upper"] is not None:
+                conditions.append(sql.SQL("{} < {}{}").format(column, sql.Literal(chunk["upper"]), cast))
+        else:
+            if chunk["lower"] is not None:
+                conditions.append(sql.SQL("ctid >= {}::tid").format(sql.Literal(f"({chunk['lower']},0)")))
+            if chunk["upper"] is not None:
+                conditions.append(sql.SQL("ctid < {}::tid").format(sql.Literal(f"({chunk['upper']},0)")))
+        return sql.SQL(" AND ").join(conditions)
+    
+    def list_sequence_values(self, cursor) -> List[str]:
+        """生成快照时刻各序列当前值的setval语句"""
+        cursor.execute("""
+            SELECT format('SELECT pg_catalog.setval(%L, %s, true);',
+                          quote_ident(schemaname) || '.' || quote_ident(sequencename), last_value)
+            FROM pg_sequences
+            WHERE last_value IS NOT NULL
+        """)
+        return [row[0] for row in cursor.fetchall()]
+    
+    async def dump_schema_section(self, filepath: str, snapshot_id: str, section: str,
+                                  encryption_key: Optional[bytes] = None):
+        """使用pg_dump在同一快照下导出表结构的指定部分"""
+        cmd = self.build_pg_dump_command(
+            '--clean',
+            '--if-exists',
+            f'--section={section}',
+            f'--snapshot={snapshot_id}'
+        )
         process = await asyncio.create_subprocess_exec(
             *cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            env=env
+            env=self.get_pg_env()
         )
-        
-        stdout, stderr = await process.communicate()
-        
+        stdout, stderr = await self.wait_dump_process(process, self.get_dump_deadline())
         if process.returncode != 0:
-            error_msg = stderr.decode()
-            raise Exception(f"备份失败（fallback模式）: {error_msg}")
-        
-        # 保存备份数据
-        backup_data = stdout.decode('utf-8')
-        
-        # 确定是否压缩：优先使用传入参数，否则使用配置默认值
-        should_compress = compress if compress is not None else self.backup_config.compression
-        
-        if should_compress:
-            # 保存为压缩文件
-            with gzip.open(filepath, 'wt', encoding='utf-8') as f:
-                f.write(backup_data)
+            raise DumpError(f"表结构导出失败: {stderr.decode()}")
+        self.write_parallel_file(filepath, stdout, encryption_key)
+    
+    def write_parallel_file(self, filepath: str, data: bytes, encryption_key: Optional[bytes] = None):
+        """写入并行备份的表结构或序列文件，key不为空时加密"""
+        with open_codec(filepath, "none", 'wb', key=encryption_key) as f:
+            f.write(data)
+    
+    def copy_tables_parallel(self, snapshot_id: str, tables: List[dict], backup_dir: str, compress: bool,
+                             encryption_key: Optional[bytes] = None) -> List[dict]:
+        """使用线程池并行导出所有表数据（大表按分段拆分为多个任务）"""
+        jobs = max(1, self.backup_config.parallel_jobs)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(self.copy_table_data, snapshot_id, table, backup_dir, compress, index, chunk_index,
+                                encryption_key)
+                for index, table in enumerate(tables)
+                for chunk_index in range(len(table.get("chunks", [None])))
+            ]
+            return [future.result() for future in futures]
+    
+    def copy_table_data(self, snapshot_id: str, table: dict, backup_dir: str, compress: bool,
+                        index: int, chunk_index: int = 0, encryption_key: Optional[bytes] = None) -> dict:
+        """在导出的快照中以COPY TO STDOUT导出单个表（或表的一个分段）"""
+        chunk = table.get("chunks", [None])[chunk_index]
+        name = f"{index:05d}" if chunk is None else f"{index:05d}_{chunk_index:03d}"
+        relative_path = os.path.join("data", f"{name}.copy" + (".gz" if compress else ""))
+        filepath = os.path.join(backup_dir, relative_path)
+        columns = sql.SQL(', ').join(sql.Identifier(col) for col in table["columns"])
+        relation = sql.Identifier(table["schema"], table["table"])
+        if chunk is None:
+            copy_sql = sql.SQL("COPY {} ({}) TO STDOUT").format(relation, columns)
         else:
-            # 保存为普通文件
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(backup_data)
+            copy_sql = sql.SQL("COPY (SELECT {} FROM {} WHERE {}) TO STDOUT").format(
+                columns, relation, self.build_chunk_predicate(chunk)
+            )
+        
+        conn = self.connect_database(for_dump=True)
+        try:
+            conn.set_session(isolation_level=ISOLATION_LEVEL_REPEATABLE_READ, readonly=True)
+            cursor = conn.cursor()
+            cursor.execute("SET TRANSACTION SNAPSHOT %s", (snapshot_id,))
+            codec = "gzip" if compress else "none"
+            with open_codec(filepath, codec, 'wb', self.backup_config.hot_compression_level, encryption_key) as f:
+                # 所有工作线程共享读取限速，限制的是并行导出的总带宽
+                writer = CountingWriter(ThrottledWriter(f, io_throttle.consume_read))
+                cursor.copy_expert(copy_sql, writer)
+            conn.rollback()
+        finally:
+            conn.close()
+        label = f"{table['schema']}.{table['table']}" + ("" if chunk is None else f" 分段 {chunk_index + 1}")
+        print(f"   📦 表 {label} 导出完成: {writer.bytes_written} 字节")
+        entry = {
+            "schema": table["schema"],
+            "table": table["table"],
+            "columns": table["columns"],
+            "file": relative_path,
+            "raw_bytes": writer.bytes_written
+        }
+        if chunk is not None:
+            entry["range"] = chunk
+        return entry
     
     def save_backup_info(self, backup_info: BackupInfo):
-        """保存备份信息到JSON文件"""
-        info_file = os.path.join(
-            self.backup_config.storage_path, 
-            f"{backup_info.id}.json"
-        )
-        with open(info_file, 'w', encoding='utf-8') as f:
+        """保存备份信息到JSON文件（先写临时文件再原子替换，读取方不会看到写了一半的文件）"""
+        info_file = self.get_info_path(backup_info.id)
+        os.makedirs(os.path.dirname(info_file), exist_ok=True)
+        temp_file = info_file + ".tmp"
+        with open(temp_file, 'w', encoding='utf-8') as f:
             json.dump(backup_info.model_dump(), f, indent=2, default=str)
+        os.replace(temp_file, info_file)
+        catalog_collector.record(catalog_key(self), backup_info)
     
     def load_backup_info(self, backup_id: str) -> Optional[BackupInfo]:
         """从JSON文件加载备份信息"""
-        info_file = os.path.join(
-            self.backup_config.storage_path, 
-            f"{backup_id}.json"
-        )
+        info_file = self.get_info_path(backup_id)
         if os.path.exists(info_file):
             with open(info_file, 'r', encoding='utf-8') as f:
                 data = json.load(f)
                 return BackupInfo(**data)
         return None
     
-    def get_backup_list(self) -> List[BackupInfo]:
-        """获取所有备份列表"""
+    def iter_catalog_dirs(self, since: Optional[date] = None, until: Optional[date] = None) -> Iterator[str]:
+        """按从新到旧的顺序返回需要扫描的目录，date布局下跳过日期范围之外的分区"""
+        root = self.backup_config.storage_path
+        if self.backup_config.storage_layout != "date":
+            yield root
+            return
+        lower = (since.year, since.month, since.day) if since else None
+        upper = (until.year, until.month, until.day) if until else None
+        
+        def walk(path: str, prefix: tuple):
+            if len(prefix) == 3:
+                yield path
+                return
+            width = 2 if prefix else 4
+            try:
+                names = [name for name in os.listdir(path) if len(name) == width and name.isdigit()]
+            except FileNotFoundError:
+                return
+            for name in sorted(names, reverse=True):
+                key = prefix + (int(name),)
+                if lower and key < lower[:len(key)]:
+                    continue
+                if upper and key > upper[:len(key)]:
+                    continue
+                yield from walk(os.path.join(path, name), key)
+        
+        yield from walk(root, ())
+    
+    def get_backup_list(self, since: Optional[date] = None, until: Optional[date] = None) -> List[BackupInfo]:
+        """获取备份列表，since/until（含）按备份日期过滤，只读取范围内的分区和信息文件"""
         backups = []
-        for filename in os.listdir(self.backup_config.storage_path):
-            if filename.endswith('.json'):
+        for directory in self.iter_catalog_dirs(since, until):
+            for filename in os.listdir(directory):
+                if not filename.endswith('.json'):
+                    continue
                 backup_id = filename[:-5]  # 移除.json后缀
-                backup_info = self.load_backup_info(backup_id)
-                if backup_info:
-                    backups.append(backup_info)
+                partition = backup_partition(backup_id)
+                if partition and (since or until):
+                    backup_date = date(*map(int, partition))
+                    if (since and backup_date < since) or (until and backup_date > until):
+                        continue
+                with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+                    backups.append(BackupInfo(**json.load(f)))
         
         # 按创建时间排序
         backups.sort(key=lambda x: x.created_at, reverse=True)
         return backups
     
-    def cleanup_old_backups(self):
-        """清理旧备份文件（基于数量）"""
-        backups = self.get_backup_list()
-        if len(backups) > self.backup_config.max_backups:
-            # 删除最旧的备份
-            for backup in backups[self.backup_config.max_backups:]:
-                self.delete_backup(backup.id)
+    def cleanup_old_backups(self) -> Optional[RetentionPreview]:
+        """按保留策略（count/gfs）清理旧备份"""
+        return prune_backups(self)
 
-    def cleanup_old_backups_by_date(self) -> tuple[int, List[str]]:
-        """根据时间清理旧备份文件"""
+    def find_expired_backups(self) -> List[BackupInfo]:
+        """查找超过保留天数的备份（运行中的备份和保留策略要保留的备份除外）"""
         if not self.backup_config.cleanup_enabled:
-            return 0, []
-        
-        from datetime import datetime, timedelta
+            return []
         
         cutoff_date = datetime.now() - timedelta(days=self.backup_config.cleanup_keep_days)
         backups = self.get_backup_list()
-        
-        deleted_count = 0
-        deleted_files = []
-        
-        for backup in backups:
-            if backup.created_at < cutoff_date:
-                try:
-                    deleted_files.append(backup.filename)
-                    self.delete_backup(backup.id)
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"删除备份失败 {backup.id}: {e}")
-        
-        return deleted_count, deleted_files
+        # 按天清理不能删除保留策略（如GFS的每周/每月备份）要保留的备份
+        keep = set(plan_retention(backups, self.backup_config).keep)
+        return [
+            backup for backup in backups
+            if backup.created_at < cutoff_date and backup.id not in keep
+            and backup.status not in (BackupStatus.RUNNING, BackupStatus.PENDING)
+        ]
     
     def delete_backup(self, backup_id: str):
         """删除指定的备份"""
         backup_info = self.load_backup_info(backup_id)
         if backup_info:
-            # 删除备份文件
-            backup_file = os.path.join(
-                self.backup_config.storage_path, 
-                backup_info.filename
-            )
-            if os.path.exists(backup_file):
-                os.remove(backup_file)
-            
-            # 删除信息文件
-            info_file = os.path.join(
-                self.backup_config.storage_path, 
-                f"{backup_id}.json"
-            )
-            if os.path.exists(info_file):
-                os.remove(info_file) 
+            self.delete_backup_files(backup_info)
+    
+    def delete_backup_files(self, backup_info: BackupInfo):
+        """删除信息文件（备份随即从列表中消失），再删除备份文件和性能剖析文件"""
+        removed = self.remove_backup_infos([backup_info.id])
+        self.delete_backup_payload(removed.get(backup_info.id) or backup_info)
+        self.remove_empty_partitions([backup_info.id])
     
-    def delete_backups_batch(self, backup_ids: List[str]) -> dict:
-        """批量删除备份"""
-        successful_deletions = []
-        failed_deletions = []
+    def delete_backup_payload(self, backup_info: BackupInfo):
+        """删除备份文件和性能剖析文件"""
+        # 删除备份文件（本地文件/目录或对象存储中的对象）
+        storage, key = self.get_payload_storage(backup_info)
+        storage.delete(key)
         
-        for backup_id in backup_ids:
+        # 删除性能剖析文件
+        backup_dir = self.get_backup_dir(backup_info.id)
+        for name in backup_info.profile_files:
             try:
-                backup_info = self.load_backup_info(backup_id)
+                os.remove(os.path.join(backup_dir, name))
+            except FileNotFoundError:
+                pass
+    
+    def remove_backup_infos(self, backup_ids: List[str]) -> Dict[str, BackupInfo]:
+        """批量删除信息文件，备份随即从备份列表中移除，返回删除前最新的备份信息"""
+        removed = {}
+        with catalog_locks.get(catalog_key(self)):
+            for backup_id in backup_ids:
+                try:
+                    backup_info = self.load_backup_info(backup_id)
+                except ValueError:
+                    # 信息文件损坏时照样删除
+                    backup_info = None
+                try:
+                    os.remove(self.get_info_path(backup_id))
+                except FileNotFoundError:
+                    continue
                 if backup_info:
-                    self.delete_backup(backup_id)
-                    successful_deletions.append(backup_id)
-                else:
-                    failed_deletions.append({"backup_id": backup_id, "error": "备份不存在"})
-            except Exception as e:
-                failed_deletions.append({"backup_id": backup_id, "error": str(e)})
-        
-        return {
-            "successful_count": len(successful_deletions),
-            "failed_count": len(failed_deletions),
-            "successful_deletions": successful_deletions,
-            "failed_deletions": failed_deletions
-        }
\ No newline at end of file
+                    removed[backup_id] = backup_info
+        catalog_collector.forget(catalog_key(self), backup_ids)
+        return removed
+    
+    def remove_empty_partitions(self, backup_ids: List[str]):
+        """删除备份后清理已经为空的日期分区目录"""
+        root = os.path.abspath(self.backup_config.storage_path)
+        for directory in {os.path.abspath(self.get_backup_dir(backup_id)) for backup_id in backup_ids}:
+            while directory != root and directory.startswith(root):
+                try:
+                    os.rmdir(directory)
+                except OSError:
+                    break
+                directory = os.path.dirname(directory)
+    
+    def load_backup_infos(self, backup_ids: List[str]) -> tuple[List[BackupInfo], List[str]]:
+        """批量读取备份信息，返回(存在的备份, 不存在的备份ID)"""
+        found = []
+        missing = []
+        for backup_id in backup_ids:
+            backup_info = self.load_backup_info(backup_id)
+            if backup_info:
+                found.append(backup_info)
+            else:
+                missing.append(backup_id)
+        return found, missing
@@ -0,0 +1,117 @@
+import bz2
+import gzip
+import io
+import lzma
+from typing import Optional
+
+from .encryption import EncryptingWriter, open_decrypting
+
+
+CODECS = ("none", "gzip", "xz", "bz2")
+CODEC_EXTENSIONS = {"none": "", "gzip": ".gz", "xz": ".xz", "bz2": ".bz2"}
+CODEC_LEVELS = {"gzip": (0, 9), "xz": (0, 9), "bz2": (1, 9)}  # 各压缩格式支持的压缩级别范围
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def open_codec(path, codec: str, mode: str = "rb", level: Optional[int] = None, key: Optional[bytes] = None):
+    """按压缩格式打开文件，level仅在写入时生效
+
+    path也可以是已打开的二进制流（如对象存储的读写流），未压缩时原样返回该流。
+    key不为空时在压缩层和文件之间加入AES-GCM加解密层，关闭返回的流时依次关闭各层。
+    """
+    if key is not None:
+        return open_encrypted(path, codec, mode, level, key)
+    writing = "w" in mode or "a" in mode
+    if codec == "none":
+        return open(path, mode) if isinstance(path, str) else path
+    if codec == "gzip":
+        return gzip.open(path, mode, compresslevel=level if writing and level is not None else 9)
+    if codec == "xz":
+        return lzma.open(path, mode, preset=level if writing else None)
+    if codec == "bz2":
+        return bz2.open(path, mode, compresslevel=level if writing and level is not None else 9)
+    raise ValueError(f"不支持的压缩格式: {codec}")
+
+
+class StackedStream(io.BufferedIOBase):
+    """把压缩层、加解密层和底层文件作为一个文件对象使用，关闭时从上到下依次关闭"""
+    def __init__(self, top, *lower):
+        super().__init__()
+        self.top = top
+        self.lower = [layer for layer in lower if layer is not None]
+
+    def readable(self) -> bool:
+        return self.top.readable() if hasattr(self.top, "readable") else False
+
+    def writable(self) -> bool:
+        return not self.readable()
+
+    def read(self, size: int = -1) -> bytes:
+        return self.top.read(size)
+
+    def read1(self, size: int = -1) -> bytes:
+        return self.top.read1(size) if hasattr(self.top, "read1") else self.top.read(size)
+
+    def readline(self, size: int = -1) -> bytes:
+        return self.top.readline(size)
+
+    def write(self, data) -> int:
+        return self.top.write(data)
+
+    def tell(self) -> int:
+        return self.top.tell()
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            for layer in [self.top, *self.lower]:
+                layer.close()
+        finally:
+            super().close()
+
+
+def open_encrypted(path, codec: str, mode: str, level: Optional[int], key: bytes) -> StackedStream:
+    owned = open(path, mode) if isinstance(path, str) else None
+    raw = owned if owned is not None else path
+    if "r" in mode:
+        # 解密层不会关闭传入的流：由本函数打开的文件随StackedStream关闭，调用方传入的流由调用方关闭
+        layer = open_decrypting(raw, key)
+        top = layer if codec == "none" else open_codec(layer, codec, mode)
+        return StackedStream(top, layer if top is not layer else None, owned)
+    layer = EncryptingWriter(raw, key)
+    top = layer if codec == "none" else open_codec(layer, codec, mode, level)
+    return StackedStream(top, layer if top is not layer else None, owned)
+
+
+def backup_codec(backup_info) -> str:
+    """备份文件的压缩格式，旧备份没有codec字段时由compressed推断"""
+    return backup_info.codec or ("gzip" if backup_info.compressed else "none")
+
+
+def manifest_codec(manifest: dict) -> str:
+    """并行COPY备份数据文件的压缩格式"""
+    return manifest.get("codec") or ("gzip" if manifest.get("compressed") else "none")
+
+
+def change_codec_extension(filename: str, source_codec: str, target_codec: str) -> str:
+    """替换文件名中的压缩扩展名，如 backup.sql.gz -> backup.sql.xz"""
+    source_ext = CODEC_EXTENSIONS[source_codec]
+    if source_ext and filename.endswith(source_ext):
+        filename = filename[:-len(source_ext)]
+    return filename + CODEC_EXTENSIONS[target_codec]
+
+
+def recompress_file(source: str, target: str, source_codec: str, target_codec: str,
+                    level: Optional[int] = None, key: Optional[bytes] = None) -> int:
+    """流式解压并以新格式压缩（加密的文件解密后重新加密），返回未压缩字节数"""
+    total = 0
+    with open_codec(source, source_codec, "rb", key=key) as src, \
+            open_codec(target, target_codec, "wb", level, key=key) as dst:
+        while True:
+            chunk = src.read(COPY_CHUNK_SIZE)
+            if not chunk:
+                break
+            dst.write(chunk)
+            total += len(chunk)
+    return total
@@ -1,7 +1,16 @@
 import json
 import os
-from typing import Optional
-from .models import Config, DatabaseConfig, BackupConfig, AppConfig
+from typing import List, Optional
+from .models import Config, DatabaseConfig, BackupConfig, AppConfig, TargetConfig
+from .backup import STORAGE_LAYOUTS
+from .compression import CODEC_LEVELS, CODECS
+from .encryption import EncryptionError, load_encryption_key
+from .retention import RETENTION_POLICIES, gfs_limits, gfs_span_days
+from .storage import MIN_PART_SIZE_MB, STORAGE_BACKENDS
+from .replica import REPLICA_LAG_ACTIONS
+from .schedule_policy import cron_trigger, parse_blackout_window
+from .targets import target_backup_config, validate_targets
+from .throttle import IONICE_CLASSES
 
 
 class ConfigManager:
@@ -99,6 +108,17 @@ class ConfigManager:
             print(f"应用配置更新失败: {e}")
             return False
     
+    def update_targets(self, targets: List[TargetConfig]) -> bool:
+        """更新命名备份目标"""
+        try:
+            if self.config:
+                self.config.targets = targets
+                return self.save_config()
+            return False
+        except Exception as e:
+            print(f"备份目标更新失败: {e}")
+            return False
+    
     def get_config(self) -> Optional[Config]:
         """获取当前配置"""
         return self.config
@@ -141,13 +161,116 @@ class ConfigManager:
             if config.backup.interval_hours <= 0:
                 return False, "备份间隔必须大于0"
             
+            for expr in config.backup.schedule_cron:
+                try:
+                    cron_trigger(expr)
+                except ValueError as e:
+                    return False, f"无效的cron表达式 {expr}: {e}"
+            
+            for window in config.backup.blackout_windows:
+                parse_blackout_window(window)
+            
+            if config.backup.schedule_jitter_seconds is not None and config.backup.schedule_jitter_seconds < 0:
+                return False, "随机延迟不能为负数"
+            
+            if config.backup.quiet_check_interval_s <= 0 or config.backup.quiet_max_delay_minutes < 0:
+                return False, "空闲检测间隔必须大于0，最长等待时间不能为负数"
+            
             if config.backup.max_backups <= 0:
                 return False, "最大备份数量必须大于0"
             
+            if config.backup.max_concurrent_backups < 1:
+                return False, "同时运行的备份数上限必须大于0"
+            
+            if config.backup.global_max_concurrent_backups < 0 or config.backup.host_max_concurrent_backups < 0:
+                return False, "全局和每个主机的备份并发上限不能为负数"
+            
+            if (config.backup.dump_lock_wait_timeout_s < 0 or config.backup.dump_statement_timeout_s < 0
+                    or config.backup.dump_max_retries < 0):
+                return False, "导出的锁等待时间、运行时间上限和重试次数不能为负数"
+            
+            if config.backup.dump_retry_base_delay_s < 0 or config.backup.dump_retry_max_delay_s < 0:
+                return False, "导出重试的等待时间不能为负数"
+            
+            if config.backup.replica_lag_action not in REPLICA_LAG_ACTIONS:
+                return False, f"不支持的副本延迟处理方式: {config.backup.replica_lag_action}"
+            
+            if config.backup.replica_max_lag_s < 0 or config.backup.replica_check_interval_s <= 0:
+                return False, "副本最大延迟不能为负数，检查间隔必须大于0"
+            
+            if config.backup.storage_layout not in STORAGE_LAYOUTS:
+                return False, f"不支持的存储布局: {config.backup.storage_layout}"
+            
+            if config.backup.storage_backend not in STORAGE_BACKENDS:
+                return False, f"不支持的存储后端: {config.backup.storage_backend}"
+            
+            if config.backup.storage_backend == "s3":
+                if not config.backup.s3_bucket:
+                    return False, "使用S3存储时必须配置s3_bucket"
+                if config.backup.s3_part_size_mb < MIN_PART_SIZE_MB:
+                    return False, f"S3分段大小不能小于{MIN_PART_SIZE_MB}MB"
+                if config.backup.s3_max_concurrency < 1:
+                    return False, "S3并行分段数必须大于0"
+                if config.backup.dump_engine != "pg_dump":
+                    return False, "S3存储只支持pg_dump备份引擎"
+            
+            if config.backup.cold_storage_path and (
+                os.path.abspath(config.backup.cold_storage_path) == os.path.abspath(config.backup.storage_path)
+            ):
+                return False, "冷存储目录不能与备份存储目录相同"
+            
+            if config.backup.cold_codec not in CODECS or config.backup.cold_codec == "none":
+                return False, f"不支持的冷存储压缩格式: {config.backup.cold_codec}"
+            
+            min_level, max_level = CODEC_LEVELS[config.backup.cold_codec]
+            if not min_level <= config.backup.cold_compression_level <= max_level:
+                return False, f"{config.backup.cold_codec}的压缩级别必须在{min_level}-{max_level}之间"
+            
+            if config.backup.throttle_read_mb_s < 0 or config.backup.throttle_write_mb_s < 0:
+                return False, "限速不能为负数"
+            
+            if not 0 <= config.backup.dump_nice <= 19:
+                return False, "nice值必须在0-19之间"
+            
+            if config.backup.dump_ionice_class not in IONICE_CLASSES:
+                return False, f"不支持的I/O调度类: {config.backup.dump_ionice_class}"
+            
+            if config.backup.load_aware_throttle and not (
+                config.backup.throttle_read_mb_s or config.backup.throttle_write_mb_s
+            ):
+                return False, "负载感知限速需要至少配置读取或写入限速"
+            
+            if config.backup.encryption_enabled:
+                try:
+                    load_encryption_key(config.backup.encryption_key_file)
+                except (EncryptionError, OSError) as e:
+                    return False, f"加密密钥不可用: {e}"
+            
+            if config.backup.retention_policy not in RETENTION_POLICIES:
+                return False, f"不支持的保留策略: {config.backup.retention_policy}"
+            
+            if config.backup.retention_policy == "gfs" and not any(gfs_limits(config.backup).values()):
+                return False, "GFS保留策略至少需要一个层级的保留数量大于0"
+            
+            if (config.backup.retention_policy == "gfs" and config.backup.cleanup_enabled
+                    and config.backup.cleanup_keep_days < gfs_span_days(config.backup)):
+                print(f"提示: cleanup_keep_days({config.backup.cleanup_keep_days}天)短于GFS保留的时间跨度，"
+                      f"按天清理会跳过GFS保留的备份，只删除其余过期备份")
+            
             # 验证应用配置
             if config.app.port <= 0 or config.app.port > 65535:
                 return False, "端口号必须在1-65535之间"
             
+            # 验证命名目标：名称、覆盖项以及合并后的备份配置
+            validate_targets(config)
+            for target in config.targets:
+                target_config = config.model_copy(update={
+                    "backup": target_backup_config(config.backup, target), "targets": []
+                })
+                valid, message = self.validate_config(target_config)
+                if not valid:
+                    return False, f"目标 {target.name}: {message}"
+            
             return True, "配置验证成功"
         except Exception as e:
             return False, f"配置验证失败: {e}" 
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""备份/恢复操作协调：恢复与备份互斥、备份并发上限、定时备份去重和可见的排队
+
+所有操作按提交顺序排队（先到先得，恢复不会被源源不断的备份饿死）：
+恢复独占数据库，同一数据库的备份之间最多同时运行 max_concurrent_backups 个；
+所有目标的备份共享全局名额和每个数据库主机的名额（按实际导出的主机计算，从副本导出时计入副本），名额不足时按排队顺序依次开始。
+定时备份在同一数据库已有定时备份等待、排队或运行时直接跳过，慢备份不会在身后堆积更多备份。
+协调器为进程级单例，API、调度器使用的各个管理器实例共享同一队列。
+"""
+import asyncio
+import itertools
+import threading
+import uuid
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from .models import OperationStatus
+
+
+MAX_FINISHED_OPERATIONS = 100
+COALESCED_SOURCES = ("scheduled", "trigger")  # 这些来源的备份在已有同类备份未完成时跳过
+ACTIVE_STATES = ("waiting", "queued", "running")
+
+
+class OperationSkipped(Exception):
+    """已有相同的定时备份在等待、排队或运行"""
+    def __init__(self, existing: "Operation"):
+        super().__init__(f"数据库 {existing.database} 已有定时备份 {existing.id} 处于{existing.status}状态")
+        self.existing = existing
+
+
+class Operation:
+    """一次备份或恢复操作
+
+    状态：waiting（定时备份等待时间窗口或数据库空闲）-> queued -> running -> completed/failed
+    """
+    def __init__(self, database: str, kind: str, source: str, description: Optional[str] = None,
+                 max_concurrent: int = 1, host: str = ""):
+        self.id = uuid.uuid4().hex[:12]
+        self.database = database
+        self.host = host
+        self.kind = kind
+        self.source = source
+        self.description = description
+        self.max_concurrent = max(1, max_concurrent)
+        self.status = "waiting"
+        self.sequence = 0
+        self.waiting_reason: Optional[str] = None
+        self.result: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.queued_at: Optional[datetime] = None
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def to_status(self, position: Optional[int] = None) -> OperationStatus:
+        return OperationStatus(
+            operation_id=self.id,
+            database=self.database,
+            host=self.host,
+            kind=self.kind,
+            source=self.source,
+            description=self.description,
+            status=self.status,
+            queue_position=position,
+            waiting_reason=self.waiting_reason,
+            result=self.result,
+            error=self.error,
+            created_at=self.created_at,
+            queued_at=self.queued_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at
+        )
+
+
+class OperationCoordinator:
+    def __init__(self):
+        self.operations: "OrderedDict[str, Operation]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.changed: Optional[asyncio.Condition] = None
+        self.counter = itertools.count(1)
+        self.global_limit = 0
+        self.host_limit = 0
+
+    def configure(self, global_limit: int, host_limit: int):
+        """设置全局和每个主机的备份并发上限（0表示不限制），唤醒因名额不足排队的备份"""
+        self.global_limit = global_limit
+        self.host_limit = host_limit
+        if self.changed is not None:
+            asyncio.ensure_future(self.notify())
+
+    async def notify(self):
+        async with self.changed:
+            self.changed.notify_all()
+
+    def condition(self) -> asyncio.Condition:
+        # 在事件循环中首次使用时创建
+        if self.changed is None:
+            self.changed = asyncio.Condition()
+        return self.changed
+
+    def submit(self, database: str, kind: str, source: str, description: Optional[str] = None,
+               max_concurrent: int = 1, host: str = "") -> Operation:
+        """登记操作（状态为waiting），定时备份与已有的定时备份重复时抛出OperationSkipped"""
+        with self.lock:
+            if kind == "backup" and source in COALESCED_SOURCES:
+                for existing in self.operations.values():
+                    if (existing.database == database and existing.kind == "backup"
+                            and existing.source in COALESCED_SOURCES and existing.status in ACTIVE_STATES):
+                        raise OperationSkipped(existing)
+            operation = Operation(database, kind, source, description, max_concurrent, host)
+            self.operations[operation.id] = operation
+            finished = [op_id for op_id, op in self.operations.items() if op.finished_at]
+            for op_id in finished[:max(0, len(finished) - MAX_FINISHED_OPERATIONS)]:
+                del self.operations[op_id]
+        return operation
+
+    def database_ready(self, operation: Operation, operations: List[Operation]) -> bool:
+        """同一数据库上排在前面的操作都已开始，且与正在运行的操作不冲突"""
+        same_database = [op for op in operations if op.database == operation.database]
+        if any(op.status == "queued" and op.sequence < operation.sequence for op in same_database):
+            return False
+        running = [op for op in same_database if op.status == "running"]
+        if operation.kind == "restore":
+            return not running
+        if any(op.kind == "restore" for op in running):
+            return False
+        return len(running) < operation.max_concurrent
+
+    def has_capacity(self, operation: Operation, operations: List[Operation]) -> bool:
+        """备份占用全局和所在主机的名额，恢复不受名额限制"""
+        if operation.kind != "backup":
+            return True
+        running = [op for op in operations if op.kind == "backup" and op.status == "running"]
+        if self.global_limit and len(running) >= self.global_limit:
+            return False
+        return not self.host_limit or sum(op.host == operation.host for op in running) < self.host_limit
+
+    def can_start(self, operation: Operation) -> bool:
+        operations = list(self.operations.values())
+        if not self.database_ready(operation, operations) or not self.has_capacity(operation, operations):
+            return False
+        if operation.kind != "backup":
+            return True
+        # 名额有限时先到先得：其他数据库上更早排队、同样可以开始的备份优先
+        return not any(
+            op.status == "queued" and op.kind == "backup" and op.sequence < operation.sequence
+            and op.database != operation.database
+            and self.database_ready(op, operations) and self.has_capacity(op, operations)
+            for op in operations
+        )
+
+    @asynccontextmanager
+    async def acquire(self, operation: Operation):
+        """排队直到可以开始，退出时记录结果并唤醒后面的操作"""
+        changed = self.condition()
+        async with changed:
+            operation.status = "queued"
+            operation.waiting_reason = None
+            operation.sequence = next(self.counter)
+            operation.queued_at = datetime.now()
+            if not self.can_start(operation):
+                print(f"{operation.kind}操作 {operation.id} 排队等待数据库 {operation.database} 上的其他操作完成")
+            try:
+                await changed.wait_for(lambda: self.can_start(operation))
+            except BaseException as e:
+                self.finish(operation, e)
+                changed.notify_all()
+                raise
+            operation.status = "running"
+            operation.started_at = datetime.now()
+            changed.notify_all()
+        try:
+            yield operation
+        except BaseException as e:
+            await self.release(operation, e)
+            raise
+        await self.release(operation)
+
+    async def set_host(self, operation: Operation, host: str):
+        """更新操作占用名额的主机（如备份开始时改从另一个节点导出），唤醒等待名额的操作"""
+        changed = self.condition()
+        async with changed:
+            operation.host = host
+            changed.notify_all()
+
+    async def release(self, operation: Operation, error: Optional[BaseException] = None):
+        changed = self.condition()
+        async with changed:
+            self.finish(operation, error)
+            changed.notify_all()
+
+    def finish(self, operation: Operation, error: Optional[BaseException] = None):
+        """记录结果：抛出异常或已记录error（如恢复返回失败结果）时为failed"""
+        if error is not None:
+            operation.error = str(error) or type(error).__name__
+        operation.status = "failed" if operation.error else "completed"
+        operation.finished_at = datetime.now()
+
+    def abandon(self, operation: Operation, error: BaseException):
+        """放弃尚未排队的操作（如定时备份在等待期间被取消），不再阻止后续的定时备份"""
+        if operation.status == "waiting":
+            self.finish(operation, error)
+
+    def get(self, operation_id: str) -> Optional[Operation]:
+        return self.operations.get(operation_id)
+
+    def status(self, operation: Operation) -> OperationStatus:
+        """操作状态，排队中的操作带有在同一数据库队列中的位置"""
+        position = None
+        if operation.status == "queued":
+            with self.lock:
+                operations = list(self.operations.values())
+            position = 1 + sum(1 for op in operations if op.database == operation.database
+                               and op.status == "queued" and op.sequence < operation.sequence)
+        return operation.to_status(position)
+
+    def list(self, active_only: bool = False) -> List[OperationStatus]:
+        """按提交顺序列出操作"""
+        with self.lock:
+            operations = list(self.operations.values())
+        return [self.status(op) for op in operations if not active_only or op.status in ACTIVE_STATES]
+
+
+coordinator = OperationCoordinator()
@@ -0,0 +1,197 @@
+"""备份文件下载：HTTP Range断点续传、ETag条件请求和流式解压
+
+文件按块流式发送，不在内存中保留整个备份：本地文件用pread按块读取（在工作线程中进行，
+每个连接最多缓存一个块）；对象存储中的备份按字节范围并行下载后转发。
+ASGI服务器提供 http.response.zerocopysend 扩展时本地文件改由sendfile零拷贝发送，
+本项目使用的uvicorn不提供该扩展，只有部署在支持它的服务器上时才会走这条路径。
+"""
+import asyncio
+import hashlib
+import os
+from typing import Iterator, Mapping, Optional, Tuple
+
+from starlette.responses import Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from .compression import backup_codec, change_codec_extension, open_codec
+from .metrics import BYTES
+from .models import BackupInfo
+
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+ZERO_COPY_EXTENSION = "http.response.zerocopysend"
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析单个字节范围，返回 (start, end)（end不含）；无法识别、无效或多个范围时返回None表示发送整个文件，
+    起点超出文件大小时抛出RangeNotSatisfiable（416）"""
+    if not header or not header.startswith("bytes="):
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec or "-" not in spec:
+        return None
+    first, last = (part.strip() for part in spec.split("-", 1))
+    try:
+        if not first:
+            # bytes=-N：最后N个字节
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size
+        start = int(first)
+        end = int(last) + 1 if last else size
+    except ValueError:
+        return None
+    if last and end <= start:
+        # last小于first的范围无效，按RFC 7233忽略Range头，发送整个文件
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable()
+    return start, min(end, size)
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match使用弱比较：忽略W/前缀"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+def build_etag(backup_info: BackupInfo, size: int, mtime_ns: int = 0) -> str:
+    """由文件名（压缩格式/分层变化时改变）、大小和修改时间生成强ETag"""
+    base = f"{backup_info.id}:{backup_info.filename}:{size}:{mtime_ns}"
+    return '"' + hashlib.md5(base.encode(), usedforsecurity=False).hexdigest() + '"'
+
+
+def content_disposition(filename: str) -> str:
+    return f'attachment; filename="{filename}"'
+
+
+def iter_reader(reader, length: Optional[int] = None, source=None) -> Iterator[bytes]:
+    """按块读取流（length为空时读到结尾），结束或客户端断开后关闭流及其底层的source"""
+    sent = 0
+    try:
+        while length is None or sent < length:
+            size = DOWNLOAD_CHUNK_SIZE if length is None else min(DOWNLOAD_CHUNK_SIZE, length - sent)
+            chunk = reader.read(size)
+            if not chunk:
+                break
+            sent += len(chunk)
+            yield chunk
+    finally:
+        reader.close()
+        if source is not None:
+            source.close()
+        BYTES.labels("download", "out").inc(sent)
+
+
+class FileRangeResponse(Response):
+    """发送本地文件的一个字节范围"""
+    def __init__(self, path: str, offset: int, length: int, status_code: int = 200,
+                 headers: Optional[Mapping[str, str]] = None, media_type: Optional[str] = None):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers(headers)
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        file = await asyncio.to_thread(open, self.path, 'rb', buffering=0)
+        try:
+            if ZERO_COPY_EXTENSION in scope.get("extensions", {}) and self.length:
+                # 服务器提供zerocopysend扩展时由其调用sendfile，数据不经过Python进程（uvicorn下不会进入此分支）
+                await send({"type": ZERO_COPY_EXTENSION, "file": file, "offset": self.offset,
+                            "count": self.length, "more_body": False})
+                BYTES.labels("download", "out").inc(self.length)
+                return
+            sent = 0
+            try:
+                while True:
+                    chunk = await asyncio.to_thread(
+                        os.pread, file.fileno(), min(DOWNLOAD_CHUNK_SIZE, self.length - sent), self.offset + sent
+                    ) if sent < self.length else b''
+                    if not chunk and sent < self.length:
+                        raise Exception(f"备份文件在发送过程中被截断: {self.path}")
+                    sent += len(chunk)
+                    # send在客户端接收缓慢时等待（流量控制），内存中最多保留一个块
+                    await send({"type": "http.response.body", "body": chunk, "more_body": sent < self.length})
+                    if sent >= self.length:
+                        break
+            finally:
+                BYTES.labels("download", "out").inc(sent)
+        finally:
+            file.close()
+
+
+def build_download_response(manager, backup_info: BackupInfo, request_headers: Mapping[str, str],
+                            decompress: bool = False) -> Response:
+    """根据请求头构造下载响应（包含stat/HEAD等阻塞调用，应在工作线程中执行）"""
+    storage, key = manager.get_payload_storage(backup_info)
+    path = storage.local_path(key)
+    if path is not None:
+        stat_result = os.stat(path)
+        size, mtime_ns = stat_result.st_size, stat_result.st_mtime_ns
+    else:
+        size, mtime_ns = storage.size(key), 0
+    codec = backup_codec(backup_info)
+    etag = build_etag(backup_info, size, mtime_ns)
+
+    if decompress and (codec != "none" or backup_info.encrypted):
+        # 边解密解压边发送，长度未知，不支持Range
+        key = manager.get_encryption_key(backup_info)
+        etag = etag[:-1] + '-sql"'
+        headers = {
+            "etag": etag,
+            "accept-ranges": "none",
+            "content-disposition": content_disposition(change_codec_extension(backup_info.filename, codec, "none")),
+        }
+        if etag_matches(request_headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers={"etag": etag})
+        if path is not None:
+            chunks = iter_reader(open_codec(path, codec, 'rb', key=key))
+        else:
+            # 解压流不会关闭传入的底层流，需要单独关闭
+            reader = storage.open_reader(key)
+            chunks = iter_reader(open_codec(reader, codec, 'rb', key=key), source=reader)
+        return StreamingResponse(chunks, headers=headers, media_type="application/sql")
+
+    headers = {
+        "etag": etag,
+        "accept-ranges": "bytes",
+        "content-disposition": content_disposition(backup_info.filename),
+    }
+    if etag_matches(request_headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"etag": etag})
+
+    byte_range = None
+    if_range = request_headers.get("if-range")
+    # If-Range与当前ETag不一致说明文件已变化，忽略Range重新发送整个文件
+    if not if_range or if_range.strip() == etag:
+        try:
+            byte_range = parse_range(request_headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"content-range": f"bytes */{size}", "etag": etag})
+
+    status_code = 200
+    start, end = 0, size
+    if byte_range:
+        start, end = byte_range
+        status_code = 206
+        headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+
+    media_type = "application/sql" if codec == "none" and not backup_info.encrypted else "application/octet-stream"
+    if path is not None:
+        return FileRangeResponse(path, start, end - start, status_code, headers, media_type)
+    headers["content-length"] = str(end - start)
+    return StreamingResponse(iter_reader(storage.open_reader(key, start, end), end - start),
+                             status_code=status_code, headers=headers, media_type=media_type)
@@ -0,0 +1,56 @@
+"""导出失败的分类与重试退避
+
+迁移等操作持有ACCESS EXCLUSIVE锁时，pg_dump在 --lock-wait-timeout 后放弃（并行COPY的连接使用lock_timeout），
+这类锁超时和连接中断是暂时性的，按指数退避加随机抖动重试；语句超时和其他错误不重试。
+"""
+import random
+from typing import Optional
+
+import psycopg2
+
+
+RETRYABLE_DUMP_ERRORS = ("lock_timeout", "connection")
+LOCK_NOT_AVAILABLE = "55P03"
+QUERY_CANCELED = "57014"
+
+
+class DumpError(Exception):
+    """pg_dump执行失败，kind为失败分类"""
+    def __init__(self, message: str, kind: Optional[str] = None):
+        super().__init__(message)
+        self.kind = kind or classify_dump_message(message)
+
+
+def classify_dump_message(message: str) -> str:
+    """根据pg_dump的错误输出分类"""
+    lowered = message.lower()
+    # pg_dump的锁等待超时通过statement_timeout实现，报错的语句为LOCK TABLE
+    if ("lock timeout" in lowered or "could not obtain lock" in lowered
+            or ("statement timeout" in lowered and "lock table" in lowered)):
+        return "lock_timeout"
+    if "statement timeout" in lowered:
+        return "statement_timeout"
+    if ("could not connect" in lowered or "connection to server" in lowered
+            or "server closed the connection" in lowered or "terminating connection" in lowered):
+        return "connection"
+    return "error"
+
+
+def classify_dump_error(error: BaseException) -> str:
+    """导出失败分类：lock_timeout、statement_timeout、connection 或 error"""
+    if isinstance(error, DumpError):
+        return error.kind
+    if isinstance(error, psycopg2.Error):
+        if error.pgcode == LOCK_NOT_AVAILABLE:
+            return "lock_timeout"
+        if error.pgcode == QUERY_CANCELED:
+            return classify_dump_message(str(error))
+        if isinstance(error, psycopg2.OperationalError) and error.pgcode is None:
+            return "connection"
+    return classify_dump_message(str(error))
+
+
+def backoff_delay(retry: int, base: float, maximum: float) -> float:
+    """第retry次重试前的等待秒数：指数增长到maximum，取其一半加一半以内的随机抖动，避免多个备份同时重试"""
+    delay = min(maximum, base * 2 ** (retry - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
@@ -0,0 +1,78 @@
+import mmap
+import os
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, NamedTuple, Union
+
+from .sql_filter import STREAM_CHUNK_SIZE
+
+
+# COPY头部只在找到的行上匹配，不对整个文件运行正则
+COPY_HEADER = re.compile(rb'COPY public\.(\w+)\s*\(([^)]+)\)\s*FROM stdin;')
+COPY_PREFIX = b'COPY '
+# COPY文本格式中数据里的反斜杠会被转义，行首的 \. 只可能是结束标记
+COPY_END = b'\n\\.'
+
+Buffer = Union[bytes, mmap.mmap]
+
+
+class CopyBlock(NamedTuple):
+    """纯文本备份中的一个COPY数据块，data为不含结束标记的数据行（零拷贝切片）"""
+    table: str
+    columns: List[str]
+    data: memoryview
+    offset: int
+
+
+@contextmanager
+def map_file(path: str) -> Iterator[Buffer]:
+    """只读mmap整个文件，空文件返回空bytes（mmap不支持长度为0的映射）"""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            mm.madvise(mmap.MADV_SEQUENTIAL)
+        except (AttributeError, OSError):
+            pass
+        try:
+            yield mm
+        finally:
+            try:
+                mm.close()
+            except BufferError:
+                # 仍有切片被引用（例如异常栈帧中），等引用释放后由垃圾回收解除映射
+                pass
+
+
+def iter_copy_blocks(buf: Buffer) -> Iterator[CopyBlock]:
+    """用find定位各COPY块的边界，逐块返回零拷贝切片"""
+    view = memoryview(buf)
+    size = len(buf)
+    pos = 0
+    while pos < size:
+        start = buf.find(COPY_PREFIX, pos)
+        if start < 0:
+            return
+        header_end = buf.find(b'\n', start)
+        if header_end < 0:
+            return
+        match = COPY_HEADER.match(buf, start, header_end) if start == 0 or buf[start - 1] == 0x0a else None
+        if not match:
+            pos = header_end + 1
+            continue
+        # 从头部换行处开始查找，空表（紧跟 \.）时得到空切片
+        end = buf.find(COPY_END, header_end)
+        if end < 0:
+            return
+        columns = [col.strip().strip('"') for col in match.group(2).decode('utf-8').split(',')]
+        yield CopyBlock(match.group(1).decode('utf-8'), columns, view[header_end + 1:end], start)
+        pos = end + len(COPY_END)
+
+
+def iter_slices(buf: Buffer, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[memoryview]:
+    """按固定大小返回零拷贝切片，用于直接写入psql"""
+    view = memoryview(buf)
+    for offset in range(0, len(buf), chunk_size):
+        yield view[offset:offset + chunk_size]
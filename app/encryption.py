@@ -0,0 +1,210 @@
+"""备份文件静态加密：分块AES-256-GCM流式加解密
+
+加密位于压缩和存储之间，按块处理，不缓存整个文件。文件格式：
+
+    头部   MAGIC(8) | 块大小(4) | nonce前缀(8) | 密钥ID(8)
+    数据块 密文长度(4) | 密文+16字节认证标签
+
+每块的nonce为 nonce前缀 + 块序号(4)，附加认证数据为 头部 + 块序号 + 结束标记，
+块被修改、重排、截断或在结束块之后追加数据都会在解密（或校验）时发现。
+密钥为32字节，来自环境变量 PGBACKUP_ENCRYPTION_KEY 或 encryption_key_file（base64编码或原始32字节）。
+"""
+import base64
+import binascii
+import hashlib
+import io
+import os
+import secrets
+import struct
+from typing import Optional
+
+
+ENCRYPTION_KEY_ENV = "PGBACKUP_ENCRYPTION_KEY"
+MAGIC = b"PGBENC01"
+HEADER = struct.Struct(">8sI8s8s")
+CHUNK_LENGTH = struct.Struct(">I")
+CHUNK_AAD = struct.Struct(">IB")
+KEY_SIZE = 32
+TAG_SIZE = 16
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+MAX_CHUNKS = 2 ** 32  # 块序号占4字节
+
+
+class EncryptionError(ValueError):
+    """密钥错误、数据损坏或格式不正确"""
+
+
+def new_cipher(key: bytes):
+    try:
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+    except ImportError:
+        raise EncryptionError("备份加密需要安装cryptography: pip install cryptography")
+    return AESGCM(key)
+
+
+def key_id(key: bytes) -> str:
+    """密钥指纹，写入文件头和备份信息，用于提示密钥不匹配（不泄露密钥）"""
+    return hashlib.sha256(key).hexdigest()[:16]
+
+
+def parse_key(data: bytes) -> bytes:
+    if len(data) == KEY_SIZE:
+        return data
+    try:
+        key = base64.b64decode(data.strip(), validate=True)
+    except binascii.Error:
+        key = b''
+    if len(key) != KEY_SIZE:
+        raise EncryptionError("加密密钥必须是32字节（或其base64编码）")
+    return key
+
+
+def load_encryption_key(key_file: str = "") -> bytes:
+    """读取加密密钥：环境变量优先，其次密钥文件"""
+    value = os.environ.get(ENCRYPTION_KEY_ENV)
+    if value:
+        return parse_key(value.encode())
+    if key_file:
+        with open(key_file, 'rb') as f:
+            return parse_key(f.read())
+    raise EncryptionError(f"未配置加密密钥：请设置环境变量 {ENCRYPTION_KEY_ENV} 或 encryption_key_file")
+
+
+def generate_key() -> str:
+    """生成base64编码的随机密钥"""
+    return base64.b64encode(secrets.token_bytes(KEY_SIZE)).decode()
+
+
+class EncryptingWriter:
+    """加密写入流：攒满一块后加密写入底层流，close时写入结束块（不关闭底层流）"""
+    def __init__(self, fileobj, key: bytes, chunk_size: int = DEFAULT_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.cipher = new_cipher(key)
+        self.chunk_size = chunk_size
+        self.nonce_prefix = secrets.token_bytes(8)
+        self.header = HEADER.pack(MAGIC, chunk_size, self.nonce_prefix, bytes.fromhex(key_id(key)))
+        self.buffer = bytearray()
+        self.index = 0
+        self.closed = False
+        self.bytes_written = len(self.header)
+        fileobj.write(self.header)
+
+    def write(self, data) -> int:
+        self.buffer += data
+        if len(self.buffer) > self.chunk_size:
+            # 直接加密缓冲区中的切片，避免复制；保留至少一个字节，保证最后写入的是结束块
+            offset = 0
+            with memoryview(self.buffer) as view:
+                while len(self.buffer) - offset > self.chunk_size:
+                    self.write_chunk(view[offset:offset + self.chunk_size], final=False)
+                    offset += self.chunk_size
+            del self.buffer[:offset]
+        return len(data)
+
+    def write_chunk(self, data, final: bool):
+        if self.index >= MAX_CHUNKS:
+            raise EncryptionError("加密块数量超过上限")
+        nonce = self.nonce_prefix + struct.pack(">I", self.index)
+        ciphertext = self.cipher.encrypt(nonce, data, self.header + CHUNK_AAD.pack(self.index, final))
+        self.fileobj.write(CHUNK_LENGTH.pack(len(ciphertext)))
+        self.fileobj.write(ciphertext)
+        self.bytes_written += CHUNK_LENGTH.size + len(ciphertext)
+        self.index += 1
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.write_chunk(bytes(self.buffer), final=True)
+            self.buffer.clear()
+
+
+class DecryptingReader(io.RawIOBase):
+    """解密读取流：逐块读取并校验，数据损坏、密钥错误或文件被截断时抛出EncryptionError"""
+    def __init__(self, fileobj, key: bytes):
+        super().__init__()
+        self.fileobj = fileobj
+        self.cipher = new_cipher(key)
+        self.header = self.read_exact(HEADER.size, "文件头")
+        magic, self.chunk_size, self.nonce_prefix, file_key_id = HEADER.unpack(self.header)
+        if magic != MAGIC:
+            raise EncryptionError("不是加密的备份文件")
+        if file_key_id.hex() != key_id(key):
+            raise EncryptionError(f"密钥不匹配：文件使用密钥 {file_key_id.hex()}，当前密钥为 {key_id(key)}")
+        self.index = 0
+        self.finished = False
+        self.current = memoryview(b'')
+        self.position = 0
+
+    def read_exact(self, size: int, what: str) -> bytes:
+        data = self.fileobj.read(size)
+        if len(data) == size or not data:
+            if len(data) != size:
+                raise EncryptionError(f"加密数据不完整：读取{what}时文件提前结束")
+            return data
+        data = bytearray(data)
+        while len(data) < size:
+            chunk = self.fileobj.read(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        if len(data) != size:
+            raise EncryptionError(f"加密数据不完整：读取{what}时文件提前结束")
+        return bytes(data)
+
+    def read_chunk(self) -> bytes:
+        length_bytes = self.fileobj.read(CHUNK_LENGTH.size)
+        if not length_bytes:
+            raise EncryptionError(f"加密数据不完整：第 {self.index} 块之后缺少结束块")
+        if len(length_bytes) < CHUNK_LENGTH.size:
+            length_bytes += self.read_exact(CHUNK_LENGTH.size - len(length_bytes), "块长度")
+        (length,) = CHUNK_LENGTH.unpack(length_bytes)
+        if length < TAG_SIZE or length > self.chunk_size + TAG_SIZE:
+            raise EncryptionError(f"加密数据块 {self.index} 长度异常: {length}")
+        ciphertext = self.read_exact(length, f"数据块 {self.index} ")
+        nonce = self.nonce_prefix + struct.pack(">I", self.index)
+        from cryptography.exceptions import InvalidTag
+        # 只有结束块可能小于块大小，按可能性先后校验两种结束标记；认证标签同时确认了结束标记
+        for final in ((False, True) if length == self.chunk_size + TAG_SIZE else (True, False)):
+            try:
+                plaintext = self.cipher.decrypt(nonce, ciphertext, self.header + CHUNK_AAD.pack(self.index, final))
+                break
+            except InvalidTag:
+                continue
+        else:
+            raise EncryptionError(f"加密数据块 {self.index} 校验失败（数据已损坏或被篡改）")
+        self.index += 1
+        if final:
+            self.finished = True
+            if self.fileobj.read(1):
+                raise EncryptionError("加密数据的结束块之后存在多余数据")
+        return plaintext
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self.current:
+            if self.finished:
+                return 0
+            self.current = memoryview(self.read_chunk())
+        count = min(len(buffer), len(self.current))
+        buffer[:count] = self.current[:count]
+        self.current = self.current[count:]
+        self.position += count
+        return count
+
+    def tell(self) -> int:
+        """已读取的明文字节数（不支持seek）"""
+        return self.position
+
+
+def open_decrypting(fileobj, key: bytes) -> io.BufferedReader:
+    """带缓冲的解密读取流（支持高效的readline）"""
+    return io.BufferedReader(DecryptingReader(fileobj, key), buffer_size=DEFAULT_CHUNK_SIZE)
+
+
+def is_encrypted(head: bytes) -> bool:
+    return head.startswith(MAGIC)
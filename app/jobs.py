@@ -0,0 +1,153 @@
+import asyncio
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from typing import Dict, List, Optional
+from .models import BackupInfo, DeletionJobStatus
+
+
+DELETE_WORKERS = 4
+MAX_FINISHED_JOBS = 100
+
+# 保存后台任务的引用，避免任务在完成前被垃圾回收
+_background_tasks = set()
+
+
+def run_in_background(func, *args, description: str = "后台任务") -> asyncio.Task:
+    """在工作线程中异步执行同步函数，不阻塞调用方（需在事件循环中调用）"""
+    async def run():
+        try:
+            await asyncio.to_thread(func, *args)
+        except Exception as e:
+            print(f"{description}失败: {e}")
+
+    task = asyncio.get_running_loop().create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+def catalog_key(manager) -> str:
+    """区分备份目标的键：各目标的备份目录互不相同"""
+    return os.path.abspath(manager.backup_config.storage_path)
+
+
+class KeyedLocks:
+    """按键区分的锁（如每个备份目录一个），不同键之间互不阻塞"""
+    def __init__(self):
+        self.locks: Dict[str, threading.Lock] = {}
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> threading.Lock:
+        with self.lock:
+            return self.locks.setdefault(key, threading.Lock())
+
+
+# 修改备份信息文件（删除、分层后改写）时持有所在备份目录的锁，避免删除后又被写回
+catalog_locks = KeyedLocks()
+
+
+class DeletionJob:
+    """后台批量删除任务
+
+    先一次性移除所有目标备份的元数据文件（备份立即从列表中消失），
+    再用线程池并行删除备份文件，避免网络存储上逐个删除大文件阻塞请求。
+    """
+    def __init__(self, kind: str, backups: List[BackupInfo], missing: Optional[List[str]] = None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.backups = backups
+        self.status = "pending"
+        self.deleted: List[str] = []
+        self.failed: List[dict] = [{"backup_id": backup_id, "error": "备份不存在"} for backup_id in missing or []]
+        self.bytes_reclaimed = 0
+        self.error: Optional[str] = None
+        self.created_at = datetime.now()
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+    def run(self, manager):
+        self.status = "running"
+        self.started_at = datetime.now()
+        try:
+            # 按删除时的备份信息删除文件（期间可能已被移动到冷存储）
+            removed = manager.remove_backup_infos([backup.id for backup in self.backups])
+            self.backups = [removed.get(backup.id) or backup for backup in self.backups]
+            with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+                futures = {executor.submit(manager.delete_backup_payload, backup): backup for backup in self.backups}
+                for future in as_completed(futures):
+                    backup = futures[future]
+                    try:
+                        future.result()
+                        self.deleted.append(backup.id)
+                        self.bytes_reclaimed += backup.size
+                    except Exception as e:
+                        # 元数据已删除，记录残留文件路径以便手动清理
+                        self.failed.append({"backup_id": backup.id, "error": f"删除文件 {backup.filename} 失败: {e}"})
+            manager.remove_empty_partitions([backup.id for backup in self.backups])
+            self.status = "completed"
+        except Exception as e:
+            self.error = str(e)
+            self.status = "failed"
+            print(f"后台删除任务 {self.id} 失败: {e}")
+        finally:
+            self.finished_at = datetime.now()
+        print(f"后台删除任务 {self.id}({self.kind}) 结束: 删除 {len(self.deleted)} 个，失败 {len(self.failed)} 个")
+
+    def to_status(self) -> DeletionJobStatus:
+        return DeletionJobStatus(
+            job_id=self.id,
+            kind=self.kind,
+            status=self.status,
+            total=len(self.backups),
+            deleted_count=len(self.deleted),
+            failed_count=len(self.failed),
+            bytes_reclaimed=self.bytes_reclaimed,
+            deleted=list(self.deleted),
+            failed=list(self.failed),
+            error=self.error,
+            created_at=self.created_at,
+            started_at=self.started_at,
+            finished_at=self.finished_at
+        )
+
+
+class JobRegistry:
+    """进程内的后台删除任务登记表，只保留最近的任务"""
+    def __init__(self):
+        self.jobs: "OrderedDict[str, DeletionJob]" = OrderedDict()
+        self.lock = threading.Lock()
+
+    def register(self, job: DeletionJob) -> DeletionJob:
+        with self.lock:
+            self.jobs[job.id] = job
+            finished = [job_id for job_id, j in self.jobs.items() if j.finished_at]
+            for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+                del self.jobs[job_id]
+        return job
+
+    def submit(self, manager, kind: str, backups: List[BackupInfo],
+               missing: Optional[List[str]] = None) -> DeletionJob:
+        """登记任务并在工作线程中执行，立即返回任务句柄（需在事件循环中调用）"""
+        job = self.register(DeletionJob(kind, backups, missing))
+        run_in_background(job.run, manager, description=f"后台删除任务 {job.id}")
+        return job
+
+    def run_inline(self, manager, kind: str, backups: List[BackupInfo]) -> DeletionJob:
+        """登记任务并在当前线程中执行（供已在后台线程中运行的清理使用）"""
+        job = self.register(DeletionJob(kind, backups))
+        job.run(manager)
+        return job
+
+    def get(self, job_id: str) -> Optional[DeletionJob]:
+        return self.jobs.get(job_id)
+
+    def list(self) -> List[DeletionJob]:
+        with self.lock:
+            return list(reversed(self.jobs.values()))
+
+
+job_registry = JobRegistry()
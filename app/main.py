@@ -1,25 +1,41 @@
+import asyncio
 import json
 import os
+import time
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, Response, FileResponse
 from fastapi.requests import Request
-from typing import List, Optional
-from datetime import datetime
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from typing import Callable, Dict, List, Optional, Tuple
+from datetime import date, datetime
 
 from .models import (
-    Config, BackupInfo, BackupRequest, BackupResponse, 
+    Config, BackupInfo, BackupStatus, BackupRequest, BackupResponse, 
     RestoreRequest, RestoreResponse, ScheduleStatus,
     DatabaseConfigUpdate, BackupConfigUpdate, AppConfigUpdate,
     ConfigTestRequest, ConfigTestResponse, ConfigUpdateResponse,
-    CleanupResponse, BatchDeleteRequest
+    CleanupResponse, BatchDeleteRequest, RetentionPreview, DeletionJobStatus,
+    ThrottleStatus, ThrottleUpdate, TieringStatus, OperationStatus,
+    TargetConfig, TargetStatus, TargetUpdate
 )
 from .backup import BackupManager
 from .restore import RestoreManager
-from .scheduler import BackupScheduler
+from .scheduler import DEFAULT_TARGET, BackupScheduler
 from .config_manager import ConfigManager
+from .coordinator import Operation, OperationSkipped, coordinator
+from .download import build_download_response
+from .encryption import EncryptionError
+from .jobs import catalog_key, job_registry
+from .upload import BackupImporter
+from .verify import verify_backup
+from . import tiering
+from .metrics import HTTP_LATENCY, catalog_collector
+from .retention import RETENTION_POLICIES, plan_retention, schedule_prune
+from .targets import BackupTarget, iter_targets
+from .throttle import io_throttle
 
 
 # 全局变量
@@ -27,6 +43,7 @@ config_manager: Optional[ConfigManager] = None
 backup_manager: Optional[BackupManager] = None
 restore_manager: Optional[RestoreManager] = None
 scheduler: Optional[BackupScheduler] = None
+targets: Dict[str, BackupTarget] = {}  # 命名备份目标，默认目标使用上面的管理器
 
 
 def get_config_manager() -> ConfigManager:
@@ -36,8 +53,17 @@ def get_config_manager() -> ConfigManager:
     return config_manager
 
 
-def get_backup_manager() -> BackupManager:
-    """获取备份管理器实例"""
+def get_target(name: str) -> BackupTarget:
+    """获取命名备份目标"""
+    if name not in targets:
+        raise HTTPException(status_code=404, detail=f"备份目标不存在: {name}")
+    return targets[name]
+
+
+def get_backup_manager(target: Optional[str] = None) -> BackupManager:
+    """获取备份管理器实例，target为空时使用默认目标"""
+    if target and target != DEFAULT_TARGET:
+        return get_target(target).backup_manager
     if backup_manager is None:
         raise HTTPException(
             status_code=503, 
@@ -46,8 +72,10 @@ def get_backup_manager() -> BackupManager:
     return backup_manager
 
 
-def get_restore_manager() -> RestoreManager:
-    """获取恢复管理器实例"""
+def get_restore_manager(target: Optional[str] = None) -> RestoreManager:
+    """获取恢复管理器实例，target为空时使用默认目标"""
+    if target and target != DEFAULT_TARGET:
+        return get_target(target).restore_manager
     if restore_manager is None:
         raise HTTPException(
             status_code=503, 
@@ -56,8 +84,10 @@ def get_restore_manager() -> RestoreManager:
     return restore_manager
 
 
-def get_scheduler() -> BackupScheduler:
-    """获取调度器实例"""
+def get_scheduler(target: Optional[str] = None) -> BackupScheduler:
+    """获取调度器实例，target为空时使用默认目标"""
+    if target and target != DEFAULT_TARGET:
+        return get_target(target).scheduler
     if scheduler is None:
         raise HTTPException(
             status_code=503, 
@@ -74,6 +104,14 @@ async def lifespan(app: FastAPI):
     # 启动时初始化
     config_manager = ConfigManager()
     config = config_manager.get_config()
+    if config:
+        io_throttle.configure(config.backup)
+        coordinator.configure(config.backup.global_max_concurrent_backups, config.backup.host_max_concurrent_backups)
+        # 命名目标各自连接数据库，不可用时只影响该目标的备份
+        try:
+            await sync_targets(config)
+        except ValueError as e:
+            print(f"⚠️ 备份目标配置无效: {e}")
     
     # 检查数据库是否可用
     if config and config_manager.is_database_available():
@@ -97,6 +135,8 @@ async def lifespan(app: FastAPI):
     # 关闭时清理
     if scheduler:
         await scheduler.stop()
+    for target in targets.values():
+        await target.scheduler.stop()
 
 
 # 创建FastAPI应用
@@ -111,6 +151,32 @@ app = FastAPI(
 app.mount("/static", StaticFiles(directory="static"), name="static")
 templates = Jinja2Templates(directory="templates")
 
+def list_catalogs() -> Dict[str, Tuple[str, Callable[[], List[BackupInfo]]]]:
+    """各备份目标的备份目录键和扫描备份列表的函数"""
+    managers = {name: target.backup_manager for name, target in targets.items()}
+    if backup_manager:
+        managers[DEFAULT_TARGET] = backup_manager
+    return {name: (catalog_key(manager), manager.get_backup_list) for name, manager in managers.items()}
+
+
+# 抓取指标时通过当前的备份管理器统计备份目录（只有首次抓取时扫描）
+catalog_collector.source = list_catalogs
+
+
+@app.middleware("http")
+async def record_http_latency(request: Request, call_next):
+    """按路由模板统计HTTP请求耗时"""
+    start = time.monotonic()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        route = request.scope.get("route")
+        route_path = getattr(route, "path", "unmatched")
+        HTTP_LATENCY.labels(request.method, route_path, str(status)).observe(time.monotonic() - start)
+
 
 # API路由
 @app.get("/", response_class=HTMLResponse)
@@ -280,9 +346,13 @@ async def test_close_confirm():
 
 
 @app.get("/api/backups", response_model=List[BackupInfo])
-async def get_backups(manager: BackupManager = Depends(get_backup_manager)):
-    """获取备份列表"""
-    return manager.get_backup_list()
+async def get_backups(
+    since: Optional[date] = None,
+    until: Optional[date] = None,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """获取备份列表，可按日期范围（含两端）过滤"""
+    return manager.get_backup_list(since, until)
 
 
 @app.post("/api/backups", response_model=BackupResponse)
@@ -291,25 +361,56 @@ async def create_backup(
     background_tasks: BackgroundTasks,
     manager: BackupManager = Depends(get_backup_manager)
 ):
-    """创建备份"""
+    """创建备份：同一数据库上有恢复或其他备份在运行时排队，wait=false时排队后立即返回操作ID"""
+    operation = manager.submit_backup("manual", request.description)
+    if not request.wait:
+        background_tasks.add_task(run_backup_operation, manager, request, operation)
+        return BackupResponse(
+            success=True,
+            message=f"备份已提交，可通过 /api/operations/{operation.id} 查看进度",
+            operation_id=operation.id
+        )
     try:
-        # 在后台任务中执行备份
-        backup_info = await manager.create_backup(request.description, request.compress)
+        backup_info = await manager.create_backup(
+            request.description,
+            request.compress,
+            request.engine,
+            profile=request.profile,
+            profile_memory=request.profile_memory,
+            operation=operation
+        )
         
         return BackupResponse(
             success=True,
             message="备份创建成功",
             backup_id=backup_info.id,
-            data=backup_info
+            data=backup_info,
+            operation_id=operation.id
         )
     except Exception as e:
         return BackupResponse(
             success=False,
             message=f"备份创建失败: {str(e)}",
-            backup_id=None
+            backup_id=None,
+            operation_id=operation.id
         )
 
 
+async def run_backup_operation(manager: BackupManager, request: BackupRequest, operation: Operation):
+    """在后台执行已提交的备份，结果记录在操作状态中"""
+    try:
+        await manager.create_backup(
+            request.description,
+            request.compress,
+            request.engine,
+            profile=request.profile,
+            profile_memory=request.profile_memory,
+            operation=operation
+        )
+    except Exception as e:
+        print(f"后台备份 {operation.id} 失败: {e}")
+
+
 @app.get("/api/backups/{backup_id}", response_model=BackupInfo)
 async def get_backup(
     backup_id: str,
@@ -322,6 +423,106 @@ async def get_backup(
     return backup_info
 
 
+@app.post("/api/backups/upload", response_model=BackupResponse)
+async def upload_backup(
+    request: Request,
+    description: Optional[str] = None,
+    filename: Optional[str] = None,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """导入外部的纯文本pg_dump备份（可压缩），请求体为文件内容或multipart的file字段，边接收边写入存储"""
+    importer = BackupImporter(manager, description, filename)
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith("multipart/form-data"):
+            await importer.receive_multipart(request.stream(), content_type)
+        else:
+            await importer.receive(request.stream())
+        backup_info = await asyncio.to_thread(importer.finish)
+    except Exception as e:
+        await asyncio.to_thread(importer.abort, e)
+        if isinstance(e, ValueError):
+            raise HTTPException(status_code=400, detail=str(e))
+        raise HTTPException(status_code=500, detail=f"导入备份失败: {e}")
+    return BackupResponse(
+        success=True,
+        message=f"导入备份 {backup_info.id} 成功",
+        backup_id=backup_info.id,
+        data=backup_info
+    )
+
+
+@app.get("/api/backups/{backup_id}/download")
+async def download_backup(
+    backup_id: str,
+    request: Request,
+    decompress: bool = False,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """下载备份文件，支持Range断点续传和If-None-Match；decompress=true时边解压边发送纯SQL"""
+    backup_info = manager.load_backup_info(backup_id)
+    if not backup_info:
+        raise HTTPException(status_code=404, detail="备份不存在")
+    if backup_info.status != BackupStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"备份状态不正确: {backup_info.status}")
+    if backup_info.format == "parallel_copy":
+        raise HTTPException(status_code=400, detail="并行COPY备份为目录格式，不支持下载")
+    try:
+        return await asyncio.to_thread(build_download_response, manager, backup_info, request.headers, decompress)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="备份文件不存在")
+    except EncryptionError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.post("/api/backups/{backup_id}/verify")
+async def verify_backup_file(
+    backup_id: str,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """校验备份完整性：逐块解密并解压，报告损坏的数据块或不一致的校验和"""
+    backup_info = manager.load_backup_info(backup_id)
+    if not backup_info:
+        raise HTTPException(status_code=404, detail="备份不存在")
+    if backup_info.status != BackupStatus.COMPLETED:
+        raise HTTPException(status_code=409, detail=f"备份状态不正确: {backup_info.status}")
+    try:
+        return await asyncio.to_thread(verify_backup, manager, backup_info)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="备份文件不存在")
+    except EncryptionError as e:
+        # 密钥未配置或与备份不一致
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/api/backups/{backup_id}/profiles")
+async def list_backup_profiles(
+    backup_id: str,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """列出备份/恢复运行的性能剖析结果文件"""
+    backup_info = manager.load_backup_info(backup_id)
+    if not backup_info:
+        raise HTTPException(status_code=404, detail="备份不存在")
+    return {"backup_id": backup_id, "files": backup_info.profile_files}
+
+
+@app.get("/api/backups/{backup_id}/profiles/{name}")
+async def download_backup_profile(
+    backup_id: str,
+    name: str,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """下载性能剖析结果文件（.pstats可用pstats/snakeviz查看）"""
+    backup_info = manager.load_backup_info(backup_id)
+    if not backup_info:
+        raise HTTPException(status_code=404, detail="备份不存在")
+    profile_path = manager.get_profile_path(backup_info, name)
+    if not profile_path or not os.path.exists(profile_path):
+        raise HTTPException(status_code=404, detail="剖析文件不存在")
+    return FileResponse(profile_path, filename=name)
+
+
 @app.delete("/api/backups/{backup_id}")
 async def delete_backup(
     backup_id: str,
@@ -332,7 +533,7 @@ async def delete_backup(
     if not backup_info:
         raise HTTPException(status_code=404, detail="备份不存在")
     
-    manager.delete_backup(backup_id)
+    await asyncio.to_thread(manager.delete_backup_files, backup_info)
     return {"success": True, "message": f"备份 {backup_id} 已删除"}
 
 
@@ -341,24 +542,22 @@ async def batch_delete_backups(
     request: BatchDeleteRequest,
     manager: BackupManager = Depends(get_backup_manager)
 ):
-    """批量删除备份"""
+    """批量删除备份（后台执行，立即返回任务ID）"""
     if not request.backup_ids:
         raise HTTPException(status_code=400, detail="请选择要删除的备份")
     
-    result = manager.delete_backups_batch(request.backup_ids)
+    backups, missing = await asyncio.to_thread(manager.load_backup_infos, request.backup_ids)
+    job = job_registry.submit(manager, "batch_delete", backups, missing)
     
-    if result["failed_count"] > 0:
-        return {
-            "success": False,
-            "message": f"删除完成：成功 {result['successful_count']} 个，失败 {result['failed_count']} 个",
-            "data": result
-        }
-    else:
-        return {
-            "success": True,
-            "message": f"成功删除 {result['successful_count']} 个备份",
-            "data": result
-        }
+    message = f"已提交后台删除任务：{len(backups)} 个备份"
+    if missing:
+        message += f"，{len(missing)} 个备份不存在"
+    return {
+        "success": not missing,
+        "message": message,
+        "job_id": job.id,
+        "data": job.to_status()
+    }
 
 
 @app.post("/api/restore", response_model=RestoreResponse)
@@ -371,7 +570,9 @@ async def restore_backup(
         result = await manager.restore_backup(
             request.backup_id, 
             request.restore_type, 
-            request.force
+            request.force,
+            profile=request.profile,
+            profile_memory=request.profile_memory
         )
         return result
     except Exception as e:
@@ -444,9 +645,12 @@ async def stop_schedule(
 async def trigger_backup(
     scheduler: BackupScheduler = Depends(get_scheduler)
 ):
-    """手动触发备份"""
-    await scheduler.trigger_backup()
-    return {"success": True, "message": "备份任务已触发"}
+    """手动触发备份，在后台排队执行；已有定时备份未完成时不重复触发"""
+    try:
+        operation = scheduler.trigger_backup()
+    except OperationSkipped as e:
+        return {"success": False, "message": f"已跳过: {e}", "operation_id": e.existing.id}
+    return {"success": True, "message": "备份任务已触发", "operation_id": operation.id}
 
 
 @app.post("/api/schedule/update")
@@ -520,7 +724,9 @@ async def update_database_config(
             port=request.port,
             database=request.database,
             username=request.username,
-            password=request.password
+            password=request.password,
+            replica_host=request.replica_host,
+            replica_port=request.replica_port
         )
         
         # 先测试连接
@@ -561,16 +767,11 @@ async def update_backup_config(
 ):
     """更新备份配置"""
     try:
-        from .models import BackupConfig
-        backup_config = BackupConfig(
-            storage_path=request.storage_path,
-            interval_hours=request.interval_hours,
-            max_backups=request.max_backups,
-            compression=request.compression,
-            cleanup_enabled=request.cleanup_enabled,
-            cleanup_interval_days=request.cleanup_interval_days,
-            cleanup_keep_days=request.cleanup_keep_days
-        )
+        # 在现有配置基础上更新，保留界面未暴露的高级配置项
+        backup_config = config_mgr.get_config().backup.model_copy(update=request.model_dump(exclude_unset=True))
+        valid, message = config_mgr.validate_config(config_mgr.get_config().model_copy(update={"backup": backup_config}))
+        if not valid:
+            return ConfigUpdateResponse(success=False, message=message)
         
         success = config_mgr.update_backup_config(backup_config)
         
@@ -602,31 +803,60 @@ async def reinitialize_managers():
     if config_manager:
         config = config_manager.get_config()
         if config:
-            # 停止旧的调度器
-            if scheduler:
-                await scheduler.stop()
-            
             # 重新创建管理器
+            io_throttle.configure(config.backup)
+            coordinator.configure(config.backup.global_max_concurrent_backups, config.backup.host_max_concurrent_backups)
             backup_manager = BackupManager(config.database, config.backup)
             restore_manager = RestoreManager(config.database, config.backup)
-            scheduler = BackupScheduler(config.database, config.backup)
             
-            # 重新启动调度器
-            await scheduler.start()
+            if scheduler and scheduler.is_running:
+                # 就地更新任务，保留计划未改变的任务的下次运行时间
+                await scheduler.reconfigure(config.database, config.backup)
+            else:
+                if scheduler:
+                    await scheduler.stop()
+                scheduler = BackupScheduler(config.database, config.backup)
+                await scheduler.start()
+            
+            await sync_targets(config)
+
+
+async def sync_targets(config: Config):
+    """按配置创建、更新或停止命名备份目标（目标配置无效时抛出ValueError，不改变正在运行的目标）"""
+    configured = {name: (db_config, backup_config) for name, db_config, backup_config in iter_targets(config)
+                  if name != DEFAULT_TARGET}
+    for name in list(targets):
+        if name not in configured:
+            await targets.pop(name).scheduler.stop()
+    for name, (db_config, backup_config) in configured.items():
+        if name in targets:
+            await targets[name].reconfigure(db_config, backup_config)
+        else:
+            targets[name] = BackupTarget(name, db_config, backup_config)
+            await targets[name].scheduler.start()
 
 
 @app.post("/api/cleanup", response_model=CleanupResponse)
 async def manual_cleanup(
     manager: BackupManager = Depends(get_backup_manager)
 ):
-    """手动清理旧备份"""
+    """手动清理旧备份（后台执行，立即返回任务ID）"""
     try:
-        deleted_count, deleted_files = manager.cleanup_old_backups_by_date()
+        expired = await asyncio.to_thread(manager.find_expired_backups)
+        if not expired:
+            return CleanupResponse(
+                success=True,
+                message="没有需要清理的备份",
+                deleted_count=0,
+                deleted_files=[]
+            )
+        job = job_registry.submit(manager, "cleanup", expired)
         return CleanupResponse(
             success=True,
-            message=f"清理完成，删除了 {deleted_count} 个备份文件",
-            deleted_count=deleted_count,
-            deleted_files=deleted_files
+            message=f"已在后台清理 {len(expired)} 个备份文件",
+            deleted_count=len(expired),
+            deleted_files=[backup.filename for backup in expired],
+            job_id=job.id
         )
     except Exception as e:
         return CleanupResponse(
@@ -637,6 +867,191 @@ async def manual_cleanup(
         )
 
 
+@app.get("/api/tiering", response_model=TieringStatus)
+async def get_tiering_status(manager: BackupManager = Depends(get_backup_manager)):
+    """分层存储状态：冷热备份数量、大小和待移动的备份"""
+    backups = await asyncio.to_thread(manager.get_backup_list)
+    candidates = await asyncio.to_thread(tiering.find_cold_candidates, manager)
+    hot = [b for b in backups if b.tier != "cold"]
+    cold = [b for b in backups if b.tier == "cold"]
+    last_run, last_result = tiering.last_tiering_run(manager)
+    return TieringStatus(
+        enabled=bool(manager.backup_config.cold_storage_path),
+        cold_storage_path=manager.backup_config.cold_storage_path,
+        cold_after_days=manager.backup_config.cold_after_days,
+        hot_count=len(hot),
+        hot_bytes=sum(b.size for b in hot),
+        cold_count=len(cold),
+        cold_bytes=sum(b.size for b in cold),
+        candidates=[b.id for b in candidates],
+        last_run=last_run,
+        last_result=last_result
+    )
+
+
+@app.post("/api/tiering/run")
+async def run_tiering(manager: BackupManager = Depends(get_backup_manager)):
+    """立即在后台把到期的备份移动到冷存储"""
+    if not manager.backup_config.cold_storage_path:
+        raise HTTPException(status_code=400, detail="未配置冷存储目录")
+    tiering.schedule_tiering(manager)
+    return {"success": True, "message": "已在后台开始移动到期备份到冷存储"}
+
+
+@app.get("/api/throttle", response_model=ThrottleStatus)
+async def get_throttle_status():
+    """备份限速状态：配置的限速、负载系数和实际速率"""
+    return ThrottleStatus(**io_throttle.status())
+
+
+@app.put("/api/throttle", response_model=ThrottleStatus)
+async def update_throttle(
+    request: ThrottleUpdate,
+    config_mgr: ConfigManager = Depends(get_config_manager)
+):
+    """修改限速配置：立即对正在运行的备份生效并保存到配置文件，不重启调度器"""
+    config = config_mgr.get_config()
+    if not config:
+        raise HTTPException(status_code=404, detail="配置未找到")
+    backup_config = config.backup.model_copy(update=request.model_dump(exclude_unset=True))
+    valid, message = config_mgr.validate_config(config.model_copy(update={"backup": backup_config}))
+    if not valid:
+        raise HTTPException(status_code=400, detail=message)
+    if not config_mgr.update_backup_config(backup_config):
+        raise HTTPException(status_code=500, detail="配置保存失败")
+    io_throttle.configure(backup_config)
+    return ThrottleStatus(**io_throttle.status())
+
+
+@app.get("/api/jobs", response_model=List[DeletionJobStatus])
+async def list_jobs():
+    """列出最近的后台删除任务"""
+    return [job.to_status() for job in job_registry.list()]
+
+
+@app.get("/api/jobs/{job_id}", response_model=DeletionJobStatus)
+async def get_job(job_id: str):
+    """查询后台删除任务进度"""
+    job = job_registry.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job.to_status()
+
+
+@app.get("/api/operations", response_model=List[OperationStatus])
+async def list_operations(active_only: bool = False, target: Optional[str] = None):
+    """列出备份/恢复操作及排队情况，active_only=true时只列出等待、排队和运行中的操作，target按目标过滤"""
+    operations = coordinator.list(active_only)
+    if target:
+        database = get_backup_manager(target).database_key
+        operations = [op for op in operations if op.database == database]
+    return operations
+
+
+@app.get("/api/targets", response_model=List[TargetStatus])
+async def list_targets(config_mgr: ConfigManager = Depends(get_config_manager)):
+    """列出所有备份目标及其调度状态"""
+    config = config_mgr.get_config()
+    overrides = {target.name: target.backup for target in config.targets}
+    result = []
+    for name, db_config, backup_config in iter_targets(config):
+        target_scheduler = targets[name].scheduler if name in targets else scheduler
+        if target_scheduler is None:
+            continue
+        result.append(TargetStatus(
+            name=name,
+            host=db_config.host,
+            port=db_config.port,
+            database=db_config.database,
+            storage_path=backup_config.storage_path,
+            overrides=overrides.get(name, {}),
+            schedule=target_scheduler.get_status()
+        ))
+    return result
+
+
+@app.put("/api/targets/{name}", response_model=ConfigUpdateResponse)
+async def put_target(
+    name: str,
+    request: TargetUpdate,
+    config_mgr: ConfigManager = Depends(get_config_manager)
+):
+    """添加或更新命名备份目标，立即生效（计划未改变时保持原来的下次运行时间）"""
+    config = config_mgr.get_config()
+    new_targets = [target for target in config.targets if target.name != name]
+    new_targets.append(TargetConfig(name=name, database=request.database, backup=request.backup))
+    valid, message = config_mgr.validate_config(config.model_copy(update={"targets": new_targets}))
+    if not valid:
+        raise HTTPException(status_code=400, detail=message)
+    if not config_mgr.update_targets(new_targets):
+        return ConfigUpdateResponse(success=False, message="配置保存失败")
+    await sync_targets(config_mgr.get_config())
+    return ConfigUpdateResponse(success=True, message=f"备份目标 {name} 已保存", config=config_mgr.get_config())
+
+
+@app.delete("/api/targets/{name}", response_model=ConfigUpdateResponse)
+async def delete_target(name: str, config_mgr: ConfigManager = Depends(get_config_manager)):
+    """删除命名备份目标并停止其定时任务，已有的备份文件保留在目录中"""
+    config = config_mgr.get_config()
+    if not any(target.name == name for target in config.targets):
+        raise HTTPException(status_code=404, detail=f"备份目标不存在: {name}")
+    if not config_mgr.update_targets([target for target in config.targets if target.name != name]):
+        return ConfigUpdateResponse(success=False, message="配置保存失败")
+    await sync_targets(config_mgr.get_config())
+    return ConfigUpdateResponse(success=True, message=f"备份目标 {name} 已删除", config=config_mgr.get_config())
+
+
+@app.get("/api/operations/{operation_id}", response_model=OperationStatus)
+async def get_operation(operation_id: str):
+    """查询备份/恢复操作状态"""
+    operation = coordinator.get(operation_id)
+    if not operation:
+        raise HTTPException(status_code=404, detail="操作不存在")
+    return coordinator.status(operation)
+
+
+@app.get("/api/retention/preview", response_model=RetentionPreview)
+async def preview_retention(
+    policy: Optional[str] = None,
+    max_backups: Optional[int] = None,
+    hourly: Optional[int] = None,
+    daily: Optional[int] = None,
+    weekly: Optional[int] = None,
+    monthly: Optional[int] = None,
+    manager: BackupManager = Depends(get_backup_manager)
+):
+    """预览保留策略的清理结果（不删除），可通过参数试算其他策略"""
+    overrides = {
+        "retention_policy": policy,
+        "max_backups": max_backups,
+        "gfs_hourly": hourly,
+        "gfs_daily": daily,
+        "gfs_weekly": weekly,
+        "gfs_monthly": monthly,
+    }
+    config = manager.backup_config.model_copy(
+        update={key: value for key, value in overrides.items() if value is not None}
+    )
+    if config.retention_policy not in RETENTION_POLICIES:
+        raise HTTPException(status_code=400, detail=f"不支持的保留策略: {config.retention_policy}")
+    backups = await asyncio.to_thread(manager.get_backup_list)
+    return plan_retention(backups, config)
+
+
+@app.post("/api/retention/apply")
+async def apply_retention(manager: BackupManager = Depends(get_backup_manager)):
+    """按当前保留策略在后台清理旧备份"""
+    schedule_prune(manager)
+    return {"success": True, "message": f"已在后台按 {manager.backup_config.retention_policy} 策略清理旧备份"}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus指标（在工作线程中生成，首次扫描备份目录时不阻塞事件循环）"""
+    content = await asyncio.to_thread(generate_latest)
+    return Response(content=content, media_type=CONTENT_TYPE_LATEST)
+
+
 @app.get("/api/health")
 async def health_check():
     """健康检查"""
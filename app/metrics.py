@@ -0,0 +1,218 @@
+import errno
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+import psycopg2
+from prometheus_client import Counter, Histogram, REGISTRY
+from prometheus_client.core import GaugeMetricFamily
+from .dump_errors import classify_dump_error
+from .models import BackupInfo
+
+
+DURATION_BUCKETS = (0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600, 7200, 14400)
+HTTP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+THROUGHPUT_BUCKETS = (1e5, 1e6, 5e6, 1e7, 2.5e7, 5e7, 1e8, 2.5e8, 5e8, 1e9)
+RATIO_BUCKETS = (1, 1.5, 2, 3, 4, 5, 7.5, 10, 15, 20, 50)
+
+PHASE_DURATION = Histogram(
+    "pgbackup_phase_duration_seconds",
+    "备份/恢复各阶段耗时",
+    ["operation", "phase"],
+    buckets=DURATION_BUCKETS
+)
+OPERATION_DURATION = Histogram(
+    "pgbackup_operation_duration_seconds",
+    "备份/恢复总耗时",
+    ["operation", "kind"],
+    buckets=DURATION_BUCKETS
+)
+BYTES = Counter(
+    "pgbackup_bytes_total",
+    "备份/恢复处理的字节数，in为未压缩数据，out为落盘数据",
+    ["operation", "direction"]
+)
+COMPRESSION_RATIO = Histogram(
+    "pgbackup_compression_ratio",
+    "备份压缩比（未压缩字节/落盘字节）",
+    buckets=RATIO_BUCKETS
+)
+THROUGHPUT = Histogram(
+    "pgbackup_throughput_bytes_per_second",
+    "备份/恢复吞吐量（未压缩字节/秒）",
+    ["operation"],
+    buckets=THROUGHPUT_BUCKETS
+)
+FAILURES = Counter(
+    "pgbackup_failures_total",
+    "备份/恢复失败次数",
+    ["operation", "reason"]
+)
+THROTTLE_WAIT = Counter(
+    "pgbackup_throttle_wait_seconds_total",
+    "备份因限速而等待的累计时间",
+    ["direction"]
+)
+REPLICA_FALLBACKS = Counter(
+    "pgbackup_replica_fallbacks_total",
+    "配置了副本但改从主库导出的备份次数",
+    ["reason"]
+)
+SCHEDULER_LAG = Histogram(
+    "pgbackup_scheduler_lag_seconds",
+    "定时任务实际开始时间与计划时间之差",
+    ["job"],
+    buckets=(0.01, 0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+)
+HTTP_LATENCY = Histogram(
+    "pgbackup_http_request_duration_seconds",
+    "HTTP请求耗时（按路由模板统计）",
+    ["method", "route", "status"],
+    buckets=HTTP_BUCKETS
+)
+
+
+class PhaseTimer:
+    """用单调时钟累计一次备份/恢复中各阶段的耗时，可选在阶段边界通知剖析器"""
+    def __init__(self, operation: str, profiler=None):
+        self.operation = operation
+        self.profiler = profiler
+        self.started = time.monotonic()
+        self.timings: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.timings[name] = self.timings.get(name, 0.0) + time.monotonic() - start
+            if self.profiler:
+                self.profiler.mark(name)
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def finish(self) -> Dict[str, float]:
+        """上报各阶段耗时到指标，返回含总耗时的计时结果（秒）"""
+        for name, seconds in self.timings.items():
+            PHASE_DURATION.labels(self.operation, name).observe(seconds)
+        result = {name: round(seconds, 6) for name, seconds in self.timings.items()}
+        result["total"] = round(self.elapsed(), 6)
+        return result
+
+
+def classify_failure(error: BaseException) -> str:
+    """将异常归类为有限的失败原因，避免标签基数过高"""
+    if isinstance(error, OSError) and error.errno == errno.ENOSPC:
+        return "disk_full"
+    dump_kind = classify_dump_error(error)
+    if dump_kind in ("lock_timeout", "statement_timeout"):
+        return dump_kind
+    if isinstance(error, (psycopg2.OperationalError, ConnectionError)):
+        return "connection"
+    if isinstance(error, TimeoutError):
+        return "timeout"
+    if isinstance(error, UnicodeDecodeError):
+        return "encoding"
+    if isinstance(error, ValueError):
+        return "invalid_request"
+    if isinstance(error, OSError):
+        return "io"
+    message = str(error)
+    if "could not connect" in message or "connection" in message.lower():
+        return "connection"
+    if "备份失败" in message or "导出失败" in message:
+        return "dump_error"
+    if "恢复失败" in message or "加载失败" in message:
+        return "restore_error"
+    return "other"
+
+
+def record_failure(operation: str, error: BaseException):
+    """记录一次失败"""
+    FAILURES.labels(operation, classify_failure(error)).inc()
+
+
+def record_transfer(operation: str, kind: str, bytes_in: int, bytes_out: int, duration: float):
+    """记录一次成功的备份/恢复的数据量、压缩比和吞吐量"""
+    OPERATION_DURATION.labels(operation, kind).observe(duration)
+    BYTES.labels(operation, "in").inc(bytes_in)
+    BYTES.labels(operation, "out").inc(bytes_out)
+    if operation == "backup" and bytes_out > 0 and bytes_in > 0:
+        COMPRESSION_RATIO.observe(bytes_in / bytes_out)
+    if duration > 0 and bytes_in > 0:
+        THROUGHPUT.labels(operation).observe(bytes_in / duration)
+
+
+def record_scheduler_lag(job: str, scheduled_run_times: List[datetime]):
+    """记录定时任务的调度延迟"""
+    if not scheduled_run_times:
+        return
+    planned = scheduled_run_times[0]
+    lag = (datetime.now(planned.tzinfo) - planned).total_seconds()
+    SCHEDULER_LAG.labels(job).observe(max(0.0, lag))
+
+
+class CatalogCollector:
+    """按备份目标统计备份目录的数量和大小
+
+    每个备份目录只在首次抓取时扫描一次，之后随备份信息的保存和删除增量更新，抓取时不再读取信息文件。
+    """
+    def __init__(self):
+        # 目标名称 -> (备份目录键, 扫描备份列表的函数)
+        self.source: Optional[Callable[[], Dict[str, Tuple[str, Callable[[], List[BackupInfo]]]]]] = None
+        self.lock = threading.Lock()
+        self.catalogs: Dict[str, Dict[str, Tuple[str, int]]] = {}
+
+    def record(self, key: str, backup: BackupInfo):
+        """备份信息已保存"""
+        with self.lock:
+            if key in self.catalogs:
+                self.catalogs[key][backup.id] = (backup_status(backup), backup.size)
+
+    def forget(self, key: str, backup_ids: List[str]):
+        """备份信息已删除"""
+        with self.lock:
+            catalog = self.catalogs.get(key)
+            for backup_id in backup_ids if catalog is not None else []:
+                catalog.pop(backup_id, None)
+
+    def entries(self, key: str, list_backups: Callable[[], List[BackupInfo]]) -> List[Tuple[str, int]]:
+        # 扫描时持有锁，期间保存或删除的备份信息不会丢失
+        with self.lock:
+            if key not in self.catalogs:
+                self.catalogs[key] = {b.id: (backup_status(b), b.size) for b in list_backups()}
+            return list(self.catalogs[key].values())
+
+    def describe(self):
+        return []
+
+    def collect(self):
+        count = GaugeMetricFamily("pgbackup_catalog_backups", "备份目录中的备份数量", labels=["target", "status"])
+        size = GaugeMetricFamily("pgbackup_catalog_bytes", "备份目录中备份文件的总大小", labels=["target", "status"])
+        totals = {}
+        try:
+            sources = self.source() if self.source else {}
+            catalogs = {target: self.entries(key, list_backups) for target, (key, list_backups) in sources.items()}
+        except Exception as e:
+            print(f"统计备份目录失败: {e}")
+            catalogs = {}
+        for target, entries in catalogs.items():
+            for status, backup_size in entries:
+                backup_count, backup_bytes = totals.get((target, status), (0, 0))
+                totals[(target, status)] = (backup_count + 1, backup_bytes + backup_size)
+        for labels, (backup_count, backup_bytes) in totals.items():
+            count.add_metric(list(labels), backup_count)
+            size.add_metric(list(labels), backup_bytes)
+        yield count
+        yield size
+
+
+def backup_status(backup: BackupInfo) -> str:
+    return backup.status.value if hasattr(backup.status, "value") else str(backup.status)
+
+
+catalog_collector = CatalogCollector()
+REGISTRY.register(catalog_collector)
@@ -0,0 +1,98 @@
+"""在flat与date（YYYY/MM/DD分区）存储布局之间迁移已有备份
+
+迁移前请停止服务，迁移完成后会更新配置文件中的 storage_layout：
+
+    python -m app.migrate_storage --to date
+    python -m app.migrate_storage --to flat --config /app/config.json --dry-run
+
+默认目标和所有命名目标（storage_path/<目标名>）一起迁移。每个备份先移动备份文件和性能剖析文件，
+最后移动信息文件，中断后可直接重新执行。
+"""
+import argparse
+import os
+import shutil
+import sys
+
+from .backup import BackupManager, STORAGE_LAYOUTS
+from .config_manager import ConfigManager
+from .models import BackupConfig, DatabaseConfig
+from .targets import iter_targets
+
+
+def migrate_layout(config_manager: ConfigManager, target_layout: str, dry_run: bool = False) -> int:
+    """将所有备份目标的备份迁移到目标布局，返回迁移的备份数量
+
+    覆盖了storage_layout的命名目标使用自己的布局，不迁移。
+    """
+    config = config_manager.get_config()
+    target_config = config.backup.model_copy(update={"storage_layout": target_layout})
+    overridden = {target.name for target in config.targets if "storage_layout" in target.backup}
+
+    migrated = 0
+    for name, db_config, backup_config in iter_targets(config):
+        if name in overridden:
+            print(f"目标 {name} 单独配置了存储布局 {backup_config.storage_layout}，跳过")
+            continue
+        print(f"目标 {name}: {backup_config.storage_path}")
+        migrated += migrate_catalog(db_config, backup_config, target_layout, dry_run)
+
+    if not dry_run:
+        if not config_manager.update_backup_config(target_config):
+            raise RuntimeError("备份已迁移，但更新配置文件失败，请手动设置 storage_layout")
+    return migrated
+
+
+def migrate_catalog(db_config: DatabaseConfig, source_config: BackupConfig, target_layout: str,
+                    dry_run: bool = False) -> int:
+    """将一个备份目录中的备份迁移到目标布局，返回迁移的备份数量"""
+    target_config = source_config.model_copy(update={"storage_layout": target_layout})
+    source = BackupManager(db_config, source_config)
+    target = BackupManager(db_config, target_config)
+
+    migrated = 0
+    for backup_info in source.get_backup_list():
+        source_dir = source.get_backup_dir(backup_info.id)
+        target_dir = target.get_backup_dir(backup_info.id)
+        if os.path.abspath(source_dir) == os.path.abspath(target_dir):
+            continue
+        print(f"{backup_info.id}: {source_dir} -> {target_dir}")
+        migrated += 1
+        if dry_run:
+            continue
+        os.makedirs(target_dir, exist_ok=True)
+        for name in [backup_info.filename, *backup_info.profile_files]:
+            source_path = os.path.join(source_dir, name)
+            if os.path.exists(source_path):
+                shutil.move(source_path, os.path.join(target_dir, name))
+        # 信息文件最后移动：中断时该备份仍按原布局登记，重新执行即可继续
+        shutil.move(source.get_info_path(backup_info.id), target.get_info_path(backup_info.id))
+        source.remove_empty_partitions([backup_info.id])
+    return migrated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="迁移备份存储布局")
+    parser.add_argument("--to", dest="layout", required=True, choices=STORAGE_LAYOUTS, help="目标布局")
+    parser.add_argument("--config", default="config.json", help="配置文件路径")
+    parser.add_argument("--dry-run", action="store_true", help="只显示将要移动的备份")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.config):
+        parser.error(f"配置文件不存在: {args.config}")
+    config_manager = ConfigManager(args.config)
+    current = config_manager.get_config().backup.storage_layout
+    if current == args.layout:
+        print(f"当前已是 {args.layout} 布局，无需迁移")
+        return
+
+    try:
+        migrated = migrate_layout(config_manager, args.layout, args.dry_run)
+    except Exception as e:
+        print(f"迁移失败: {e}")
+        sys.exit(1)
+    action = "将迁移" if args.dry_run else "已迁移"
+    print(f"{action} {migrated} 个备份: {current} -> {args.layout}")
+
+
+if __name__ == "__main__":
+    main()
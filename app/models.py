@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from enum import Enum
 
 
@@ -21,17 +21,39 @@ class BackupInfo(BaseModel):
     compressed: bool = True
     error_message: Optional[str] = None
     description: Optional[str] = None
+    format: str = "plain"  # "plain" 或 "parallel_copy"
+    timings: Dict[str, float] = {}  # 备份各阶段耗时（秒）
+    restore_timings: Optional[Dict[str, Any]] = None  # 最近一次恢复的各阶段耗时（秒）
+    profile_files: List[str] = []  # 与备份存放在一起的性能剖析结果文件
+    codec: Optional[str] = None  # 压缩格式 none/gzip/xz/bz2，旧备份为空时由compressed推断
+    tier: str = "hot"  # "hot"（storage_path）或 "cold"（cold_storage_path）
+    storage: str = "local"  # 备份文件所在的存储后端："local" 或 "s3"（信息文件始终在本地）
+    encrypted: bool = False  # 备份文件（并行备份为各表数据文件）是否经过AES-GCM加密
+    key_id: Optional[str] = None  # 加密密钥指纹，用于发现密钥不匹配
+    checksum: Optional[str] = None  # 导入的备份文件（加密前）的校验和，如 "sha256:..."
+    tables: Optional[List[str]] = None  # 导入时从COPY块统计的表清单
+    source_role: Optional[str] = None  # 导出数据的节点角色："primary" 或 "replica"
+    source_node: Optional[str] = None  # 导出数据的节点 host:port
+    source_lsn: Optional[str] = None  # 开始导出前该节点的WAL位置（副本为已回放位置），备份至少包含到该位置的数据
+    source_lag_s: Optional[float] = None  # 从副本导出时开始前的回放延迟（秒）
+    attempts: List[Dict[str, Any]] = []  # 各次导出尝试：方式、开始时间、耗时、失败分类和错误、重试前的等待
 
 
 class BackupRequest(BaseModel):
     description: Optional[str] = None
     compress: bool = True
+    engine: Optional[str] = None  # "pg_dump" 或 "parallel_copy"，为空时使用配置默认值
+    profile: bool = False  # 对本次备份进行CPU剖析
+    profile_memory: bool = False  # 在各阶段边界记录tracemalloc内存快照
+    wait: bool = True  # 为false时排队后立即返回操作ID，通过 /api/operations 查看进度
 
 
 class RestoreRequest(BaseModel):
     backup_id: str
     restore_type: str = "normal"  # "normal", "full" 或 "incremental"
     force: bool = False
+    profile: bool = False
+    profile_memory: bool = False
 
 
 class BatchDeleteRequest(BaseModel):
@@ -44,16 +66,89 @@ class DatabaseConfig(BaseModel):
     database: str
     username: str
     password: str
+    replica_host: str = ""  # 只读副本地址，配置后备份优先从副本导出（使用相同的用户名和密码），恢复始终写入主库
+    replica_port: int = 5432
 
 
 class BackupConfig(BaseModel):
     storage_path: str = "./backups"
+    storage_layout: str = "flat"  # "flat"（全部位于storage_path）或 "date"（按 YYYY/MM/DD 分区），用 python -m app.migrate_storage 切换
     interval_hours: int = 12
+    schedule_cron: List[str] = []  # cron表达式（如 "30 2 * * *"），配置后取代interval_hours
+    schedule_jitter_seconds: Optional[int] = None  # 随机延迟上限（秒），为空时多个cron计划自动错开300秒
+    blackout_windows: List[str] = []  # 禁止自动备份的时间窗口，如 "mon-fri 08:00-20:00"，到期的备份推迟到窗口结束
+    wait_for_quiet: bool = False  # 到期的自动备份等待数据库空闲后再开始
+    quiet_max_active_sessions: int = 5  # 活跃会话数不超过该值视为空闲，0表示不检查
+    quiet_max_tps: float = 0  # 每秒事务数不超过该值视为空闲，0表示不检查
+    quiet_check_interval_s: int = 60
+    quiet_max_delay_minutes: int = 120  # 最多等待的时间，超过后不论负载直接备份
+    schedule_catch_up: bool = True  # 停机期间错过的定时任务在启动后合并补做一次
+    schedule_state_file: str = "scheduler_state.json"  # 定时任务状态文件（下次运行时间、暂停状态等），相对路径位于 storage_path/.state 下
     max_backups: int = 30
     compression: bool = True
     cleanup_enabled: bool = True
     cleanup_interval_days: int = 7
     cleanup_keep_days: int = 30
+    dump_engine: str = "pg_dump"  # "pg_dump" 或 "parallel_copy"
+    dump_lock_wait_timeout_s: int = 60  # 导出等待表锁的最长时间（pg_dump --lock-wait-timeout、COPY连接的lock_timeout），0表示一直等待
+    dump_statement_timeout_s: int = 0  # 并行COPY单条语句和单个pg_dump进程的运行时间上限，0表示不限制
+    dump_max_retries: int = 3  # 锁超时、连接中断等暂时性失败的重试次数
+    dump_retry_base_delay_s: float = 30  # 首次重试前的等待，之后每次翻倍（含随机抖动）
+    dump_retry_max_delay_s: float = 600
+    dump_fallback: bool = True  # 并行COPY或内存中导出失败时改用逐块写盘的pg_dump导出
+    max_concurrent_backups: int = 1  # 同一数据库上同时运行的备份数上限，恢复始终与备份互斥
+    global_max_concurrent_backups: int = 4  # 所有目标同时运行的备份数上限，0表示不限制
+    replica_max_lag_s: float = 300  # 副本回放延迟超过该值（秒）时不从副本导出
+    replica_lag_action: str = "primary"  # 副本延迟过大时："primary"（改从主库导出）或 "defer"（等待副本追上）
+    replica_max_defer_minutes: int = 30  # defer最多等待的时间，超时后改从主库导出
+    replica_check_interval_s: int = 30  # defer时检查副本延迟的间隔
+    host_max_concurrent_backups: int = 2  # 同一数据库主机上同时运行的备份数上限，0表示不限制
+    parallel_jobs: int = 4
+    split_threshold_mb: int = 1024  # 超过该大小的表拆分为多个范围并行导出，0表示不拆分
+    split_max_chunks: int = 16
+    split_strategy: str = "auto"  # "auto"、"pk" 或 "ctid"
+    hot_compression_level: int = 9  # 新备份的gzip压缩级别，启用冷存储时建议设为1以加快备份
+    cold_storage_path: str = ""  # 冷存储目录（可位于其他磁盘/挂载点），为空表示不启用分层
+    cold_after_days: int = 7  # 超过该天数的备份移动到冷存储
+    cold_codec: str = "xz"  # 冷存储压缩格式：gzip、xz 或 bz2
+    cold_compression_level: int = 6
+    encryption_enabled: bool = False  # 是否加密新备份，密钥来自环境变量 PGBACKUP_ENCRYPTION_KEY 或密钥文件
+    encryption_key_file: str = ""  # 密钥文件路径（base64编码的32字节密钥），环境变量优先
+    throttle_read_mb_s: float = 0  # 从数据库读取（pg_dump输出/COPY数据）的限速，0表示不限速
+    throttle_write_mb_s: float = 0  # 写入存储（压缩后）的限速，0表示不限速
+    dump_nice: int = 0  # pg_dump子进程的nice值（0-19），0表示不调整
+    dump_ionice_class: str = ""  # pg_dump子进程的I/O调度类："idle"、"best-effort"，为空表示不调整
+    load_aware_throttle: bool = False  # 数据库繁忙时按比例降低限速
+    load_max_active_sessions: int = 20  # 活跃会话数超过该值时降速
+    load_max_replication_lag_s: float = 30  # 复制延迟（秒）超过该值时降速
+    load_min_factor: float = 0.1  # 降速后的最低比例
+    load_check_interval_s: float = 10  # 负载检测间隔（秒）
+    storage_backend: str = "local"  # 新备份文件的存储后端："local"（storage_path）或 "s3"
+    s3_bucket: str = ""
+    s3_prefix: str = ""  # 对象键前缀，备份按 前缀/YYYY/MM/DD/文件名 存放
+    s3_endpoint_url: str = ""  # MinIO等S3兼容服务的地址，为空时使用AWS
+    s3_region: str = ""
+    s3_access_key: str = ""  # 为空时使用boto3默认的凭证链（环境变量、实例角色等）
+    s3_secret_key: str = ""
+    s3_part_size_mb: int = 16  # 分段上传/范围下载的分段大小（不小于5MB）
+    s3_max_concurrency: int = 8  # 并行上传/下载的分段数
+    retention_policy: str = "count"  # "count"（保留最新max_backups个）或 "gfs"（祖父-父-子轮换）
+    gfs_hourly: int = 24
+    gfs_daily: int = 14
+    gfs_weekly: int = 8
+    gfs_monthly: int = 12
+
+
+class ThrottleUpdate(BaseModel):
+    throttle_read_mb_s: Optional[float] = Field(None, ge=0, description="读取限速(MB/s)，0表示不限速")
+    throttle_write_mb_s: Optional[float] = Field(None, ge=0, description="写入限速(MB/s)，0表示不限速")
+    dump_nice: Optional[int] = Field(None, ge=0, le=19, description="pg_dump的nice值")
+    dump_ionice_class: Optional[str] = Field(None, pattern="^(|idle|best-effort)$", description="pg_dump的I/O调度类")
+    load_aware_throttle: Optional[bool] = Field(None, description="是否根据数据库负载降速")
+    load_max_active_sessions: Optional[int] = Field(None, ge=0, description="活跃会话阈值")
+    load_max_replication_lag_s: Optional[float] = Field(None, ge=0, description="复制延迟阈值(秒)")
+    load_min_factor: Optional[float] = Field(None, gt=0, le=1, description="最低降速比例")
+    load_check_interval_s: Optional[float] = Field(None, ge=1, description="负载检测间隔(秒)")
 
 
 class AppConfig(BaseModel):
@@ -63,10 +158,18 @@ class AppConfig(BaseModel):
     debug: bool = False
 
 
+class TargetConfig(BaseModel):
+    """额外的备份目标：使用全局备份配置，backup中的字段覆盖全局配置（如计划和保留策略）"""
+    name: str
+    database: DatabaseConfig
+    backup: Dict[str, Any] = {}
+
+
 class Config(BaseModel):
     database: DatabaseConfig
     backup: BackupConfig
     app: AppConfig
+    targets: List[TargetConfig] = []  # database为默认目标（default），这里是其他命名目标
 
 
 class BackupResponse(BaseModel):
@@ -74,6 +177,7 @@ class BackupResponse(BaseModel):
     message: str
     backup_id: Optional[str] = None
     data: Optional[BackupInfo] = None
+    operation_id: Optional[str] = None
 
 
 class RestoreResponse(BaseModel):
@@ -81,6 +185,7 @@ class RestoreResponse(BaseModel):
     message: str
     backup_id: str
     restored_at: datetime
+    timings: Optional[Dict[str, float]] = None
 
 
 class ScheduleStatus(BaseModel):
@@ -88,6 +193,27 @@ class ScheduleStatus(BaseModel):
     next_run: Optional[datetime] = None
     last_run: Optional[datetime] = None
     interval_hours: int
+    schedules: List[str] = []  # 生效的计划（cron表达式或固定间隔）
+    blackout_windows: List[str] = []
+    waiting_reason: Optional[str] = None  # 到期的备份正在等待的原因（时间窗口或数据库繁忙）
+    waiting_since: Optional[datetime] = None
+    paused: bool = False
+    catch_up_at: Optional[datetime] = None  # 停机期间错过的定时备份的补做时间
+
+
+class TargetUpdate(BaseModel):
+    database: DatabaseConfig
+    backup: Dict[str, Any] = Field({}, description="覆盖全局备份配置的字段，如 interval_hours、max_backups")
+
+
+class TargetStatus(BaseModel):
+    name: str
+    host: str
+    port: int
+    database: str
+    storage_path: str
+    overrides: Dict[str, Any] = {}
+    schedule: ScheduleStatus
 
 
 # 新增：配置管理相关模型
@@ -97,16 +223,48 @@ class DatabaseConfigUpdate(BaseModel):
     database: str = Field(..., min_length=1, description="数据库名称")
     username: str = Field(..., min_length=1, description="数据库用户名")
     password: str = Field(..., description="数据库密码")
+    replica_host: str = Field("", description="只读副本地址，为空表示从主库备份")
+    replica_port: int = Field(5432, ge=1, le=65535, description="只读副本端口")
 
 
 class BackupConfigUpdate(BaseModel):
     storage_path: str = Field(..., min_length=1, description="备份存储路径")
     interval_hours: int = Field(..., ge=1, le=8760, description="备份间隔(小时)")
+    schedule_cron: List[str] = Field([], description="cron表达式，配置后取代备份间隔")
+    schedule_jitter_seconds: Optional[int] = Field(None, ge=0, le=86400, description="随机延迟上限(秒)")
+    blackout_windows: List[str] = Field([], description="禁止自动备份的时间窗口")
+    wait_for_quiet: bool = Field(False, description="是否等待数据库空闲后再备份")
+    quiet_max_active_sessions: int = Field(5, ge=0, description="空闲时的最大活跃会话数")
+    quiet_max_tps: float = Field(0, ge=0, description="空闲时的最大每秒事务数")
+    quiet_check_interval_s: int = Field(60, ge=5, le=3600, description="空闲检测间隔(秒)")
+    quiet_max_delay_minutes: int = Field(120, ge=0, le=1440, description="最长等待时间(分钟)")
+    schedule_catch_up: bool = Field(True, description="启动后补做停机期间错过的定时备份")
     max_backups: int = Field(..., ge=1, le=1000, description="最大备份数量")
     compression: bool = Field(..., description="是否压缩备份文件")
     cleanup_enabled: bool = Field(..., description="是否启用自动清理")
     cleanup_interval_days: int = Field(..., ge=1, le=365, description="清理间隔(天)")
     cleanup_keep_days: int = Field(..., ge=1, le=3650, description="保留天数")
+    dump_engine: str = Field("pg_dump", pattern="^(pg_dump|parallel_copy)$", description="备份引擎")
+    dump_lock_wait_timeout_s: int = Field(60, ge=0, le=86400, description="等待表锁的最长时间(秒)，0表示一直等待")
+    dump_statement_timeout_s: int = Field(0, ge=0, description="导出语句/进程的运行时间上限(秒)，0表示不限制")
+    dump_max_retries: int = Field(3, ge=0, le=20, description="暂时性失败的重试次数")
+    parallel_jobs: int = Field(4, ge=1, le=64, description="并行备份/恢复连接数")
+    max_concurrent_backups: int = Field(1, ge=1, le=16, description="同一数据库同时运行的备份数上限")
+    global_max_concurrent_backups: int = Field(4, ge=0, le=256, description="所有目标同时运行的备份数上限")
+    host_max_concurrent_backups: int = Field(2, ge=0, le=64, description="同一主机同时运行的备份数上限")
+    replica_max_lag_s: float = Field(300, ge=0, description="副本最大回放延迟(秒)")
+    replica_lag_action: str = Field("primary", pattern="^(primary|defer)$", description="副本延迟过大时的处理")
+    replica_max_defer_minutes: int = Field(30, ge=0, le=1440, description="等待副本追上的最长时间(分钟)")
+    retention_policy: str = Field("count", pattern="^(count|gfs)$", description="保留策略")
+    gfs_hourly: int = Field(24, ge=0, le=1000, description="GFS保留的小时备份数")
+    gfs_daily: int = Field(14, ge=0, le=1000, description="GFS保留的每日备份数")
+    gfs_weekly: int = Field(8, ge=0, le=1000, description="GFS保留的每周备份数")
+    gfs_monthly: int = Field(12, ge=0, le=1000, description="GFS保留的每月备份数")
+    hot_compression_level: int = Field(9, ge=1, le=9, description="新备份的gzip压缩级别")
+    cold_storage_path: str = Field("", description="冷存储目录，为空表示不启用分层")
+    cold_after_days: int = Field(7, ge=1, le=3650, description="移动到冷存储的天数")
+    cold_codec: str = Field("xz", pattern="^(gzip|xz|bz2)$", description="冷存储压缩格式")
+    cold_compression_level: int = Field(6, ge=0, le=9, description="冷存储压缩级别")
 
 
 class AppConfigUpdate(BaseModel):
@@ -138,4 +296,76 @@ class CleanupResponse(BaseModel):
     success: bool
     message: str
     deleted_count: int
-    deleted_files: List[str] 
\ No newline at end of file
+    deleted_files: List[str]
+    job_id: Optional[str] = None  # 后台删除任务ID，可通过 /api/jobs/{job_id} 查询进度
+
+
+class RetentionPreview(BaseModel):
+    policy: str
+    keep: List[str]
+    delete: List[str]
+    reasons: Dict[str, List[str]]  # 备份ID -> 命中的保留层级（hourly/daily/weekly/monthly/count）
+    reclaim_bytes: int
+
+
+class DeletionJobStatus(BaseModel):
+    job_id: str
+    kind: str  # "batch_delete"、"cleanup" 或 "retention"
+    status: str  # "pending"、"running"、"completed" 或 "failed"
+    total: int
+    deleted_count: int
+    failed_count: int
+    bytes_reclaimed: int
+    deleted: List[str]
+    failed: List[Dict[str, str]]
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class ThrottleStatus(BaseModel):
+    read_limit_mb_s: float
+    write_limit_mb_s: float
+    effective_read_mb_s: float  # 限速乘以负载系数后的实际速率
+    effective_write_mb_s: float
+    nice: int
+    ionice_class: str
+    load_aware: bool
+    load_factor: float
+    active_sessions: Optional[int] = None
+    replication_lag_s: Optional[float] = None
+    last_check: Optional[datetime] = None
+    last_error: Optional[str] = None
+    running_backups: int
+
+
+class OperationStatus(BaseModel):
+    operation_id: str
+    database: str
+    host: str
+    kind: str  # "backup" 或 "restore"
+    source: str  # "manual"、"scheduled" 或 "trigger"
+    description: Optional[str] = None
+    status: str  # "waiting"、"queued"、"running"、"completed" 或 "failed"
+    queue_position: Optional[int] = None  # 排队中的操作在同一数据库队列中的位置（从1开始）
+    waiting_reason: Optional[str] = None
+    result: Optional[str] = None  # 备份ID
+    error: Optional[str] = None
+    created_at: datetime
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+class TieringStatus(BaseModel):
+    enabled: bool
+    cold_storage_path: str
+    cold_after_days: int
+    hot_count: int
+    hot_bytes: int
+    cold_count: int
+    cold_bytes: int
+    candidates: List[str]  # 等待移动到冷存储的备份ID
+    last_run: Optional[datetime] = None
+    last_result: Optional[Dict[str, Any]] = None
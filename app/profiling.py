@@ -0,0 +1,114 @@
+import cProfile
+import io
+import os
+import pstats
+import threading
+import tracemalloc
+from datetime import datetime
+from typing import List, Optional
+
+
+# cProfile和tracemalloc都是进程级的，同一时间只允许一个运行被剖析
+_profile_lock = threading.Lock()
+
+# 快照中排除剖析代码自身的分配
+_SNAPSHOT_FILTERS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+)
+
+
+class RunProfiler:
+    """单次备份/恢复运行的可选性能剖析
+
+    CPU剖析使用cProfile，挂在执行该运行的事件循环线程上：并行COPY的工作线程不在统计范围内，
+    运行期间事件循环中的其他协程也会被计入。内存剖析在每个阶段结束时拍摄tracemalloc快照。
+    """
+    def __init__(self, output_dir: str, prefix: str, cpu: bool = True, memory: bool = False):
+        self.output_dir = output_dir
+        self.prefix = prefix
+        self.cpu = cpu
+        self.memory = memory
+        self.profile: Optional[cProfile.Profile] = None
+        self.active = False
+        self.previous_snapshot = None
+        self.memory_report: List[str] = []
+
+    def start(self) -> bool:
+        """开始剖析，已有其他运行在剖析时返回False"""
+        if not (self.cpu or self.memory):
+            return False
+        if not _profile_lock.acquire(blocking=False):
+            print("⚠️ 已有其他任务正在进行性能剖析，本次运行不剖析")
+            return False
+        self.active = True
+        if self.memory:
+            tracemalloc.start(25)
+            self.previous_snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        if self.cpu:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+        return True
+
+    def mark(self, phase: str):
+        """阶段边界：记录内存快照及与上一阶段的差异"""
+        if not (self.active and self.memory):
+            return
+        if self.profile:
+            self.profile.disable()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_SNAPSHOT_FILTERS)
+        current, peak = tracemalloc.get_traced_memory()
+        self.memory_report.append(f"=== 阶段 {phase} 结束: 当前 {current / 1024 / 1024:.1f} MiB, 峰值 {peak / 1024 / 1024:.1f} MiB")
+        self.memory_report.append("--- 当前占用最多的分配位置")
+        for stat in snapshot.statistics("lineno")[:10]:
+            self.memory_report.append(str(stat))
+        if self.previous_snapshot is not None:
+            self.memory_report.append("--- 与上一阶段相比的变化")
+            for stat in snapshot.compare_to(self.previous_snapshot, "lineno")[:10]:
+                self.memory_report.append(str(stat))
+        self.memory_report.append("")
+        self.previous_snapshot = snapshot
+        tracemalloc.reset_peak()
+        if self.profile:
+            self.profile.enable()
+
+    def stop(self) -> List[str]:
+        """结束剖析并写出结果文件，返回生成的文件名列表"""
+        if not self.active:
+            return []
+        files = []
+        try:
+            if self.profile:
+                self.profile.disable()
+                pstats_name = f"{self.prefix}.pstats"
+                self.profile.dump_stats(os.path.join(self.output_dir, pstats_name))
+                files.append(pstats_name)
+
+                buffer = io.StringIO()
+                stats = pstats.Stats(self.profile, stream=buffer)
+                buffer.write("=== 按累计耗时排序\n")
+                stats.sort_stats("cumulative").print_stats(60)
+                buffer.write("=== 按自身耗时排序\n")
+                stats.sort_stats("tottime").print_stats(30)
+                text_name = f"{self.prefix}.profile.txt"
+                with open(os.path.join(self.output_dir, text_name), 'w', encoding='utf-8') as f:
+                    f.write(buffer.getvalue())
+                files.append(text_name)
+
+            if self.memory:
+                tracemalloc.stop()
+                memory_name = f"{self.prefix}.memory.txt"
+                with open(os.path.join(self.output_dir, memory_name), 'w', encoding='utf-8') as f:
+                    f.write('\n'.join(self.memory_report))
+                files.append(memory_name)
+        except Exception as e:
+            print(f"写入性能剖析结果失败: {e}")
+        finally:
+            self.active = False
+            _profile_lock.release()
+        return files
+
+
+def restore_profile_prefix(backup_id: str) -> str:
+    """恢复运行的剖析文件前缀，同一备份可多次恢复，使用时间戳区分"""
+    return f"{backup_id}.restore-{datetime.now().strftime('%Y%m%d_%H%M%S')}"
@@ -0,0 +1,140 @@
+"""从只读副本备份：开始导出前检查副本状态和回放延迟，不满足条件时改从主库导出
+
+副本必须处于恢复模式（pg_is_in_recovery()），且回放延迟不超过 replica_max_lag_s；
+延迟过大时按 replica_lag_action 改从主库导出，或等待副本追上（最多 replica_max_defer_minutes 分钟）。
+备份信息记录实际导出的节点和开始前的WAL位置。
+"""
+import asyncio
+import time
+from typing import Callable, Optional, Tuple
+
+import psycopg2
+
+from .metrics import REPLICA_FALLBACKS
+from .models import BackupConfig, DatabaseConfig
+from .throttle import BACKUP_APPLICATION_NAME
+
+
+NODE_STATUS_QUERY = """
+    SELECT
+        pg_is_in_recovery(),
+        CASE WHEN NOT pg_is_in_recovery() THEN NULL
+             WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+             ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END,
+        (CASE WHEN pg_is_in_recovery() THEN pg_last_wal_replay_lsn() ELSE pg_current_wal_lsn() END)::text
+"""
+CONNECT_TIMEOUT = 10
+REPLICA_LAG_ACTIONS = ("primary", "defer")
+
+
+class BackupSource:
+    """一次备份实际导出数据的节点"""
+    def __init__(self, role: str, db_config: DatabaseConfig, lsn: Optional[str] = None,
+                 lag: Optional[float] = None):
+        self.role = role
+        self.db_config = db_config
+        self.lsn = lsn
+        self.lag = lag
+
+    @property
+    def node(self) -> str:
+        return f"{self.db_config.host}:{self.db_config.port}"
+
+
+def replica_config(db_config: DatabaseConfig) -> DatabaseConfig:
+    """副本的连接配置：地址和端口换成副本的，其余与主库相同"""
+    return db_config.model_copy(update={"host": db_config.replica_host, "port": db_config.replica_port})
+
+
+def query_node_status(db_config: DatabaseConfig) -> Tuple[bool, Optional[float], Optional[str]]:
+    """查询节点是否处于恢复模式、回放延迟（秒）和当前WAL位置（副本为已回放位置）"""
+    conn = psycopg2.connect(
+        host=db_config.host,
+        port=db_config.port,
+        database=db_config.database,
+        user=db_config.username,
+        password=db_config.password,
+        application_name=BACKUP_APPLICATION_NAME,
+        connect_timeout=CONNECT_TIMEOUT
+    )
+    try:
+        cursor = conn.cursor()
+        cursor.execute(NODE_STATUS_QUERY)
+        in_recovery, lag, lsn = cursor.fetchone()
+    finally:
+        conn.close()
+    return bool(in_recovery), float(lag) if lag is not None else None, lsn
+
+
+def check_replica(db_config: DatabaseConfig,
+                  backup_config: BackupConfig) -> Tuple[Optional[BackupSource], str, str]:
+    """副本可用时返回其BackupSource，否则返回None、原因分类（unreachable/not_in_recovery/lag）和说明"""
+    replica = replica_config(db_config)
+    try:
+        in_recovery, lag, lsn = query_node_status(replica)
+    except psycopg2.Error as e:
+        return None, "unreachable", f"副本 {replica.host}:{replica.port} 无法连接: {str(e).strip()}"
+    if not in_recovery:
+        return None, "not_in_recovery", f"副本 {replica.host}:{replica.port} 不处于恢复模式（可能已被提升为主库）"
+    if lag is not None and lag > backup_config.replica_max_lag_s:
+        return None, "lag", f"副本回放延迟 {lag:.0f}s 超过 {backup_config.replica_max_lag_s:g}s"
+    return BackupSource("replica", replica, lsn, lag), "", ""
+
+
+def primary_source(db_config: DatabaseConfig) -> BackupSource:
+    """主库：尽量记录WAL位置，查询失败时留空（导出本身会报告连接错误）"""
+    try:
+        _, _, lsn = query_node_status(db_config)
+    except psycopg2.Error as e:
+        print(f"获取主库WAL位置失败: {str(e).strip()}")
+        lsn = None
+    return BackupSource("primary", db_config, lsn)
+
+
+def select_backup_source(db_config: DatabaseConfig, backup_config: BackupConfig) -> BackupSource:
+    """选择导出节点：配置了副本且副本可用时使用副本，否则使用主库"""
+    if not db_config.replica_host:
+        return primary_source(db_config)
+    source, reason, message = check_replica(db_config, backup_config)
+    if source:
+        print(f"从副本 {source.node} 导出（回放延迟 {source.lag or 0:.1f}s，LSN {source.lsn}）")
+        return source
+    print(f"{message}，改从主库导出")
+    REPLICA_FALLBACKS.labels(reason).inc()
+    return primary_source(db_config)
+
+
+def dump_host(db_config: DatabaseConfig, backup_config: BackupConfig) -> str:
+    """备份预计导出的主机（副本可用时为副本），用于排队时占用该主机的并发名额"""
+    if not db_config.replica_host:
+        return db_config.host
+    source, _, _ = check_replica(db_config, backup_config)
+    return source.db_config.host if source else db_config.host
+
+
+async def wait_for_replica(db_config: DatabaseConfig, backup_config: BackupConfig,
+                           on_wait: Optional[Callable[[str], None]] = None):
+    """replica_lag_action为defer时等待副本延迟降到阈值以内，超时或副本不可用时直接返回（随后改从主库导出）"""
+    if not db_config.replica_host or backup_config.replica_lag_action != "defer":
+        return
+    deadline = time.monotonic() + backup_config.replica_max_defer_minutes * 60
+    while True:
+        in_recovery, lag, _ = await asyncio.to_thread(replica_status_or_none, db_config)
+        if not in_recovery or lag is None or lag <= backup_config.replica_max_lag_s:
+            return
+        if time.monotonic() >= deadline:
+            print(f"等待副本追上已超过 {backup_config.replica_max_defer_minutes} 分钟")
+            return
+        reason = f"副本回放延迟 {lag:.0f}s 超过 {backup_config.replica_max_lag_s:g}s"
+        print(f"备份等待副本追上: {reason}")
+        if on_wait:
+            on_wait(reason)
+        await asyncio.sleep(backup_config.replica_check_interval_s)
+
+
+def replica_status_or_none(db_config: DatabaseConfig) -> Tuple[bool, Optional[float], Optional[str]]:
+    """副本状态，无法连接时视为不可用"""
+    try:
+        return query_node_status(replica_config(db_config))
+    except psycopg2.Error:
+        return False, None, None
@@ -1,12 +1,29 @@
+import io
 import os
+import re
 import subprocess
-import gzip
+import json
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Optional
+from typing import BinaryIO, Iterable, Iterator, Optional, Tuple, Union
 import psycopg2
+from psycopg2 import sql
 from .models import BackupInfo, DatabaseConfig, BackupConfig, RestoreResponse
-from .backup import BackupManager
+from .backup import BackupManager, PARALLEL_MANIFEST
+from .coordinator import coordinator
+from .metrics import PhaseTimer, record_failure, record_transfer
+from .profiling import RunProfiler, restore_profile_prefix
+from .compression import backup_codec, manifest_codec, open_codec
+from .dump_scanner import iter_copy_blocks, iter_slices, map_file
+from .sql_filter import batch_lines, filter_sql_lines, iter_chunks, iter_lines
+
+
+# 纯文本备份中public模式表的COPY数据块：表名、列清单、数据行
+COPY_BLOCK_PATTERN = re.compile(r"COPY public\.(\w+)\s*\(([^)]+)\)\s*FROM stdin;\n(.*?)\n\\\.", re.DOTALL)
+
+# 备份文件来源：本地文件路径，或对象存储的顺序读取流
+BackupSource = Union[str, BinaryIO]
 
 
 class RestoreManager:
@@ -15,8 +32,21 @@ class RestoreManager:
         self.backup_config = backup_config
         self.backup_manager = BackupManager(db_config, backup_config)
     
-    async def restore_backup(self, backup_id: str, restore_type: str = "full", force: bool = False) -> RestoreResponse:
-        """恢复指定的备份"""
+    async def restore_backup(self, backup_id: str, restore_type: str = "full", force: bool = False,
+                             profile: bool = False, profile_memory: bool = False) -> RestoreResponse:
+        """等待同一数据库上正在运行的备份和恢复结束后独占地恢复备份"""
+        operation = coordinator.submit(self.backup_manager.database_key, "restore", "manual",
+                                       f"{restore_type} 恢复 {backup_id}", host=self.db_config.host)
+        async with coordinator.acquire(operation):
+            result = await self.run_restore(backup_id, restore_type, force, profile, profile_memory)
+            operation.result = backup_id
+            if not result.success:
+                operation.error = result.message
+            return result
+    
+    async def run_restore(self, backup_id: str, restore_type: str = "full", force: bool = False,
+                          profile: bool = False, profile_memory: bool = False) -> RestoreResponse:
+        """恢复指定的备份，profile/profile_memory为真时对本次运行进行CPU/内存剖析"""
         backup_info = self.backup_manager.load_backup_info(backup_id)
         if not backup_info:
             raise ValueError(f"备份 {backup_id} 不存在")
@@ -24,47 +54,81 @@ class RestoreManager:
         if backup_info.status != "completed":
             raise ValueError(f"备份 {backup_id} 状态不正确: {backup_info.status}")
         
-        backup_file = os.path.join(
-            self.backup_config.storage_path,
-            backup_info.filename
-        )
+        # 加密的备份在开始恢复前确认密钥可用且与备份一致
+        key = self.backup_manager.get_encryption_key(backup_info)
         
-        if not os.path.exists(backup_file):
+        storage, storage_key = self.backup_manager.get_payload_storage(backup_info)
+        backup_file = storage.local_path(storage_key)
+        if backup_file is None:
+            # 对象存储：按字节范围并行下载，边下载边解压写入psql
+            if not await asyncio.to_thread(storage.exists, storage_key):
+                raise ValueError(f"备份文件不存在: {storage.name}:{storage_key}")
+            backup_file = await asyncio.to_thread(storage.open_reader, storage_key)
+        elif not os.path.exists(backup_file):
             raise ValueError(f"备份文件不存在: {backup_file}")
         
+        profiler = RunProfiler(self.backup_manager.get_backup_dir(backup_id), restore_profile_prefix(backup_id),
+                               profile, profile_memory)
+        profiler.start()
+        timer = PhaseTimer("restore", profiler)
         try:
             # 检查版本兼容性
             if not force:
-                await self.check_version_compatibility(backup_info)
+                with timer.phase("connect"):
+                    await self.check_version_compatibility(backup_info)
             
             # 根据恢复类型执行不同的恢复策略
-            if restore_type == "normal":
+            if backup_info.format == "parallel_copy":
+                message, raw_bytes = await self.restore_parallel_backup(backup_file, backup_id, restore_type, timer, key)
+            elif restore_type == "normal":
                 # 普通恢复 - 使用原来的恢复逻辑
-                await self.execute_restore(backup_file, backup_info.compressed)
+                raw_bytes = await self.execute_restore(backup_file, backup_codec(backup_info), timer, key=key)
                 message = f"恢复备份 {backup_id} 成功"
             elif restore_type == "full":
-                await self.execute_full_restore(backup_file, backup_info.compressed)
+                raw_bytes = await self.execute_full_restore(backup_file, backup_codec(backup_info), timer, key)
                 message = f"完全恢复备份 {backup_id} 成功"
             elif restore_type == "incremental":
-                await self.execute_incremental_restore(backup_file, backup_info.compressed)
+                raw_bytes = await self.execute_incremental_restore(backup_file, backup_codec(backup_info), timer, key)
                 message = f"增量恢复备份 {backup_id} 成功"
             else:
                 raise ValueError(f"不支持的恢复类型: {restore_type}")
             
+            timings = self.save_restore_timings(backup_info, restore_type, timer, profiler)
+            record_transfer("restore", restore_type, raw_bytes, backup_info.size, timings["total"])
             return RestoreResponse(
                 success=True,
                 message=message,
                 backup_id=backup_id,
-                restored_at=datetime.now()
+                restored_at=datetime.now(),
+                timings=timings
             )
             
         except Exception as e:
+            timings = self.save_restore_timings(backup_info, restore_type, timer, profiler)
+            record_failure("restore", e)
             return RestoreResponse(
                 success=False,
                 message=f"恢复失败: {str(e)}",
                 backup_id=backup_id,
-                restored_at=datetime.now()
+                restored_at=datetime.now(),
+                timings=timings
             )
+        finally:
+            if not isinstance(backup_file, str):
+                backup_file.close()
+    
+    def save_restore_timings(self, backup_info: BackupInfo, restore_type: str, timer: PhaseTimer,
+                             profiler: Optional[RunProfiler] = None) -> dict:
+        """将本次恢复的各阶段耗时（及剖析结果文件）写入备份元数据，便于多次恢复之间对比"""
+        timings = timer.finish()
+        backup_info.restore_timings = {"restore_type": restore_type, **timings}
+        if profiler:
+            backup_info.profile_files.extend(profiler.stop())
+        try:
+            self.backup_manager.save_backup_info(backup_info)
+        except Exception as e:
+            print(f"保存恢复耗时失败: {e}")
+        return timings
     
     async def check_version_compatibility(self, backup_info: BackupInfo):
         """检查Alembic版本兼容性"""
@@ -74,53 +138,180 @@ class RestoreManager:
                 print(f"警告: 当前版本 {current_version} 与备份版本 {backup_info.alembic_version} 不匹配")
                 # 这里可以添加更严格的版本检查逻辑
     
-    async def execute_full_restore(self, backup_file: str, compressed: bool):
+    async def execute_full_restore(self, backup_file: BackupSource, codec: str,
+                                   timer: Optional[PhaseTimer] = None, key: Optional[bytes] = None) -> int:
         """执行完全恢复 - 先清空数据库，再恢复"""
+        timer = timer or PhaseTimer("restore")
         print("执行完全恢复...")
         
         # 先清空数据库中的所有表
-        await self.clear_database()
+        with timer.phase("clear"):
+            await self.clear_database()
+        
+        # 然后边解压边过滤写入psql：表已清空，跳过备份中的建库、删表等清理语句
+        return await self.execute_restore(backup_file, codec, timer, sql_filter="cleanup", key=key)
+    
+    async def restore_parallel_backup(self, backup_dir: str, backup_id: str, restore_type: str,
+                                      timer: Optional[PhaseTimer] = None,
+                                      key: Optional[bytes] = None) -> tuple[str, int]:
+        """恢复并行COPY格式的备份，返回提示信息和未压缩数据字节数"""
+        timer = timer or PhaseTimer("restore")
+        manifest = self.load_parallel_manifest(backup_dir)
+        raw_bytes = sum(entry.get("raw_bytes", 0) for entry in manifest["tables"])
+        if restore_type == "normal":
+            await self.execute_parallel_restore(backup_dir, timer, key)
+            return f"恢复备份 {backup_id} 成功", raw_bytes
+        elif restore_type == "full":
+            with timer.phase("clear"):
+                await self.clear_database()
+            await self.execute_parallel_restore(backup_dir, timer, key)
+            return f"完全恢复备份 {backup_id} 成功", raw_bytes
+        elif restore_type == "incremental":
+            with timer.phase("read"):
+                tables = self.load_parallel_copy_tables(backup_dir, manifest, key)
+            with timer.phase("apply"):
+                await self.apply_incremental_tables(tables.items())
+            return f"增量恢复备份 {backup_id} 成功", raw_bytes
+        raise ValueError(f"不支持的恢复类型: {restore_type}")
+    
+    def load_parallel_manifest(self, backup_dir: str) -> dict:
+        """读取并行备份目录中的清单文件"""
+        manifest_file = os.path.join(backup_dir, PARALLEL_MANIFEST)
+        if not os.path.exists(manifest_file):
+            raise ValueError(f"并行备份清单不存在: {manifest_file}")
+        with open(manifest_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    async def execute_parallel_restore(self, backup_dir: str, timer: Optional[PhaseTimer] = None,
+                                       key: Optional[bytes] = None):
+        """执行并行COPY恢复：先建表结构，再并行加载数据，最后创建索引和约束"""
+        timer = timer or PhaseTimer("restore")
+        manifest = self.load_parallel_manifest(backup_dir)
+        print(f"执行并行恢复，共 {len(manifest['tables'])} 个表...")
         
-        # 然后执行标准恢复
-        await self.execute_restore(backup_file, compressed)
+        # 较早的加密备份中表结构和序列文件未加密
+        schema_key = key if manifest.get("schema_encrypted") else None
+        with timer.phase("schema"):
+            await self.execute_restore(os.path.join(backup_dir, manifest["schema_pre"]), "none", key=schema_key)
+        with timer.phase("apply"):
+            await asyncio.to_thread(self.copy_tables_parallel, backup_dir, manifest, key)
+        with timer.phase("post_data"):
+            await self.execute_restore(os.path.join(backup_dir, manifest["schema_post"]), "none", key=schema_key)
+            await self.execute_restore(os.path.join(backup_dir, manifest["sequences"]), "none", key=schema_key)
+    
+    def copy_tables_parallel(self, backup_dir: str, manifest: dict, key: Optional[bytes] = None):
+        """使用线程池并行将各表数据COPY回数据库（同一大表的多个分段同样并行加载）"""
+        jobs = max(1, self.backup_config.parallel_jobs)
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [
+                executor.submit(self.copy_table_data, backup_dir, entry, manifest_codec(manifest), key)
+                for entry in manifest["tables"]
+            ]
+            for future in futures:
+                future.result()
+    
+    def copy_table_data(self, backup_dir: str, entry: dict, codec: str, key: Optional[bytes] = None):
+        """以COPY FROM STDIN加载单个表的数据文件"""
+        filepath = os.path.join(backup_dir, entry["file"])
+        conn = self.backup_manager.connect_database()
+        try:
+            cursor = conn.cursor()
+            copy_sql = sql.SQL("COPY {} ({}) FROM STDIN").format(
+                sql.Identifier(entry["schema"], entry["table"]),
+                sql.SQL(', ').join(sql.Identifier(col) for col in entry["columns"])
+            )
+            with open_codec(filepath, codec, 'rb', key=key) as f:
+                cursor.copy_expert(copy_sql, f)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"表 {entry['schema']}.{entry['table']} 数据加载失败: {e}")
+        finally:
+            conn.close()
+        print(f"   📥 表 {entry['schema']}.{entry['table']} 数据加载完成")
+    
+    def load_parallel_copy_tables(self, backup_dir: str, manifest: dict, key: Optional[bytes] = None) -> dict:
+        """从并行备份的数据文件中读取public模式下各表的行数据，供增量恢复使用"""
+        tables = {}
+        for entry in manifest["tables"]:
+            if entry["schema"] != "public":
+                continue
+            filepath = os.path.join(backup_dir, entry["file"])
+            columns = entry["columns"]
+            rows = []
+            with io.TextIOWrapper(open_codec(filepath, manifest_codec(manifest), 'rb', key=key),
+                                  encoding='utf-8') as f:
+                for line in f:
+                    if line.strip():
+                        row_data = line.strip().split('\t')
+                        if len(row_data) == len(columns):
+                            rows.append(row_data)
+            # 拆分导出的大表由多个分段文件组成，合并到同一张表
+            table_data = tables.setdefault(entry["table"], {'columns': columns, 'rows': [], 'count': 0})
+            table_data['rows'].extend(rows)
+            table_data['count'] = len(table_data['rows'])
+            print(f"   📋 表 {entry['table']}: {len(rows)} 行")
+        return tables
     
-    async def execute_incremental_restore(self, backup_file: str, compressed: bool):
+    async def execute_incremental_restore(self, backup_file: BackupSource, codec: str,
+                                          timer: Optional[PhaseTimer] = None, key: Optional[bytes] = None) -> int:
         """用可靠逻辑实现增量恢复：只补齐缺失数据"""
-        import re
+        timer = timer or PhaseTimer("restore")
         print("🔄 [新] 执行简单增量恢复...")
+        if codec == "none" and isinstance(backup_file, str) and key is None:
+            # 本地未压缩备份：mmap后逐表解析并补齐，任一时刻只解码一个表的数据
+            with timer.phase("apply"):
+                await self.apply_incremental_tables(self.iter_mapped_copy_tables(backup_file))
+            return os.path.getsize(backup_file)
         # 1. 读取备份文件内容
-        if compressed:
-            import gzip
-            with gzip.open(backup_file, 'rt', encoding='utf-8') as f:
-                content = f.read()
-        else:
-            with open(backup_file, 'r', encoding='utf-8') as f:
-                content = f.read()
+        with timer.phase("read"):
+            with open_codec(backup_file, codec, 'rb', key=key) as f:
+                content = f.read().decode('utf-8')
         # 2. 解析所有表的COPY数据
-        copy_pattern = r"COPY public\.(\w+)\s*\(([^)]+)\)\s*FROM stdin;\n(.*?)\n\\\."
+        with timer.phase("parse"):
+            tables = self.load_copy_tables(content)
+        # 3. 对比并补齐每个表
+        with timer.phase("apply"):
+            await self.apply_incremental_tables(tables.items())
+        return len(content)
+    
+    def load_copy_tables(self, content: str) -> dict:
+        """从纯文本备份内容中解析public模式下各表的COPY数据"""
         tables = {}
-        for match in re.finditer(copy_pattern, content, re.DOTALL):
+        for match in COPY_BLOCK_PATTERN.finditer(content):
             table_name = match.group(1)
-            columns_str = match.group(2)
-            data_content = match.group(3)
-            columns = [col.strip().strip('"') for col in columns_str.split(',')]
-            rows = []
-            for line in data_content.strip().split('\n'):
-                if line.strip():
-                    row_data = line.strip().split('\t')
-                    if len(row_data) == len(columns):
-                        rows.append(row_data)
-            tables[table_name] = {
-                'columns': columns,
-                'rows': rows,
-                'count': len(rows)
-            }
-            print(f"   📋 表 {table_name}: {len(rows)} 行")
-            print(f"   📊 列: {columns}")
-        # 3. 对比并补齐每个表
-        import psycopg2
+            columns = [col.strip().strip('"') for col in match.group(2).split(',')]
+            tables[table_name] = self.build_copy_table(table_name, columns, match.group(3))
+        return tables
+    
+    def iter_mapped_copy_tables(self, backup_file: str) -> Iterator[Tuple[str, dict]]:
+        """mmap未压缩的纯文本备份，用find定位COPY块，逐表返回解析结果"""
+        with map_file(backup_file) as buf:
+            for block in iter_copy_blocks(buf):
+                data_content = str(block.data, 'utf-8')
+                block.data.release()
+                yield block.table, self.build_copy_table(block.table, block.columns, data_content)
+    
+    def build_copy_table(self, table_name: str, columns: list, data_content: str) -> dict:
+        """将一个COPY块的数据行拆分为行列表"""
+        rows = []
+        for line in data_content.strip().split('\n'):
+            if line.strip():
+                row_data = line.strip().split('\t')
+                if len(row_data) == len(columns):
+                    rows.append(row_data)
+        print(f"   📋 表 {table_name}: {len(rows)} 行")
+        print(f"   📊 列: {columns}")
+        return {
+            'columns': columns,
+            'rows': rows,
+            'count': len(rows)
+        }
+    
+    async def apply_incremental_tables(self, tables: Iterable[Tuple[str, dict]]):
+        """对比当前数据库并补齐备份中存在但当前缺失的行，tables为(表名, 表数据)序列，可以是惰性生成器"""
         total_inserted = 0
-        for table_name, backup_data in tables.items():
+        for table_name, backup_data in tables:
             print(f"\n📊 处理表: {table_name}")
             # 获取当前数据库数据
             conn = psycopg2.connect(
@@ -750,90 +941,8 @@ class RestoreManager:
     
     def filter_cleanup_commands(self, sql_content: str) -> str:
         """过滤掉清理命令，只保留数据插入部分"""
-        lines = sql_content.split('\n')
-        filtered_lines = []
-        in_data_section = False
-        
-        for line in lines:
-            line_upper = line.upper().strip()
-            
-            # 跳过数据库级别的操作
-            if any(keyword in line_upper for keyword in [
-                'DROP DATABASE', 'CREATE DATABASE', 'DROP SCHEMA', 'CREATE SCHEMA'
-            ]):
-                continue
-            
-            # 跳过表结构删除操作
-            if any(keyword in line_upper for keyword in [
-                'DROP TABLE IF EXISTS', 'DROP TABLE', 'DROP SEQUENCE', 'DROP INDEX',
-                'DROP VIEW', 'DROP FUNCTION', 'DROP TRIGGER', 'DROP RULE'
-            ]):
-                continue
-            
-            # 跳过COMMENT ON等元数据命令
-            if line_upper.startswith('COMMENT ON'):
-                continue
-            
-            # 跳过SET语句（环境设置）
-            if line_upper.startswith('SET ') and not in_data_section:
-                continue
-            
-            # 跳过SELECT pg_catalog.set_config等系统调用
-            if 'pg_catalog.set_config' in line_upper and not in_data_section:
-                continue
-            
-            # 检测数据部分的开始
-            if 'COPY ' in line_upper or line_upper.startswith('INSERT INTO'):
-                in_data_section = True
-            
-            # 保留CREATE TABLE语句（表结构）
-            if line_upper.startswith('CREATE TABLE'):
-                filtered_lines.append(line)
-                continue
-            
-            # 保留所有数据操作语句
-            if in_data_section or any(keyword in line_upper for keyword in [
-                'INSERT INTO', 'COPY ', 'SELECT ', 'VALUES'
-            ]):
-                filtered_lines.append(line)
-                continue
-            
-            # 保留其他可能有用的语句
-            if not line_upper.startswith('--') and line.strip():  # 保留非注释行
-                filtered_lines.append(line)
-        
-        return '\n'.join(filtered_lines)
-    
-    async def execute_filtered_restore(self, sql_content: str):
-        """执行过滤后的SQL恢复"""
-        # 构建psql命令
-        cmd = [
-            'psql',
-            f'--host={self.db_config.host}',
-            f'--port={self.db_config.port}',
-            f'--username={self.db_config.username}',
-            f'--dbname={self.db_config.database}',
-            '--quiet'
-        ]
-        
-        # 设置环境变量
-        env = os.environ.copy()
-        env['PGPASSWORD'] = self.db_config.password
-        
-        # 执行SQL恢复
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            env=env
-        )
-        
-        stdout, stderr = await process.communicate(input=sql_content.encode('utf-8'))
-        
-        if process.returncode != 0:
-            error_msg = stderr.decode('utf-8', errors='replace').strip()
-            raise Exception(f"增量恢复失败: {error_msg}")
+        lines = io.BytesIO(sql_content.encode('utf-8'))
+        return b''.join(filter_sql_lines(lines, "cleanup")).decode('utf-8')
     
     async def clear_database(self):
         """清空数据库中的所有表"""
@@ -899,62 +1008,12 @@ class RestoreManager:
     
     def filter_for_incremental_restore(self, sql_content: str) -> str:
         """为增量恢复过滤SQL，只保留数据插入部分"""
-        lines = sql_content.split('\n')
-        filtered_lines = []
-        in_data_section = False
-        
-        for line in lines:
-            line_upper = line.upper().strip()
-            
-            # 跳过数据库级别的操作
-            if any(keyword in line_upper for keyword in [
-                'DROP DATABASE', 'CREATE DATABASE', 'DROP SCHEMA', 'CREATE SCHEMA'
-            ]):
-                continue
-            
-            # 跳过表结构操作（保留现有表结构）
-            if any(keyword in line_upper for keyword in [
-                'DROP TABLE IF EXISTS', 'DROP TABLE', 'CREATE TABLE', 'DROP SEQUENCE', 
-                'DROP INDEX', 'DROP VIEW', 'DROP FUNCTION', 'DROP TRIGGER', 'DROP RULE',
-                'ALTER TABLE', 'CREATE INDEX', 'CREATE SEQUENCE'
-            ]):
-                continue
-            
-            # 跳过COMMENT ON等元数据命令
-            if line_upper.startswith('COMMENT ON'):
-                continue
-            
-            # 跳过SET语句（环境设置）
-            if line_upper.startswith('SET ') and not in_data_section:
-                continue
-            
-            # 跳过SELECT pg_catalog.set_config等系统调用
-            if 'pg_catalog.set_config' in line_upper and not in_data_section:
-                continue
-            
-            # 检测数据部分的开始
-            if 'COPY ' in line_upper or line_upper.startswith('INSERT INTO'):
-                in_data_section = True
-            
-            # 保留所有数据操作语句
-            if in_data_section or any(keyword in line_upper for keyword in [
-                'INSERT INTO', 'COPY ', 'SELECT ', 'VALUES'
-            ]):
-                filtered_lines.append(line)
-                continue
-            
-            # 保留其他可能有用的语句（但不包括表结构）
-            if not line_upper.startswith('--') and line.strip() and not any(keyword in line_upper for keyword in [
-                'CREATE', 'DROP', 'ALTER'
-            ]):
-                filtered_lines.append(line)
-        
-        return '\n'.join(filtered_lines)
+        lines = io.BytesIO(sql_content.encode('utf-8'))
+        return b''.join(filter_sql_lines(lines, "incremental")).decode('utf-8')
     
-    async def execute_restore(self, backup_file: str, compressed: bool):
-        """执行恢复命令"""
-        # 构建psql命令
-        cmd = [
+    def build_psql_command(self) -> list:
+        """构建psql基础命令"""
+        return [
             'psql',
             f'--host={self.db_config.host}',
             f'--port={self.db_config.port}',
@@ -962,35 +1021,65 @@ class RestoreManager:
             f'--dbname={self.db_config.database}',
             '--quiet'
         ]
+    
+    async def execute_restore(self, backup_file: BackupSource, codec: str,
+                              timer: Optional[PhaseTimer] = None, sql_filter: Optional[str] = None,
+                              key: Optional[bytes] = None) -> int:
+        """执行恢复命令：边解压边写入psql，不在内存中保留整个备份，返回未压缩的SQL字节数
+
+        sql_filter为过滤模式（cleanup/incremental）时，在解压和psql之间插入流式过滤；
+        key不为空时先逐块解密并校验。
+        """
+        timer = timer or PhaseTimer("restore")
         
-        # 设置环境变量
-        env = os.environ.copy()
-        env['PGPASSWORD'] = self.db_config.password
-        
-        # 读取SQL内容
-        if compressed:
-            # 从压缩文件读取内容
-            with gzip.open(backup_file, 'rt', encoding='utf-8') as f:
-                sql_content = f.read()
-        else:
-            # 从普通文件读取内容
-            with open(backup_file, 'r', encoding='utf-8') as f:
-                sql_content = f.read()
-        
-        # 执行SQL恢复
+        with timer.phase("apply"):
+            if codec == "none" and not sql_filter and isinstance(backup_file, str) and key is None:
+                # 本地未压缩且无需过滤：mmap后把零拷贝切片直接写入psql
+                with map_file(backup_file) as buf:
+                    await self.pipe_to_psql(iter_slices(buf))
+                    return len(buf)
+            with open_codec(backup_file, codec, 'rb', key=key) as f:
+                if sql_filter:
+                    chunks = batch_lines(filter_sql_lines(iter_lines(f), sql_filter))
+                else:
+                    chunks = iter_chunks(f)
+                await self.pipe_to_psql(chunks)
+                return f.tell()
+    
+    async def pipe_to_psql(self, chunks: Iterator):
+        """把数据块流式写入psql标准输入；读取、解压和过滤在工作线程中进行，不阻塞事件循环"""
         process = await asyncio.create_subprocess_exec(
-            *cmd,
+            *self.build_psql_command(),
             stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
             stderr=subprocess.PIPE,
-            env=env
+            env=self.backup_manager.get_pg_env()
         )
+        # 同时读取stderr，避免psql输出大量错误时管道写满而互相等待
+        stderr_task = asyncio.create_task(process.stderr.read())
+        broken_pipe = False
+        try:
+            while True:
+                chunk = await asyncio.to_thread(next, chunks, None)
+                if chunk is None:
+                    break
+                process.stdin.write(chunk)
+                await process.stdin.drain()
+            process.stdin.close()
+        except (BrokenPipeError, ConnectionResetError):
+            # psql提前退出，具体原因见stderr
+            broken_pipe = True
+        except BaseException:
+            process.kill()
+            await process.wait()
+            stderr_task.cancel()
+            raise
         
-        stdout, stderr = await process.communicate(input=sql_content.encode('utf-8'))
-        
-        if process.returncode != 0:
+        stderr = await stderr_task
+        await process.wait()
+        if process.returncode != 0 or broken_pipe:
             error_msg = stderr.decode('utf-8', errors='replace').strip()
-            raise Exception(f"恢复失败: {error_msg}")
+            raise Exception(f"恢复失败: {error_msg or 'psql提前退出'}")
     
     def get_latest_backup(self) -> Optional[BackupInfo]:
         """获取最新的备份"""
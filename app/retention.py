@@ -0,0 +1,112 @@
+from typing import Dict, List, Optional
+from .jobs import KeyedLocks, catalog_key, job_registry, run_in_background
+from .models import BackupConfig, BackupInfo, BackupStatus, RetentionPreview
+
+
+RETENTION_POLICIES = ("count", "gfs")
+
+# GFS各层级的时间段：备份按创建时间从新到旧排列时，时间段键单调不增
+GFS_PERIODS = (
+    ("hourly", lambda t: (t.year, t.month, t.day, t.hour)),
+    ("daily", lambda t: (t.year, t.month, t.day)),
+    ("weekly", lambda t: tuple(t.isocalendar())[:2]),
+    ("monthly", lambda t: (t.year, t.month)),
+)
+
+# 同一备份目录同一时间只允许一个清理任务运行（调度器和API各自持有BackupManager实例），不同目标互不影响
+_prune_locks = KeyedLocks()
+
+
+def gfs_limits(config: BackupConfig) -> Dict[str, int]:
+    """各层级保留的备份数量"""
+    return {
+        "hourly": config.gfs_hourly,
+        "daily": config.gfs_daily,
+        "weekly": config.gfs_weekly,
+        "monthly": config.gfs_monthly,
+    }
+
+
+def gfs_span_days(config: BackupConfig) -> int:
+    """GFS各层级保留的大致时间跨度（天）"""
+    return max(config.gfs_hourly // 24, config.gfs_daily, config.gfs_weekly * 7, config.gfs_monthly * 31)
+
+
+def select_gfs_survivors(backups: List[BackupInfo], limits: Dict[str, int]) -> Dict[str, List[str]]:
+    """一次遍历计算GFS保留集合，返回 备份ID -> 命中的层级列表
+
+    backups须按创建时间从新到旧排列，每个时间段保留其中最新的备份。
+    """
+    reasons: Dict[str, List[str]] = {}
+    last_keys = {}
+    kept = {name: 0 for name, _ in GFS_PERIODS}
+    for backup in backups:
+        for name, period in GFS_PERIODS:
+            if kept[name] >= limits[name]:
+                continue
+            key = period(backup.created_at)
+            if key != last_keys.get(name):
+                last_keys[name] = key
+                kept[name] += 1
+                reasons.setdefault(backup.id, []).append(name)
+        if all(kept[name] >= limits[name] for name in kept):
+            break
+    return reasons
+
+
+def plan_retention(backups: List[BackupInfo], config: BackupConfig) -> RetentionPreview:
+    """根据保留策略计算需要保留和删除的备份（不执行删除）
+
+    只有已完成的备份参与保留计算；运行中/等待中的备份永远不会被删除，
+    失败的备份在早于最旧的保留备份时删除。
+    """
+    backups = sorted(backups, key=lambda b: b.created_at, reverse=True)
+    completed = [b for b in backups if b.status == BackupStatus.COMPLETED]
+
+    if config.retention_policy == "gfs":
+        reasons = select_gfs_survivors(completed, gfs_limits(config))
+    else:
+        reasons = {b.id: ["count"] for b in completed[:config.max_backups]}
+    # 无论如何配置，至少保留最新的一个完成备份
+    if completed and not reasons:
+        reasons[completed[0].id] = ["latest"]
+
+    survivors = [b for b in completed if b.id in reasons]
+    oldest_kept = survivors[-1].created_at if survivors else None
+    to_delete = [
+        b for b in backups
+        if (b.status == BackupStatus.COMPLETED and b.id not in reasons)
+        or (b.status == BackupStatus.FAILED and oldest_kept is not None and b.created_at < oldest_kept)
+    ]
+    return RetentionPreview(
+        policy=config.retention_policy,
+        keep=[b.id for b in survivors],
+        delete=[b.id for b in to_delete],
+        reasons=reasons,
+        reclaim_bytes=sum(b.size for b in to_delete)
+    )
+
+
+def prune_backups(manager) -> Optional[RetentionPreview]:
+    """按保留策略删除备份，同一备份目录已有清理任务在运行时直接跳过并返回None"""
+    prune_lock = _prune_locks.get(catalog_key(manager))
+    if not prune_lock.acquire(blocking=False):
+        print(f"{manager.backup_config.storage_path} 已有保留策略清理在运行，跳过本次清理")
+        return None
+    try:
+        backups = manager.get_backup_list()
+        plan = plan_retention(backups, manager.backup_config)
+        if not plan.delete:
+            return plan
+        by_id = {b.id: b for b in backups}
+        print(f"保留策略({plan.policy})清理: 保留 {len(plan.keep)} 个，删除 {len(plan.delete)} 个备份")
+        # 直接使用已加载的元数据，不再逐个重新读取
+        job_registry.run_inline(manager, "retention", [by_id[backup_id] for backup_id in plan.delete])
+        return plan
+    finally:
+        prune_lock.release()
+
+
+def schedule_prune(manager):
+    """在工作线程中异步执行保留策略清理，不阻塞调用方（如刚完成的备份请求）"""
+    return run_in_background(prune_backups, manager, description="保留策略清理")
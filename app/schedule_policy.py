@@ -0,0 +1,141 @@
+"""定时备份策略：cron计划、禁止备份的时间窗口、等待数据库空闲和随机延迟
+
+时间窗口格式为 "[星期] HH:MM-HH:MM"，星期可写为 mon-fri、sat,sun 等，省略表示每天；
+结束时间早于开始时间表示跨越午夜（星期指开始的那一天），如 "mon-fri 08:00-20:00"、"22:00-02:00"。
+"""
+import re
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
+
+from .models import BackupConfig
+from .throttle import query_database_load
+
+
+WEEKDAYS = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+CRONTAB_WEEKDAYS = ("sun", "mon", "tue", "wed", "thu", "fri", "sat")  # crontab中0和7都表示星期日
+AUTO_JITTER_SECONDS = 300  # 多个计划同时存在且未配置随机延迟时使用
+QUIET_SAMPLE_SECONDS = 5  # 计算每秒事务数的采样间隔
+
+BlackoutWindow = Tuple[frozenset, int, int]  # (星期集合, 开始分钟, 结束分钟)
+
+
+def parse_weekdays(spec: str) -> frozenset:
+    days = set()
+    for part in spec.lower().split(","):
+        if "-" in part:
+            first, last = (WEEKDAYS.index(day.strip()) for day in part.split("-", 1))
+            days.update(range(first, last + 1) if first <= last else [*range(first, 7), *range(0, last + 1)])
+        else:
+            days.add(WEEKDAYS.index(part.strip()))
+    return frozenset(days)
+
+
+def parse_minutes(value: str) -> int:
+    hours, minutes = value.strip().split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total <= 24 * 60 or not 0 <= int(minutes) < 60:
+        raise ValueError
+    return total
+
+
+def parse_blackout_window(spec: str) -> BlackoutWindow:
+    """解析时间窗口，格式错误时抛出ValueError"""
+    try:
+        parts = spec.split()
+        days = parse_weekdays(parts[0]) if len(parts) == 2 else frozenset(range(7))
+        start, end = (parse_minutes(value) for value in parts[-1].split("-"))
+        if len(parts) > 2 or start == end:
+            raise ValueError
+    except (ValueError, IndexError):
+        raise ValueError(f"无效的时间窗口: {spec}（格式为 \"[mon-fri] HH:MM-HH:MM\"）")
+    return days, start, end
+
+
+def window_end(window: BlackoutWindow, now: datetime) -> Optional[datetime]:
+    """now位于窗口内时返回窗口结束时间，否则返回None"""
+    days, start, end = window
+    minute = now.hour * 60 + now.minute
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    if start < end:
+        if now.weekday() in days and start <= minute < end:
+            return midnight + timedelta(minutes=end)
+    else:
+        if now.weekday() in days and minute >= start:
+            return midnight + timedelta(days=1, minutes=end)
+        if (now.weekday() - 1) % 7 in days and minute < end:
+            return midnight + timedelta(minutes=end)
+    return None
+
+
+def blackout_end(windows: List[str], now: Optional[datetime] = None) -> Optional[datetime]:
+    """当前处于禁止备份的时间窗口时返回可以开始备份的时间（相连的窗口一并跳过），否则返回None"""
+    now = now or datetime.now()
+    parsed = [parse_blackout_window(spec) for spec in windows]
+    end = None
+    for _ in range(len(parsed) * 8):
+        later = [e for e in (window_end(window, end or now) for window in parsed) if e]
+        if not later:
+            break
+        end = max(later)
+    return end
+
+
+def backup_jitter(config: BackupConfig) -> int:
+    """随机延迟秒数：未配置时，有多个计划则自动错开，单个计划不延迟"""
+    if config.schedule_jitter_seconds is not None:
+        return config.schedule_jitter_seconds
+    return AUTO_JITTER_SECONDS if len(config.schedule_cron) > 1 else 0
+
+
+def crontab_day_of_week(field: str) -> str:
+    """把crontab的数字星期（0=星期日）转换为星期名称，APScheduler的数字星期从星期一（0）开始"""
+    if "*" in field or not any(ch.isdigit() for ch in field):
+        return field
+    days = []
+    for part in field.split(","):
+        match = re.fullmatch(r"([0-7])(?:-([0-7]))?(?:/(\d+))?", part)
+        if not match:
+            raise ValueError(f"无效的星期字段: {field}")
+        first = int(match[1])
+        last = int(match[2]) if match[2] else (7 if match[3] else first)
+        days += [CRONTAB_WEEKDAYS[day % 7] for day in range(first, last + 1, int(match[3] or 1))]
+    return ",".join(dict.fromkeys(days))
+
+
+def cron_trigger(expr: str, jitter: Optional[int] = None) -> CronTrigger:
+    """由5段cron表达式（分 时 日 月 星期）创建触发器，星期按crontab的含义解释，支持jitter"""
+    values = expr.split()
+    if len(values) != 5:
+        raise ValueError(f"cron表达式应为5段，实际为 {len(values)} 段")
+    minute, hour, day, month, day_of_week = values
+    return CronTrigger(minute=minute, hour=hour, day=day, month=month,
+                       day_of_week=crontab_day_of_week(day_of_week), jitter=jitter)
+
+
+def build_backup_triggers(config: BackupConfig,
+                          start_date: Optional[datetime] = None) -> List[Tuple[str, object]]:
+    """定时备份的触发器：配置了cron表达式时按cron执行，否则按固定间隔（从start_date开始，默认一个间隔后）"""
+    jitter = backup_jitter(config) or None
+    if config.schedule_cron:
+        return [(expr, cron_trigger(expr, jitter)) for expr in config.schedule_cron]
+    return [(f"每 {config.interval_hours} 小时",
+             IntervalTrigger(hours=config.interval_hours, jitter=jitter, start_date=start_date))]
+
+
+def check_quiet(connect: Callable, config: BackupConfig) -> Tuple[bool, str]:
+    """数据库是否空闲：活跃会话数和每秒事务数都不超过阈值（阈值为0的指标不检查）"""
+    first = query_database_load(connect)
+    reasons = []
+    if config.quiet_max_active_sessions and first["active_sessions"] > config.quiet_max_active_sessions:
+        reasons.append(f"活跃会话 {first['active_sessions']} > {config.quiet_max_active_sessions}")
+    if config.quiet_max_tps:
+        time.sleep(QUIET_SAMPLE_SECONDS)
+        second = query_database_load(connect)
+        tps = (second["transactions"] - first["transactions"]) / (second["sampled_at"] - first["sampled_at"])
+        if tps > config.quiet_max_tps:
+            reasons.append(f"每秒事务数 {tps:.0f} > {config.quiet_max_tps:g}")
+    return not reasons, "，".join(reasons)
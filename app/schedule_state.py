@@ -0,0 +1,77 @@
+"""定时任务状态持久化：各任务的计划和下次运行时间、暂停状态以及上次运行时间
+
+状态按备份目标分别保存在备份目录的 .state 子目录中（先写临时文件再原子替换），重启、重新部署后
+用于保持固定间隔计划的节奏，并发现停机期间错过的运行。写入在后台线程中按提交顺序进行，不阻塞事件循环。
+"""
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime
+from typing import Optional
+
+from .models import BackupConfig
+
+
+STATE_DIR = ".state"  # 备份目录下存放状态文件的子目录（不是.json文件，也不是日期分区，不会被当作备份信息扫描）
+STATE_LOCK = threading.Lock()  # 多个调度器可能共用同一个状态文件
+STATE_WRITER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="schedule-state")
+
+
+def schedule_state_path(config: BackupConfig) -> str:
+    """状态文件路径：相对路径位于备份目录的 .state 子目录下，绝对路径原样使用"""
+    return os.path.join(config.storage_path, STATE_DIR, config.schedule_state_file)
+
+
+def flush_state_writes() -> Future:
+    """在之前提交的所有写入完成后完成的Future"""
+    return STATE_WRITER.submit(lambda: None)
+
+
+def parse_time(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
+
+
+def format_time(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+class ScheduleStateStore:
+    def __init__(self, path: str):
+        self.path = path
+
+    def read_all(self) -> dict:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            # 状态文件损坏时按首次启动处理，不影响调度
+            print(f"读取定时任务状态失败: {e}")
+            return {}
+
+    def load(self, key: str) -> dict:
+        return self.read_all().get(key, {})
+
+    def save(self, key: str, state: dict):
+        with STATE_LOCK:
+            data = self.read_all()
+            data[key] = state
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temp_file = self.path + ".tmp"
+            with open(temp_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(temp_file, self.path)
+
+    def save_in_background(self, key: str, state: dict) -> Future:
+        """在后台线程中保存，失败时只记录日志"""
+        return STATE_WRITER.submit(self.save_logged, key, state)
+
+    def save_logged(self, key: str, state: dict):
+        try:
+            self.save(key, state)
+        except OSError as e:
+            print(f"保存定时任务状态失败: {e}")
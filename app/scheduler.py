@@ -1,71 +1,286 @@
 import asyncio
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Callable, List, Optional
+from apscheduler.events import EVENT_JOB_SUBMITTED
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.triggers.date import DateTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 from .models import DatabaseConfig, BackupConfig, ScheduleStatus
 from .backup import BackupManager
+from .coordinator import Operation, OperationSkipped, coordinator
+from .jobs import job_registry
+from .metrics import record_scheduler_lag
+from .schedule_policy import backup_jitter, blackout_end, build_backup_triggers, check_quiet
+from .schedule_state import ScheduleStateStore, flush_state_writes, format_time, parse_time, schedule_state_path
+from .tiering import TIERING_INTERVAL_HOURS, run_tiering
+
+
+CATCH_UP_DELAY_SECONDS = 30  # 启动后补做错过的任务前的等待，避开启动时的其他初始化
+MISFIRE_GRACE_SECONDS = 60  # 不补做错过的运行时，晚于计划时间超过该值的运行被跳过
+DEFAULT_TARGET = "default"  # 配置中database对应的备份目标
 
 
 class BackupScheduler:
-    def __init__(self, db_config: DatabaseConfig, backup_config: BackupConfig):
+    def __init__(self, db_config: DatabaseConfig, backup_config: BackupConfig, name: str = DEFAULT_TARGET):
+        self.name = name
         self.db_config = db_config
         self.backup_config = backup_config
         self.backup_manager = BackupManager(db_config, backup_config)
         self.scheduler = AsyncIOScheduler()
+        self.scheduler.add_listener(self.on_job_submitted, EVENT_JOB_SUBMITTED)
         self.job_id = "auto_backup"
         self.cleanup_job_id = "auto_cleanup"
-        self.last_run: Optional[datetime] = None
-        self.last_cleanup_run: Optional[datetime] = None
+        self.tiering_job_id = "auto_tiering"
+        self.catch_up_job_id = "auto_backup_catch_up"
         self.is_running = False
+        self.backup_job_ids: List[str] = []
+        self.schedules: List[str] = []
+        self.job_schedules = {}  # 任务ID -> 计划描述，计划不变的任务在配置更新时保留原有节奏
+        self.waiting_reason: Optional[str] = None
+        self.tasks = set()  # 后台运行的触发备份，保留引用防止被回收
+        self.waiting_since: Optional[datetime] = None
+        
+        # 加载上次运行保存的状态
+        self.state_store = ScheduleStateStore(schedule_state_path(backup_config))
+        self.state = self.state_store.load(self.name)
+        self.saved_state: Optional[dict] = None  # 上次写入的状态（不含updated_at），未改变时不再写入
+        self.last_run: Optional[datetime] = parse_time(self.state.get("last_run"))
+        self.last_cleanup_run: Optional[datetime] = parse_time(self.state.get("last_cleanup_run"))
+        self.paused = self.state.get("paused", False)
+        self.catch_up_at: Optional[datetime] = None
     
     async def start(self):
-        """启动定时任务调度器"""
+        """启动定时任务调度器，恢复上次保存的计划节奏并补做停机期间错过的运行"""
         if self.is_running:
             return
         
-        # 添加定时备份任务
-        self.scheduler.add_job(
-            func=self.perform_backup,
-            trigger=IntervalTrigger(hours=self.backup_config.interval_hours),
-            id=self.job_id,
-            name="自动备份任务",
-            replace_existing=True
-        )
-        
-        # 添加定时清理任务
-        if self.backup_config.cleanup_enabled:
-            self.scheduler.add_job(
-                func=self.perform_cleanup,
-                trigger=IntervalTrigger(days=self.backup_config.cleanup_interval_days),
-                id=self.cleanup_job_id,
-                name="自动清理任务",
-                replace_existing=True
-            )
+        self.sync_jobs()
         
         self.scheduler.start()
         self.is_running = True
-        print(f"定时备份任务已启动，每 {self.backup_config.interval_hours} 小时执行一次")
+        self.save_state()
+        print(f"[{self.name}] 定时备份任务已启动: {'; '.join(self.schedules)}{'（已暂停）' if self.paused else ''}")
         if self.backup_config.cleanup_enabled:
             print(f"定时清理任务已启动，每 {self.backup_config.cleanup_interval_days} 天执行一次")
     
+    async def reconfigure(self, db_config: DatabaseConfig, backup_config: BackupConfig):
+        """配置更新后就地调整任务，不重启调度器；计划未改变的任务保持原来的下次运行时间"""
+        self.db_config = db_config
+        self.backup_config = backup_config
+        self.backup_manager = BackupManager(db_config, backup_config)
+        state_path = schedule_state_path(backup_config)
+        if state_path != self.state_store.path:
+            self.state_store = ScheduleStateStore(state_path)
+            self.saved_state = None
+        if self.is_running:
+            self.sync_jobs()
+            self.save_state()
+            print(f"[{self.name}] 定时任务已更新: {'; '.join(self.schedules)}")
+    
+    def sync_jobs(self):
+        """按当前配置添加、更新或删除定时备份、清理和分层存储任务"""
+        self.sync_backup_jobs()
+        
+        # 定时清理任务
+        if self.backup_config.cleanup_enabled:
+            days = self.backup_config.cleanup_interval_days
+            self.ensure_job(self.cleanup_job_id, self.perform_cleanup, "自动清理任务", f"每 {days} 天",
+                            lambda start: IntervalTrigger(days=days, start_date=start))
+        else:
+            self.remove_job(self.cleanup_job_id)
+        
+        # 配置了冷存储时定期把旧备份移动到冷存储
+        if self.backup_config.cold_storage_path:
+            self.ensure_job(self.tiering_job_id, self.perform_tiering, "分层存储任务",
+                            f"每 {TIERING_INTERVAL_HOURS} 小时",
+                            lambda start: IntervalTrigger(hours=TIERING_INTERVAL_HOURS, start_date=start))
+        else:
+            self.remove_job(self.tiering_job_id)
+    
+    def sync_backup_jobs(self):
+        """按cron表达式（每个表达式一个任务）或固定间隔设置定时备份任务"""
+        triggers = build_backup_triggers(self.backup_config)
+        job_ids = [self.job_id if index == 0 else f"{self.job_id}_{index}" for index in range(len(triggers))]
+        for job_id in self.backup_job_ids:
+            if job_id not in job_ids:
+                self.remove_job(job_id)
+        self.backup_job_ids = job_ids
+        self.schedules = []
+        missed = []
+        jitter = backup_jitter(self.backup_config)
+        for job_id, (description, trigger) in zip(job_ids, triggers):
+            # 固定间隔的触发器需要按保存的下次运行时间重建，cron触发器与启动时间无关
+            if isinstance(trigger, IntervalTrigger):
+                make_trigger = lambda start: build_backup_triggers(self.backup_config, start)[0][1]
+            else:
+                make_trigger = lambda start, trigger=trigger: trigger
+            # 同一任务在等待期间再次到期时跳过（max_instances=1），不会堆积多个备份
+            if self.ensure_job(job_id, self.perform_scheduled_backup, f"自动备份任务（{description}）",
+                               f"{description}|{jitter}", make_trigger):
+                missed.append(job_id)
+            self.schedules.append(description)
+        if missed and not self.paused:
+            self.schedule_catch_up(missed)
+    
+    def ensure_job(self, job_id: str, func: Callable, name: str, schedule: str,
+                   make_trigger: Callable[[Optional[datetime]], object]) -> bool:
+        """添加或就地更新任务，返回停机期间是否错过了运行
+        
+        计划不变的任务保持不动；首次添加时按保存的下次运行时间恢复固定间隔的节奏，
+        错过的运行由schedule_catch_up合并为一次补做，不会连续补跑多次。
+        """
+        job = self.scheduler.get_job(job_id)
+        misfire_grace_time = None if self.backup_config.schedule_catch_up else MISFIRE_GRACE_SECONDS
+        if job and self.job_schedules.get(job_id) == schedule:
+            job.modify(misfire_grace_time=misfire_grace_time)
+            return False
+        
+        saved = self.state.get("jobs", {}).get(job_id, {}) if not job else {}
+        saved_next = parse_time(saved.get("next_run")) if saved.get("schedule") == schedule else None
+        now = datetime.now().astimezone()
+        missed = saved_next is not None and saved_next < now
+        start = saved_next
+        if missed and func != self.perform_scheduled_backup and self.backup_config.schedule_catch_up:
+            # 清理和分层存储任务直接从补做时间开始新的间隔
+            start = now + timedelta(seconds=CATCH_UP_DELAY_SECONDS)
+        trigger = make_trigger(start)
+        
+        if job:
+            self.scheduler.reschedule_job(job_id, trigger=trigger)
+            job.modify(name=name, misfire_grace_time=misfire_grace_time)
+        else:
+            # 错过的运行合并为一次（coalesce），不会在事件循环阻塞后连续执行多次
+            self.scheduler.add_job(
+                func=func,
+                trigger=trigger,
+                id=job_id,
+                name=name,
+                coalesce=True,
+                misfire_grace_time=misfire_grace_time,
+                replace_existing=True
+            )
+        if self.paused and job_id in self.backup_job_ids:
+            self.scheduler.pause_job(job_id)
+        self.job_schedules[job_id] = schedule
+        return missed and func == self.perform_scheduled_backup
+    
+    def remove_job(self, job_id: str):
+        if self.scheduler.get_job(job_id):
+            self.scheduler.remove_job(job_id)
+        self.job_schedules.pop(job_id, None)
+    
+    def schedule_catch_up(self, missed: List[str]):
+        """停机期间错过的定时备份（无论错过几次、几个计划）合并为一次补做"""
+        if not self.backup_config.schedule_catch_up:
+            print(f"停机期间错过了定时备份 {', '.join(missed)}，按配置不补做")
+            return
+        self.catch_up_at = datetime.now().astimezone() + timedelta(seconds=CATCH_UP_DELAY_SECONDS)
+        self.scheduler.add_job(
+            func=self.perform_catch_up,
+            trigger=DateTrigger(run_date=self.catch_up_at),
+            id=self.catch_up_job_id,
+            name="补做错过的定时备份",
+            misfire_grace_time=None,
+            replace_existing=True
+        )
+        print(f"停机期间错过了定时备份，将在 {self.catch_up_at:%Y-%m-%d %H:%M:%S} 补做一次")
+    
+    async def perform_catch_up(self):
+        self.catch_up_at = None
+        await self.perform_scheduled_backup()
+    
+    def on_job_submitted(self, event):
+        """记录任务实际提交时间与计划时间的延迟，并保存新的下次运行时间"""
+        record_scheduler_lag(event.job_id, event.scheduled_run_times)
+        self.save_state()
+    
+    def save_state(self):
+        """在后台保存各任务的计划、下次运行时间、暂停状态和上次运行时间（未改变时跳过，失败时只记录日志）"""
+        jobs = {}
+        for job_id, schedule in self.job_schedules.items():
+            job = self.scheduler.get_job(job_id)
+            if job:
+                jobs[job_id] = {"schedule": schedule, "next_run": format_time(job.next_run_time)}
+        state = {
+            "jobs": jobs,
+            "paused": self.paused,
+            "last_run": format_time(self.last_run),
+            "last_cleanup_run": format_time(self.last_cleanup_run),
+        }
+        if state == self.saved_state:
+            return
+        self.saved_state = state
+        self.state = {**state, "updated_at": format_time(datetime.now())}
+        self.state_store.save_in_background(self.name, self.state)
+    
     async def stop(self):
-        """停止定时任务调度器"""
+        """停止定时任务调度器（先保存状态，下次启动时补做期间错过的运行）"""
         if not self.is_running:
             return
         
+        self.save_state()
         self.scheduler.shutdown()
         self.is_running = False
+        await asyncio.wrap_future(flush_state_writes())
         print("定时备份任务已停止")
     
-    async def perform_backup(self):
-        """执行备份任务"""
+    async def perform_scheduled_backup(self):
+        """定时备份：避开禁止备份的时间窗口，按配置等待数据库空闲（最多quiet_max_delay_minutes）后执行
+
+        上一次定时备份仍在等待、排队或运行时跳过本次。
+        """
+        try:
+            operation = self.backup_manager.submit_backup("scheduled", "自动备份")
+        except OperationSkipped as e:
+            print(f"跳过本次定时备份: {e}")
+            return
+        config = self.backup_config
+        deadline = None
+        self.waiting_since = datetime.now()
+        try:
+            while True:
+                end = blackout_end(config.blackout_windows)
+                if end:
+                    self.waiting_reason = operation.waiting_reason = f"禁止备份时间窗口，{end:%Y-%m-%d %H:%M} 后开始"
+                    print(f"定时备份推迟: {self.waiting_reason}")
+                    await asyncio.sleep(max(1.0, (end - datetime.now()).total_seconds()))
+                    continue
+                if not config.wait_for_quiet:
+                    break
+                deadline = deadline or datetime.now() + timedelta(minutes=config.quiet_max_delay_minutes)
+                if datetime.now() >= deadline:
+                    print(f"等待数据库空闲已超过 {config.quiet_max_delay_minutes} 分钟，开始备份")
+                    break
+                try:
+                    quiet, reason = await asyncio.to_thread(
+                        check_quiet, self.backup_manager.connect_database, config
+                    )
+                except Exception as e:
+                    # 无法判断负载时不阻止备份，备份本身会报告连接错误
+                    print(f"数据库负载检测失败，直接开始备份: {e}")
+                    break
+                if quiet:
+                    break
+                self.waiting_reason = operation.waiting_reason = f"数据库繁忙（{reason}）"
+                print(f"定时备份等待数据库空闲: {reason}")
+                await asyncio.sleep(config.quiet_check_interval_s)
+        except BaseException as e:
+            coordinator.abandon(operation, e)
+            raise
+        finally:
+            self.waiting_reason = None
+            self.waiting_since = None
+        await self.perform_backup(operation)
+    
+    async def perform_backup(self, operation: Operation):
+        """执行备份任务（在协调器中排队）"""
         try:
             print(f"开始执行定时备份任务: {datetime.now()}")
             backup_info = await self.backup_manager.create_backup(
-                description="自动备份"
+                description="自动备份", operation=operation
             )
             self.last_run = datetime.now()
+            self.save_state()
             print(f"自动备份完成: {backup_info.filename}")
             
         except Exception as e:
@@ -75,61 +290,88 @@ class BackupScheduler:
         """执行清理任务"""
         try:
             print(f"开始执行定时清理任务: {datetime.now()}")
-            deleted_count, deleted_files = self.backup_manager.cleanup_old_backups_by_date()
+            expired = await asyncio.to_thread(self.backup_manager.find_expired_backups)
+            if expired:
+                job = await asyncio.to_thread(job_registry.run_inline, self.backup_manager, "cleanup", expired)
+                print(f"自动清理完成: 删除了 {len(job.deleted)} 个备份文件")
+                if job.failed:
+                    print(f"删除失败: {job.failed}")
+            else:
+                print("自动清理完成: 没有过期的备份")
             self.last_cleanup_run = datetime.now()
-            print(f"自动清理完成: 删除了 {deleted_count} 个备份文件")
-            if deleted_files:
-                print(f"删除的文件: {', '.join(deleted_files)}")
+            self.save_state()
             
         except Exception as e:
             print(f"自动清理失败: {e}")
     
-    async def trigger_backup(self):
-        """手动触发备份任务"""
-        await self.perform_backup()
+    async def perform_tiering(self):
+        """执行分层存储任务"""
+        try:
+            await asyncio.to_thread(run_tiering, self.backup_manager)
+        except Exception as e:
+            print(f"分层存储任务失败: {e}")
+    
+    def trigger_backup(self) -> Operation:
+        """立即触发一次定时备份并在后台运行，已有定时备份未完成时抛出OperationSkipped"""
+        operation = self.backup_manager.submit_backup("trigger", "手动触发备份")
+        task = asyncio.create_task(self.perform_backup(operation))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        return operation
     
     def get_status(self) -> ScheduleStatus:
         """获取调度器状态"""
         next_run = None
         if self.is_running:
-            job = self.scheduler.get_job(self.job_id)
-            if job:
-                next_run = job.next_run_time
+            run_times = [
+                job.next_run_time for job in map(self.scheduler.get_job, self.backup_job_ids)
+                if job and job.next_run_time
+            ]
+            if self.catch_up_at:
+                run_times.append(self.catch_up_at)
+            next_run = min(run_times) if run_times else None
         
         return ScheduleStatus(
             enabled=self.is_running,
             next_run=next_run,
             last_run=self.last_run,
-            interval_hours=self.backup_config.interval_hours
+            interval_hours=self.backup_config.interval_hours,
+            schedules=self.schedules,
+            blackout_windows=self.backup_config.blackout_windows,
+            waiting_reason=self.waiting_reason,
+            waiting_since=self.waiting_since,
+            paused=self.paused,
+            catch_up_at=self.catch_up_at
         )
     
     async def update_schedule(self, interval_hours: int):
-        """更新调度间隔"""
+        """更新调度间隔（配置了cron表达式时cron计划仍然优先）"""
         self.backup_config.interval_hours = interval_hours
         
         if self.is_running:
-            # 删除旧任务
-            self.scheduler.remove_job(self.job_id)
-            
-            # 添加新任务
-            self.scheduler.add_job(
-                func=self.perform_backup,
-                trigger=IntervalTrigger(hours=interval_hours),
-                id=self.job_id,
-                name="自动备份任务",
-                replace_existing=True
-            )
+            # 就地替换触发器
+            self.sync_backup_jobs()
+            self.save_state()
             
             print(f"调度间隔已更新为 {interval_hours} 小时")
     
     async def pause_schedule(self):
         """暂停调度任务"""
         if self.is_running:
-            self.scheduler.pause_job(self.job_id)
+            for job_id in self.backup_job_ids:
+                self.scheduler.pause_job(job_id)
+            # 暂停时取消尚未执行的补做
+            self.remove_job(self.catch_up_job_id)
+            self.catch_up_at = None
+            self.paused = True
+            self.save_state()
             print("定时备份任务已暂停")
     
     async def resume_schedule(self):
         """恢复调度任务"""
         if self.is_running:
-            self.scheduler.resume_job(self.job_id)
+            for job_id in self.backup_job_ids:
+                self.scheduler.resume_job(job_id)
+            self.paused = False
+            self.save_state()
             print("定时备份任务已恢复") 
\ No newline at end of file
@@ -0,0 +1,132 @@
+import re
+from typing import BinaryIO, Iterable, Iterator
+
+
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# 完全恢复跳过的语句（数据库/模式级操作、对象删除、注释）
+CLEANUP_SKIP_PREFIXES = (
+    'DROP DATABASE', 'CREATE DATABASE', 'DROP SCHEMA', 'CREATE SCHEMA',
+    'DROP TABLE', 'DROP SEQUENCE', 'DROP INDEX', 'DROP VIEW',
+    'DROP FUNCTION', 'DROP TRIGGER', 'DROP RULE', 'COMMENT ON',
+)
+# 增量恢复保留现有表结构：另外跳过建表、改表和建索引/序列，数据部分之前的其他DDL也一并跳过
+INCREMENTAL_SKIP_PREFIXES = CLEANUP_SKIP_PREFIXES + ('CREATE TABLE', 'ALTER TABLE', 'CREATE INDEX', 'CREATE SEQUENCE')
+INCREMENTAL_PRE_DATA_SKIP_PREFIXES = ('CREATE', 'DROP', 'ALTER')
+
+# 过滤模式 -> (始终跳过的语句, 只在数据部分之前跳过的语句)
+FILTER_MODES = {
+    "cleanup": (CLEANUP_SKIP_PREFIXES, ()),
+    "incremental": (INCREMENTAL_SKIP_PREFIXES, INCREMENTAL_PRE_DATA_SKIP_PREFIXES),
+}
+
+
+def _prefix_pattern(prefixes: Iterable[str]) -> bytes:
+    return b'|'.join(re.escape(p.encode('ascii')).replace(b'\\ ', rb'\s+') + rb'\b' for p in prefixes)
+
+
+def compile_statement_matcher(skip_prefixes: Iterable[str], pre_data_skip_prefixes: Iterable[str] = ()) -> re.Pattern:
+    """把语句开头的所有判断合并为一个预编译正则，每行只匹配一次"""
+    pre_data = b'|' + _prefix_pattern(pre_data_skip_prefixes) if pre_data_skip_prefixes else b''
+    return re.compile(
+        rb'\s*(?:(?P<copy>COPY\b.*\bFROM\s+stdin\s*;\s*$)'
+        rb'|(?P<data>INSERT\s+INTO\b|COPY\b)'
+        rb'|(?P<skip>' + _prefix_pattern(skip_prefixes) + rb')'
+        rb'|(?P<setup>SET\b|SELECT\s+pg_catalog\.set_config\b' + pre_data + rb'))',
+        re.IGNORECASE
+    )
+
+
+STATEMENT_MATCHERS = {mode: compile_statement_matcher(*prefixes) for mode, prefixes in FILTER_MODES.items()}
+DOLLAR_QUOTE = re.compile(rb'\$(?:[A-Za-z_][A-Za-z_0-9]*)?\$')
+COPY_END = b'\\.'
+
+
+def _scan_statement_end(line: bytes, dollar_tag):
+    """返回(语句是否在本行结束, 行尾仍未闭合的美元引号标记)"""
+    for match in DOLLAR_QUOTE.finditer(line):
+        tag = match.group(0)
+        if dollar_tag is None:
+            dollar_tag = tag
+        elif tag == dollar_tag:
+            dollar_tag = None
+    return dollar_tag is None and line.rstrip().endswith(b';'), dollar_tag
+
+
+def filter_sql_lines(lines: Iterable[bytes], mode: str = "cleanup") -> Iterator[bytes]:
+    """流式过滤pg_dump纯文本输出（逐行输入、逐行输出）
+
+    状态机：语句开头用一个正则判断保留或跳过，多行语句整体跟随首行的决定（直到行尾分号，
+    美元引号内的分号不算）；COPY数据块原样透传直到 \\.，数据行内容不参与匹配。
+    数据部分开始前的SET/set_config环境设置（增量模式下还有其他DDL）会被跳过，注释和空行一律丢弃，psql元命令按单行语句原样保留。
+    """
+    matcher = STATEMENT_MATCHERS[mode]
+    in_copy = False
+    in_statement = False
+    keep_statement = True
+    dollar_tag = None
+    in_data_section = False
+
+    for line in lines:
+        if in_copy:
+            yield line
+            if line.rstrip(b'\r\n') == COPY_END:
+                in_copy = False
+            continue
+
+        if in_statement:
+            ended, dollar_tag = _scan_statement_end(line, dollar_tag)
+            if keep_statement:
+                yield line
+            in_statement = not ended
+            continue
+
+        stripped = line.strip()
+        if not stripped or stripped.startswith(b'--'):
+            continue
+
+        if stripped.startswith(b'\\'):
+            # psql元命令（\connect、\restrict等）只占一行且没有分号，原样保留，不影响下一条语句
+            yield line
+            continue
+
+        match = matcher.match(line)
+        kind = match.lastgroup if match else None
+        if kind == "copy":
+            in_data_section = True
+            in_copy = True
+            yield line
+            continue
+        if kind == "data":
+            in_data_section = True
+        keep_statement = kind != "skip" and not (kind == "setup" and not in_data_section)
+
+        ended, dollar_tag = _scan_statement_end(line, None)
+        in_statement = not ended
+        if keep_statement:
+            yield line
+
+
+def iter_lines(f: BinaryIO) -> Iterator[bytes]:
+    """逐行读取二进制文件（保留换行符）"""
+    return iter(f.readline, b'')
+
+
+def iter_chunks(f: BinaryIO, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """按固定大小分块读取二进制文件"""
+    return iter(lambda: f.read(chunk_size), b'')
+
+
+def batch_lines(lines: Iterable[bytes], chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """把逐行输出合并为较大的块，减少写管道的次数"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield b''.join(buffer)
+            buffer = []
+            size = 0
+    if buffer:
+        yield b''.join(buffer)
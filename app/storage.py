@@ -0,0 +1,348 @@
+"""备份文件存储后端：本地目录或S3兼容的对象存储（AWS S3、MinIO等）
+
+对象存储上传使用分段上传，多个分段由线程池并行上传，pg_dump的输出边压缩边上传，不在本地落盘；
+恢复时按字节范围并行下载，按顺序交给解压和psql，吞吐量随连接数增加而不受单个连接限制。
+"""
+import io
+import os
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from .models import BackupConfig
+
+
+STORAGE_BACKENDS = ("local", "s3")
+MIN_PART_SIZE_MB = 5  # S3要求除最后一段外每个分段不小于5MB
+MAX_PARTS = 10000  # S3单次分段上传最多10000个分段
+MAX_PART_SIZE = 5 * 1024 ** 3  # 单个分段最大5GB
+PARTS_PER_SIZE_STEP = 1000  # 每上传这么多个分段，分段大小翻倍
+
+
+class StorageBackend(ABC):
+    """存储后端接口，key为相对于后端根目录（或桶前缀）的路径，统一使用 / 分隔"""
+    name = ""
+
+    @abstractmethod
+    def open_writer(self, key: str):
+        """打开写入流：正常退出with块时提交，发生异常时放弃，读取方不会看到写了一半的对象"""
+
+    @abstractmethod
+    def open_reader(self, key: str, start: int = 0, end: Optional[int] = None) -> io.RawIOBase:
+        """打开只读的顺序读取流，从start读到end（不含，为空时读到结尾）"""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        ...
+
+    @abstractmethod
+    def size(self, key: str) -> int:
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        """删除对象，不存在时忽略"""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """本地文件路径（可直接mmap或交给FileResponse），对象存储返回None"""
+        return None
+
+
+class LocalFileWriter:
+    """先写临时文件，提交时原子替换为目标文件"""
+    def __init__(self, path: str):
+        self.path = path
+        self.temp_path = path + ".tmp"
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.file = open(self.temp_path, 'wb')
+
+    def write(self, data) -> int:
+        return self.file.write(data)
+
+    def commit(self):
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class LocalStorage(StorageBackend):
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def local_path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split('/'))
+
+    def open_writer(self, key: str) -> LocalFileWriter:
+        return LocalFileWriter(self.local_path(key))
+
+    def open_reader(self, key: str, start: int = 0, end: Optional[int] = None) -> io.RawIOBase:
+        # 本地文件由调用方按长度停止读取，end只对对象存储限制下载范围
+        f = open(self.local_path(key), 'rb', buffering=0)
+        if start:
+            f.seek(start)
+        return f
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.local_path(key))
+
+    def size(self, key: str) -> int:
+        return os.path.getsize(self.local_path(key))
+
+    def delete(self, key: str):
+        path = self.local_path(key)
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        else:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class MultipartUploadWriter:
+    """S3分段上传写入流
+
+    写入的数据按part_size切分，由线程池并行上传；同时在途的分段数有上限，内存占用约为
+    part_size * max_concurrency * 2。不足一个分段的小对象在提交时直接用PutObject上传。
+    备份大小事先未知，每上传 PARTS_PER_SIZE_STEP 个分段分段大小翻倍，避免超过S3的分段数上限
+    （16MB起步时约160GB后分段为128MB，总容量约16TB）。
+    """
+    def __init__(self, storage: "S3Storage", key: str):
+        self.storage = storage
+        self.client = storage.client
+        self.key = storage.object_key(key)
+        self.part_size = storage.part_size
+        self.buffer = bytearray()
+        self.upload_id: Optional[str] = None
+        self.parts = []
+        self.executor = ThreadPoolExecutor(max_workers=storage.max_concurrency)
+        self.slots = threading.BoundedSemaphore(storage.max_concurrency * 2)
+        self.bytes_written = 0
+
+    def write(self, data) -> int:
+        self.buffer += data
+        self.bytes_written += len(data)
+        while len(self.buffer) >= self.part_size:
+            part = bytes(self.buffer[:self.part_size])
+            del self.buffer[:self.part_size]
+            self.submit_part(part)
+        return len(data)
+
+    def submit_part(self, data: bytes):
+        self.raise_failed_part()
+        if len(self.parts) >= MAX_PARTS:
+            raise Exception(f"对象超过分段上传的上限（{MAX_PARTS} 个分段），已上传 {self.bytes_written} 字节")
+        if self.upload_id is None:
+            response = self.client.create_multipart_upload(Bucket=self.storage.bucket, Key=self.key)
+            self.upload_id = response["UploadId"]
+        # 在途分段已满时阻塞写入方（压缩和pg_dump随之放慢），而不是无限缓存
+        self.slots.acquire()
+        part_number = len(self.parts) + 1
+        self.parts.append(self.executor.submit(self.upload_part, part_number, data))
+        if part_number % PARTS_PER_SIZE_STEP == 0:
+            self.part_size = min(self.part_size * 2, MAX_PART_SIZE)
+
+    def upload_part(self, part_number: int, data: bytes) -> dict:
+        try:
+            response = self.client.upload_part(
+                Bucket=self.storage.bucket, Key=self.key, UploadId=self.upload_id,
+                PartNumber=part_number, Body=data
+            )
+            return {"PartNumber": part_number, "ETag": response["ETag"]}
+        finally:
+            self.slots.release()
+
+    def raise_failed_part(self):
+        """尽早暴露已失败的分段，避免继续导出注定无法提交的数据"""
+        for future in self.parts:
+            if future.done() and future.exception():
+                raise Exception(f"上传分段失败: {future.exception()}")
+
+    def commit(self):
+        try:
+            if self.upload_id is None:
+                self.client.put_object(Bucket=self.storage.bucket, Key=self.key, Body=bytes(self.buffer))
+            else:
+                if self.buffer:
+                    self.submit_part(bytes(self.buffer))
+                parts = [future.result() for future in self.parts]
+                self.client.complete_multipart_upload(
+                    Bucket=self.storage.bucket, Key=self.key, UploadId=self.upload_id,
+                    MultipartUpload={"Parts": parts}
+                )
+        except Exception:
+            self.abort()
+            raise
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def abort(self):
+        for future in self.parts:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+        self.buffer.clear()
+        if self.upload_id is not None:
+            upload_id, self.upload_id = self.upload_id, None
+            try:
+                self.client.abort_multipart_upload(Bucket=self.storage.bucket, Key=self.key, UploadId=upload_id)
+            except Exception as e:
+                raise Exception(f"放弃分段上传失败（可通过桶生命周期规则清理）: {e}") from e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+
+class RangedReader(io.RawIOBase):
+    """按字节范围并行下载对象的顺序读取流
+
+    预先提交最多max_concurrency个范围请求，按顺序消费，消费一个再提交下一个。
+    start/end（不含）限制下载的范围，用于HTTP Range请求。
+    """
+    def __init__(self, storage: "S3Storage", key: str, start: int = 0, end: Optional[int] = None):
+        super().__init__()
+        self.storage = storage
+        self.client = storage.client
+        self.key = storage.object_key(key)
+        self.part_size = storage.part_size
+        if end is None:
+            end = self.client.head_object(Bucket=storage.bucket, Key=self.key)["ContentLength"]
+        self.length = end
+        self.executor = ThreadPoolExecutor(max_workers=storage.max_concurrency)
+        self.pending = deque()
+        self.next_offset = start
+        self.current = memoryview(b'')
+        self.position = 0
+        for _ in range(storage.max_concurrency):
+            self.submit_next()
+
+    def submit_next(self):
+        if self.next_offset >= self.length:
+            return
+        end = min(self.next_offset + self.part_size, self.length) - 1
+        self.pending.append(self.executor.submit(self.fetch_range, self.next_offset, end))
+        self.next_offset = end + 1
+
+    def fetch_range(self, start: int, end: int) -> bytes:
+        response = self.client.get_object(Bucket=self.storage.bucket, Key=self.key, Range=f"bytes={start}-{end}")
+        data = response["Body"].read()
+        if len(data) != end - start + 1:
+            raise Exception(f"下载范围 {start}-{end} 不完整: {len(data)} 字节")
+        return data
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self.current:
+            if not self.pending:
+                return 0
+            self.current = memoryview(self.pending.popleft().result())
+            self.submit_next()
+        count = min(len(buffer), len(self.current))
+        buffer[:count] = self.current[:count]
+        self.current = self.current[count:]
+        self.position += count
+        return count
+
+    def tell(self) -> int:
+        return self.position
+
+    def close(self):
+        if not self.closed:
+            for future in self.pending:
+                future.cancel()
+            self.executor.shutdown(wait=True)
+            self.pending.clear()
+        super().close()
+
+
+class S3Storage(StorageBackend):
+    """S3兼容对象存储，依赖boto3（仅在启用时导入）"""
+    name = "s3"
+
+    def __init__(self, bucket: str, prefix: str = "", endpoint_url: str = "", region: str = "",
+                 access_key: str = "", secret_key: str = "", part_size_mb: int = 16, max_concurrency: int = 8):
+        try:
+            import boto3
+            from botocore.config import Config as BotoConfig
+        except ImportError:
+            raise ValueError("使用S3存储需要安装boto3: pip install boto3")
+        self.bucket = bucket
+        self.prefix = prefix.strip('/')
+        self.part_size = max(part_size_mb, MIN_PART_SIZE_MB) * 1024 * 1024
+        self.max_concurrency = max(1, max_concurrency)
+        # 连接池需容纳所有并行分段，否则多出的请求会排队等待连接
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key or None,
+            aws_secret_access_key=secret_key or None,
+            config=BotoConfig(max_pool_connections=self.max_concurrency * 2)
+        )
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def open_writer(self, key: str) -> MultipartUploadWriter:
+        return MultipartUploadWriter(self, key)
+
+    def open_reader(self, key: str, start: int = 0, end: Optional[int] = None) -> RangedReader:
+        return RangedReader(self, key, start, end)
+
+    def exists(self, key: str) -> bool:
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except self.client.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def size(self, key: str) -> int:
+        return self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))["ContentLength"]
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+
+def create_storage(config: BackupConfig) -> StorageBackend:
+    """根据配置创建新备份使用的存储后端"""
+    if config.storage_backend == "s3":
+        return S3Storage(
+            bucket=config.s3_bucket,
+            prefix=config.s3_prefix,
+            endpoint_url=config.s3_endpoint_url,
+            region=config.s3_region,
+            access_key=config.s3_access_key,
+            secret_key=config.s3_secret_key,
+            part_size_mb=config.s3_part_size_mb,
+            max_concurrency=config.s3_max_concurrency
+        )
+    return LocalStorage(config.storage_path)
@@ -0,0 +1,83 @@
+"""多个备份目标：一个实例备份多个数据库
+
+配置中的 database 为默认目标（default），targets 中的每一项为一个命名目标，使用全局备份配置，
+backup 字段覆盖其中的计划、保留策略等设置。命名目标的备份目录、冷存储目录和对象键前缀
+在全局设置后追加目标名，各目标的备份目录互不干扰。所有目标的备份共享协调器中的全局名额和
+每个主机的名额（global_max_concurrent_backups、host_max_concurrent_backups）。
+"""
+import os
+import re
+from typing import List, Tuple
+
+from .backup import BackupManager
+from .models import BackupConfig, Config, DatabaseConfig, TargetConfig
+from .restore import RestoreManager
+from .scheduler import DEFAULT_TARGET, BackupScheduler
+
+
+TARGET_NAME_PATTERN = re.compile(r"^[A-Za-z][A-Za-z0-9_-]{0,63}$")  # 不能是纯数字，避免与日期分区目录混淆
+
+# 进程级的设置只能在全局备份配置中修改
+GLOBAL_ONLY_FIELDS = {
+    "global_max_concurrent_backups", "host_max_concurrent_backups", "schedule_state_file",
+    "throttle_read_mb_s", "throttle_write_mb_s", "dump_nice", "dump_ionice_class",
+    "load_aware_throttle", "load_max_active_sessions", "load_max_replication_lag_s",
+    "load_min_factor", "load_check_interval_s",
+}
+
+
+def target_backup_config(base: BackupConfig, target: TargetConfig) -> BackupConfig:
+    """目标的备份配置：全局配置加上目标的覆盖项，未覆盖的目录和对象键前缀按目标名分开"""
+    overrides = target.backup
+    unknown = set(overrides) - set(BackupConfig.model_fields)
+    if unknown:
+        raise ValueError(f"目标 {target.name} 包含未知的备份配置项: {', '.join(sorted(unknown))}")
+    global_only = set(overrides) & GLOBAL_ONLY_FIELDS
+    if global_only:
+        raise ValueError(f"目标 {target.name} 不能覆盖全局配置项: {', '.join(sorted(global_only))}")
+    config = BackupConfig(**{**base.model_dump(), **overrides})
+    if "storage_path" not in overrides:
+        config.storage_path = os.path.join(base.storage_path, target.name)
+    if "cold_storage_path" not in overrides and base.cold_storage_path:
+        config.cold_storage_path = os.path.join(base.cold_storage_path, target.name)
+    if "s3_prefix" not in overrides:
+        config.s3_prefix = "/".join(part for part in (base.s3_prefix.strip("/"), target.name) if part)
+    return config
+
+
+def iter_targets(config: Config) -> List[Tuple[str, DatabaseConfig, BackupConfig]]:
+    """所有备份目标的名称、数据库配置和备份配置，默认目标在前"""
+    targets = [(DEFAULT_TARGET, config.database, config.backup)]
+    for target in config.targets:
+        targets.append((target.name, target.database, target_backup_config(config.backup, target)))
+    return targets
+
+
+def validate_targets(config: Config):
+    """检查目标名称和覆盖项，配置无效时抛出ValueError"""
+    names = set()
+    for target in config.targets:
+        if not TARGET_NAME_PATTERN.match(target.name) or target.name == DEFAULT_TARGET:
+            raise ValueError(f"无效的目标名称: {target.name}（字母开头，只能包含字母、数字、_和-，不能为 {DEFAULT_TARGET}）")
+        if target.name in names:
+            raise ValueError(f"目标名称重复: {target.name}")
+        names.add(target.name)
+        target_backup_config(config.backup, target)
+
+
+class BackupTarget:
+    """一个命名目标的备份、恢复管理器和调度器"""
+    def __init__(self, name: str, db_config: DatabaseConfig, backup_config: BackupConfig):
+        self.name = name
+        self.db_config = db_config
+        self.backup_config = backup_config
+        self.backup_manager = BackupManager(db_config, backup_config)
+        self.restore_manager = RestoreManager(db_config, backup_config)
+        self.scheduler = BackupScheduler(db_config, backup_config, name)
+
+    async def reconfigure(self, db_config: DatabaseConfig, backup_config: BackupConfig):
+        self.db_config = db_config
+        self.backup_config = backup_config
+        self.backup_manager = BackupManager(db_config, backup_config)
+        self.restore_manager = RestoreManager(db_config, backup_config)
+        await self.scheduler.reconfigure(db_config, backup_config)
@@ -0,0 +1,268 @@
+"""备份I/O限速：令牌桶限制从数据库读取和写入存储的带宽，并可根据数据库负载自动降速
+
+限速器为进程级单例，所有备份线程（包括并行COPY的各工作线程）共享同一组令牌桶，
+限制的是总带宽；通过 PUT /api/throttle 修改后立即对正在运行的备份生效。
+负载检测查询所有正在备份的数据库，按负载最高的数据库降速。
+"""
+import shutil
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from .metrics import THROTTLE_WAIT
+from .models import BackupConfig
+
+
+BACKUP_APPLICATION_NAME = "pgbackup"  # 本工具的数据库连接和pg_dump使用的application_name，负载统计时排除
+IONICE_CLASSES = {"": None, "idle": "3", "best-effort": "2"}
+MAX_SLEEP = 0.5  # 单次等待上限，保证修改限速后尽快按新速率放行
+MB = 1024 * 1024
+
+LOAD_QUERY = """
+    SELECT
+        (SELECT count(*) FROM pg_stat_activity
+         WHERE state = 'active' AND backend_type = 'client backend'
+           AND pid <> pg_backend_pid() AND application_name <> %s),
+        CASE WHEN pg_is_in_recovery() THEN
+            CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                 ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0) END
+        ELSE
+            (SELECT COALESCE(MAX(EXTRACT(EPOCH FROM replay_lag)), 0) FROM pg_stat_replication)
+        END,
+        (SELECT xact_commit + xact_rollback FROM pg_stat_database WHERE datname = current_database())
+"""
+
+
+def query_database_load(connect: Callable) -> dict:
+    """查询数据库负载：活跃会话数（不含本工具的连接）、复制延迟（秒）和累计事务数"""
+    conn = connect()
+    try:
+        conn.autocommit = True
+        cursor = conn.cursor()
+        cursor.execute(LOAD_QUERY, (BACKUP_APPLICATION_NAME,))
+        active, lag, transactions = cursor.fetchone()
+    finally:
+        conn.close()
+    return {
+        "active_sessions": int(active),
+        "replication_lag": float(lag or 0),
+        "transactions": int(transactions or 0),
+        "sampled_at": time.monotonic(),
+    }
+
+
+def priority_prefix(nice: int = 0, ionice_class: str = "") -> List[str]:
+    """以较低CPU/I/O优先级运行子进程的命令前缀（工具不存在或未配置时省略）"""
+    prefix = []
+    if IONICE_CLASSES.get(ionice_class) and shutil.which("ionice"):
+        prefix += ["ionice", "-c", IONICE_CLASSES[ionice_class]]
+    if nice and shutil.which("nice"):
+        prefix += ["nice", "-n", str(nice)]
+    return prefix
+
+
+class TokenBucket:
+    """线程安全的令牌桶，rate为每秒字节数，0表示不限速
+
+    桶容量为一秒的令牌；单次消费可以超过容量（记为欠账），由后续等待补足，
+    因此按任意大小的块读写都能得到平均意义上准确的速率。
+    """
+    def __init__(self, rate: float = 0):
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.tokens = rate
+        self.updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        if self.rate > 0:
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        with self.lock:
+            self.refill()
+            self.rate = rate
+            self.tokens = min(self.tokens, rate)
+
+    def consume(self, count: int) -> float:
+        """取走count个令牌，不足时阻塞等待，返回等待的秒数"""
+        with self.lock:
+            self.refill()
+            if self.rate <= 0:
+                return 0.0
+            self.tokens -= count
+        waited = 0.0
+        while True:
+            with self.lock:
+                self.refill()
+                # 等待期间可能被改为不限速
+                if self.rate <= 0:
+                    self.tokens = 0
+                    return waited
+                if self.tokens >= 0:
+                    return waited
+                delay = min(-self.tokens / self.rate, MAX_SLEEP)
+            time.sleep(delay)
+            waited += delay
+
+
+class IOThrottle:
+    """备份读写限速器：基础限速乘以负载系数得到实际速率"""
+    def __init__(self):
+        self.read = TokenBucket()
+        self.write = TokenBucket()
+        self.read_limit = 0.0
+        self.write_limit = 0.0
+        self.nice = 0
+        self.ionice_class = ""
+        self.load_aware = False
+        self.max_active_sessions = 20
+        self.max_replication_lag = 30.0
+        self.min_factor = 0.1
+        self.check_interval = 10.0
+        self.load_factor = 1.0
+        self.active_sessions: Optional[int] = None
+        self.replication_lag: Optional[float] = None
+        self.last_check: Optional[datetime] = None
+        self.last_error: Optional[str] = None
+        self.next_check = 0.0
+        self.check_lock = threading.Lock()
+        self.session_lock = threading.Lock()
+        self.connects: Dict[str, Callable] = {}  # 正在备份的数据库 -> 负载检测使用的连接函数
+        self.session_counts: Dict[str, int] = {}
+        self.running = 0
+
+    def configure(self, config: BackupConfig):
+        """从备份配置加载限速设置"""
+        self.read_limit = config.throttle_read_mb_s * MB
+        self.write_limit = config.throttle_write_mb_s * MB
+        self.nice = config.dump_nice
+        self.ionice_class = config.dump_ionice_class
+        self.load_aware = config.load_aware_throttle
+        self.max_active_sessions = config.load_max_active_sessions
+        self.max_replication_lag = config.load_max_replication_lag_s
+        self.min_factor = config.load_min_factor
+        self.check_interval = config.load_check_interval_s
+        if not self.load_aware:
+            self.load_factor = 1.0
+        self.next_check = 0.0
+        self.apply()
+
+    def apply(self):
+        self.read.set_rate(self.read_limit * self.load_factor)
+        self.write.set_rate(self.write_limit * self.load_factor)
+
+    def command_prefix(self) -> List[str]:
+        return priority_prefix(self.nice, self.ionice_class)
+
+    @property
+    def enabled(self) -> bool:
+        return self.read_limit > 0 or self.write_limit > 0
+
+    @contextmanager
+    def session(self, connect: Callable, database: str = ""):
+        """标记一次正在运行的备份，备份期间负载检测通过connect查询该数据库"""
+        with self.session_lock:
+            self.running += 1
+            self.connects[database] = connect
+            self.session_counts[database] = self.session_counts.get(database, 0) + 1
+        try:
+            yield self
+        finally:
+            with self.session_lock:
+                self.running -= 1
+                self.session_counts[database] -= 1
+                if not self.session_counts[database]:
+                    del self.session_counts[database]
+                    del self.connects[database]
+
+    def consume_read(self, count: int):
+        self.check_load()
+        THROTTLE_WAIT.labels("read").inc(self.read.consume(count))
+
+    def consume_write(self, count: int):
+        self.check_load()
+        THROTTLE_WAIT.labels("write").inc(self.write.consume(count))
+
+    def check_load(self):
+        """到达检测间隔时查询数据库负载并调整负载系数（同一时刻只有一个线程查询）"""
+        if not self.load_aware or not self.connects or time.monotonic() < self.next_check:
+            return
+        if not self.check_lock.acquire(blocking=False):
+            return
+        try:
+            self.next_check = time.monotonic() + self.check_interval
+            with self.session_lock:
+                connects = dict(self.connects)
+            loads = []
+            errors = []
+            for database, connect in connects.items():
+                try:
+                    loads.append(query_database_load(connect))
+                except Exception as e:
+                    errors.append(f"{database}: {e}" if database else str(e))
+            self.last_error = "; ".join(errors) or None
+            if errors:
+                print(f"数据库负载检测失败: {self.last_error}")
+            if not loads:
+                # 负载检测全部失败时保持当前速率，不影响备份
+                return
+            # 共享的令牌桶按负载最高的数据库降速
+            self.active_sessions = max(load["active_sessions"] for load in loads)
+            self.replication_lag = max(load["replication_lag"] for load in loads)
+            self.last_check = datetime.now()
+            self.update_factor()
+        finally:
+            self.check_lock.release()
+
+    def update_factor(self):
+        """活跃会话或复制延迟超过阈值时按超出比例降速，最低降到min_factor"""
+        factor = 1.0
+        if self.max_active_sessions > 0 and self.active_sessions and self.active_sessions > self.max_active_sessions:
+            factor = min(factor, self.max_active_sessions / self.active_sessions)
+        if self.max_replication_lag > 0 and self.replication_lag and self.replication_lag > self.max_replication_lag:
+            factor = min(factor, self.max_replication_lag / self.replication_lag)
+        factor = max(factor, self.min_factor)
+        if factor != self.load_factor:
+            print(f"数据库负载变化（活跃会话 {self.active_sessions}，复制延迟 {self.replication_lag:.1f}s），"
+                  f"备份限速系数调整为 {factor:.2f}")
+            self.load_factor = factor
+            self.apply()
+
+    def status(self) -> dict:
+        return {
+            "read_limit_mb_s": self.read_limit / MB,
+            "write_limit_mb_s": self.write_limit / MB,
+            "effective_read_mb_s": self.read.rate / MB,
+            "effective_write_mb_s": self.write.rate / MB,
+            "nice": self.nice,
+            "ionice_class": self.ionice_class,
+            "load_aware": self.load_aware,
+            "load_factor": self.load_factor,
+            "active_sessions": self.active_sessions,
+            "replication_lag_s": self.replication_lag,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "running_backups": self.running,
+        }
+
+
+class ThrottledWriter:
+    """写入前先取令牌的文件包装器（consume为consume_read或consume_write），只应在工作线程中使用"""
+    def __init__(self, fileobj, consume: Callable[[int], None]):
+        self.fileobj = fileobj
+        self.consume = consume
+
+    def write(self, data) -> int:
+        self.consume(len(data))
+        return self.fileobj.write(data)
+
+    def flush(self):
+        if hasattr(self.fileobj, "flush"):
+            self.fileobj.flush()
+
+
+io_throttle = IOThrottle()
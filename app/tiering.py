@@ -0,0 +1,204 @@
+"""分层存储：把超过一定天数的备份移动到冷存储并改用高压缩比格式
+
+重新压缩在低优先级（nice 19 / ionice idle）的子进程中进行，不与API和恢复争用CPU与磁盘：
+
+    python -m app.tiering recompress SOURCE TARGET --from gzip --to xz --level 6
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from .backup import PARALLEL_MANIFEST
+from .compression import (
+    CODECS, backup_codec, change_codec_extension, manifest_codec, recompress_file
+)
+from .encryption import ENCRYPTION_KEY_ENV, load_encryption_key
+from .jobs import KeyedLocks, catalog_key, catalog_locks, run_in_background
+from .models import BackupInfo, BackupStatus
+from .throttle import priority_prefix
+
+
+TIERING_INTERVAL_HOURS = 6
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 按备份目录区分：不同目标的分层任务互不阻塞，各自记录上次运行结果
+_tier_locks = KeyedLocks()
+last_runs: Dict[str, Tuple[datetime, dict]] = {}
+
+
+def find_cold_candidates(manager) -> List[BackupInfo]:
+    """需要移动到冷存储的本地已完成备份（只读取截止日期之前的分区）"""
+    config = manager.backup_config
+    if not config.cold_storage_path:
+        return []
+    cutoff = datetime.now() - timedelta(days=config.cold_after_days)
+    return [
+        backup for backup in manager.get_backup_list(until=cutoff.date())
+        if backup.status == BackupStatus.COMPLETED and backup.tier == "hot" and backup.storage == "local"
+        and backup.created_at < cutoff
+    ]
+
+
+def low_priority_prefix() -> List[str]:
+    """以最低CPU和I/O优先级运行子进程的命令前缀（工具不存在时省略）"""
+    return priority_prefix(nice=19, ionice_class="idle")
+
+
+def remove_path(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+
+
+def move_to_cold(manager, backup_info: BackupInfo) -> BackupInfo:
+    """重新压缩到冷存储，原子更新备份信息后删除热存储中的文件"""
+    config = manager.backup_config
+    source = manager.get_backup_path(backup_info)
+    source_codec = backup_codec(backup_info)
+    target_codec = config.cold_codec
+    is_directory = os.path.isdir(source)
+    filename = backup_info.filename if is_directory else change_codec_extension(
+        backup_info.filename, source_codec, target_codec
+    )
+    cold_info = backup_info.model_copy(update={
+        "tier": "cold",
+        "codec": target_codec,
+        "compressed": target_codec != "none",
+        "filename": filename,
+    })
+    target = manager.get_backup_path(cold_info)
+    if os.path.abspath(target) == os.path.abspath(source):
+        raise ValueError(f"冷存储路径与热存储路径相同: {target}")
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    temp_target = target + ".tmp"
+    remove_path(temp_target)
+    # 子进程在项目根目录运行（以便导入app），路径一律传绝对路径，不受服务启动目录影响
+    cmd = low_priority_prefix() + [
+        sys.executable, "-m", "app.tiering", "recompress", os.path.abspath(source), os.path.abspath(temp_target),
+        "--from", source_codec, "--to", target_codec, "--level", str(config.cold_compression_level)
+    ]
+    if backup_info.encrypted:
+        # 提前确认密钥可用且与备份一致；子进程继承环境变量中的密钥，或从同一密钥文件读取
+        manager.get_encryption_key(backup_info)
+        key_file = os.path.abspath(config.encryption_key_file) if config.encryption_key_file else ""
+        cmd += ["--encrypted", "--key-file", key_file]
+    try:
+        result = subprocess.run(cmd, cwd=PROJECT_ROOT, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise Exception(f"重新压缩失败: {result.stderr.strip()}")
+        # 上次运行可能在更新备份信息前中断，留下了目标文件
+        remove_path(target)
+        os.replace(temp_target, target)
+    except Exception:
+        remove_path(temp_target)
+        raise
+
+    cold_info.size = manager.get_path_size(target)
+    # 重新压缩耗时较长，期间备份可能已被保留策略或批量删除移除，此时不能写回备份信息
+    with catalog_locks.get(catalog_key(manager)):
+        exists = manager.load_backup_info(backup_info.id) is not None
+        if exists:
+            manager.save_backup_info(cold_info)
+    if not exists:
+        remove_path(target)
+        raise Exception("备份在移动到冷存储期间已被删除")
+    # 备份信息已指向冷存储，正在读取旧文件的恢复不受影响（已打开的文件在删除后仍可读取）
+    remove_path(source)
+    return cold_info
+
+
+def last_tiering_run(manager) -> Tuple[Optional[datetime], Optional[dict]]:
+    """目标上次分层任务的时间和结果"""
+    return last_runs.get(catalog_key(manager), (None, None))
+
+
+def run_tiering(manager) -> Optional[dict]:
+    """把所有到期的备份移动到冷存储，同一备份目录已有分层任务在运行时跳过"""
+    key = catalog_key(manager)
+    tier_lock = _tier_locks.get(key)
+    if not tier_lock.acquire(blocking=False):
+        print(f"{manager.backup_config.storage_path} 已有分层存储任务在运行，跳过本次执行")
+        return None
+    try:
+        moved = []
+        failed = []
+        saved_bytes = 0
+        for backup_info in find_cold_candidates(manager):
+            try:
+                cold_info = move_to_cold(manager, backup_info)
+                moved.append(backup_info.id)
+                saved_bytes += backup_info.size - cold_info.size
+                print(f"   🧊 备份 {backup_info.id} 已移动到冷存储: "
+                      f"{backup_info.size} -> {cold_info.size} 字节")
+            except Exception as e:
+                failed.append({"backup_id": backup_info.id, "error": str(e)})
+                print(f"备份 {backup_info.id} 移动到冷存储失败: {e}")
+        result = {"moved": moved, "failed": failed, "saved_bytes": saved_bytes}
+        last_runs[key] = (datetime.now(), result)
+        if moved or failed:
+            print(f"分层存储完成: 移动 {len(moved)} 个，失败 {len(failed)} 个，节省 {saved_bytes} 字节")
+        return result
+    finally:
+        tier_lock.release()
+
+
+def schedule_tiering(manager):
+    """在后台执行分层存储任务"""
+    return run_in_background(run_tiering, manager, description="分层存储任务")
+
+
+def recompress_path(source: str, target: str, source_codec: str, target_codec: str, level: int,
+                    key: Optional[bytes] = None):
+    """重新压缩单个备份文件或并行COPY备份目录（目录中只有数据文件需要重新压缩）"""
+    if not os.path.isdir(source):
+        recompress_file(source, target, source_codec, target_codec, level, key)
+        return
+
+    with open(os.path.join(source, PARALLEL_MANIFEST), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    data_codec = manifest_codec(manifest)
+    os.makedirs(target)
+    for name in (manifest["schema_pre"], manifest["schema_post"], manifest["sequences"]):
+        shutil.copyfile(os.path.join(source, name), os.path.join(target, name))
+    for entry in manifest["tables"]:
+        new_file = change_codec_extension(entry["file"], data_codec, target_codec)
+        os.makedirs(os.path.dirname(os.path.join(target, new_file)), exist_ok=True)
+        recompress_file(os.path.join(source, entry["file"]), os.path.join(target, new_file),
+                        data_codec, target_codec, level, key if manifest.get("encrypted") else None)
+        entry["file"] = new_file
+    manifest["codec"] = target_codec
+    manifest["compressed"] = target_codec != "none"
+    with open(os.path.join(target, PARALLEL_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="分层存储工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    recompress = subparsers.add_parser("recompress", help="重新压缩备份文件或目录")
+    recompress.add_argument("source")
+    recompress.add_argument("target")
+    recompress.add_argument("--from", dest="source_codec", choices=CODECS, required=True)
+    recompress.add_argument("--to", dest="target_codec", choices=CODECS, required=True)
+    recompress.add_argument("--level", type=int, default=6)
+    recompress.add_argument("--encrypted", action="store_true", help="源文件已加密，解密后重新压缩并加密")
+    recompress.add_argument("--key-file", default="", help=f"密钥文件（环境变量 {ENCRYPTION_KEY_ENV} 优先）")
+    args = parser.parse_args()
+
+    try:
+        key = load_encryption_key(args.key_file) if args.encrypted else None
+        recompress_path(args.source, args.target, args.source_codec, args.target_codec, args.level, key)
+    except Exception as e:
+        print(f"重新压缩失败: {e}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""导入外部备份：把上传的纯文本pg_dump（可gzip/xz/bz2压缩）流式写入存储并登记为可恢复的备份
+
+请求体边接收边写入存储后端，同时计算sha256、检测压缩格式，并增量解压以统计COPY表清单和校验
+压缩流完整，不在内存或临时文件中缓存整个上传。支持两种请求方式：
+
+    curl -T dump.sql.gz "http://localhost:8000/api/backups/upload?filename=dump.sql.gz"
+    curl -F "file=@dump.sql.gz" -F "description=生产库" http://localhost:8000/api/backups/upload
+"""
+import asyncio
+import bz2
+import hashlib
+import lzma
+import re
+import zlib
+from datetime import datetime
+from typing import AsyncIterator, List, Optional
+
+from multipart.multipart import MultipartParser, parse_options_header
+
+from .backup import BACKUP_ID_FORMAT
+from .compression import CODEC_EXTENSIONS
+from .encryption import EncryptingWriter, key_id
+from .metrics import record_transfer
+from .models import BackupInfo, BackupStatus
+
+
+UPLOAD_WRITE_SIZE = 1024 * 1024  # 攒够该大小后交给工作线程写入，减少线程切换
+SNIFF_SIZE = 512
+MAX_CARRY = 1024  # 跨块的未完整行只保留开头部分，足以匹配COPY头中的表名（数据行可能很长）
+COPY_LINE = re.compile(rb'^COPY ([^\s(]+) ', re.MULTILINE)
+MAGIC_NUMBERS = (
+    (b'\x1f\x8b', "gzip"),
+    (b'\xfd7zXZ\x00', "xz"),
+    (b'BZh', "bz2"),
+)
+
+
+def detect_codec(head: bytes) -> str:
+    """根据文件头的魔数识别压缩格式"""
+    for magic, codec in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return codec
+    return "none"
+
+
+def new_decompressor(codec: str):
+    if codec == "gzip":
+        return zlib.decompressobj(16 + zlib.MAX_WBITS)
+    if codec == "xz":
+        return lzma.LZMADecompressor()
+    if codec == "bz2":
+        return bz2.BZ2Decompressor()
+    return None
+
+
+class StreamInspector:
+    """增量解压上传的数据：统计未压缩字节数和COPY表清单，并校验压缩流完整
+
+    pigz等工具会输出多个连续的压缩成员，一个成员结束后用剩余数据开始新的解压器。
+    """
+    def __init__(self, codec: str):
+        self.codec = codec
+        self.decompressor = new_decompressor(codec)
+        self.raw_bytes = 0
+        self.tables: List[str] = []
+        self.carry = b''
+        self.head = b''
+
+    def feed(self, data: bytes):
+        if self.decompressor is None:
+            self.inspect(data)
+            return
+        while data:
+            self.inspect(self.decompressor.decompress(data))
+            if not self.decompressor.eof:
+                return
+            data = self.decompressor.unused_data
+            if data:
+                self.decompressor = new_decompressor(self.codec)
+
+    def inspect(self, data: bytes):
+        if not data:
+            return
+        if len(self.head) < SNIFF_SIZE:
+            self.head += data[:SNIFF_SIZE - len(self.head)]
+            if self.head.startswith(b'PGDMP'):
+                raise ValueError("不支持pg_dump自定义格式（-Fc），请使用纯文本格式（-Fp）导出")
+        self.raw_bytes += len(data)
+        text = self.carry + data
+        last_newline = text.rfind(b'\n')
+        # 只在完整的行中匹配COPY头，跨块的行等换行到达后再匹配
+        if last_newline >= 0:
+            self.tables.extend(match.group(1).decode('utf-8', errors='replace')
+                               for match in COPY_LINE.finditer(text, 0, last_newline + 1))
+        self.carry = text[last_newline + 1:last_newline + 1 + MAX_CARRY]
+
+    def finish(self):
+        if self.decompressor is not None and not self.decompressor.eof:
+            raise ValueError(f"{self.codec}压缩数据不完整，上传可能被截断")
+        if self.raw_bytes == 0:
+            raise ValueError("上传的备份为空")
+
+
+class BackupImporter:
+    """把上传的字节流写入存储后端并登记备份信息"""
+    def __init__(self, manager, description: Optional[str] = None, original_name: Optional[str] = None):
+        self.manager = manager
+        self.description = description
+        self.original_name = original_name
+        self.buffer = bytearray()
+        self.backup_info: Optional[BackupInfo] = None
+        self.writer = None
+        self.sink = None
+        self.inspector: Optional[StreamInspector] = None
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.started = datetime.now()
+
+    def open(self, head: bytes):
+        """根据第一块数据识别压缩格式，登记运行中的备份并打开存储写入流"""
+        codec = detect_codec(head)
+        encryption_key = self.manager.get_encryption_key()
+        # 在备份目录锁内预留ID（同一秒内的备份或导入顺延一秒），写入信息文件后即可释放
+        timestamp = self.manager.reserve_backup_timestamp(self.started)
+        backup_id = timestamp.strftime(BACKUP_ID_FORMAT)
+        description = self.description or (f"导入: {self.original_name}" if self.original_name else "导入的备份")
+        try:
+            self.backup_info = BackupInfo(
+                id=backup_id,
+                filename=f"backup_{backup_id}.sql{CODEC_EXTENSIONS[codec]}",
+                created_at=timestamp,
+                size=0,
+                status=BackupStatus.RUNNING,
+                compressed=codec != "none",
+                codec=codec,
+                description=description,
+                storage=self.manager.backup_config.storage_backend,
+                encrypted=encryption_key is not None,
+                key_id=key_id(encryption_key) if encryption_key is not None else None
+            )
+            self.manager.save_backup_info(self.backup_info)
+        finally:
+            self.manager.release_backup_id(backup_id)
+        self.inspector = StreamInspector(codec)
+        storage, key = self.manager.get_payload_storage(self.backup_info)
+        self.writer = storage.open_writer(key)
+        # 启用加密时上传的数据加密后写入存储，checksum仍为上传内容（明文）的sha256
+        self.sink = EncryptingWriter(self.writer, encryption_key) if encryption_key is not None else self.writer
+
+    def write(self, data: bytes):
+        if self.writer is None:
+            self.open(data)
+        self.inspector.feed(data)
+        self.digest.update(data)
+        self.sink.write(data)
+        self.size += len(data)
+
+    async def feed(self, chunk: bytes):
+        self.buffer += chunk
+        if len(self.buffer) >= UPLOAD_WRITE_SIZE:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            await asyncio.to_thread(self.write, data)
+
+    async def flush(self):
+        if self.buffer:
+            data = bytes(self.buffer)
+            self.buffer.clear()
+            await asyncio.to_thread(self.write, data)
+
+    def finish(self) -> BackupInfo:
+        """提交写入流并把备份标记为已完成"""
+        if self.writer is None:
+            raise ValueError("上传的备份为空")
+        self.inspector.finish()
+        if self.sink is not self.writer:
+            self.sink.close()
+            self.size = self.sink.bytes_written
+        self.writer.commit()
+        self.backup_info.size = self.size
+        self.backup_info.checksum = f"sha256:{self.digest.hexdigest()}"
+        self.backup_info.tables = self.inspector.tables
+        self.backup_info.status = BackupStatus.COMPLETED
+        duration = (datetime.now() - self.started).total_seconds()
+        self.backup_info.timings = {"upload": round(duration, 6), "total": round(duration, 6)}
+        self.manager.save_backup_info(self.backup_info)
+        record_transfer("import", self.backup_info.codec, self.inspector.raw_bytes, self.size, duration)
+        return self.backup_info
+
+    def abort(self, error: BaseException):
+        """放弃写入流，备份登记为失败，便于在列表中看到失败的导入"""
+        try:
+            if self.writer is not None:
+                self.writer.abort()
+        finally:
+            if self.backup_info is not None:
+                self.backup_info.status = BackupStatus.FAILED
+                self.backup_info.error_message = str(error) or type(error).__name__
+                self.manager.save_backup_info(self.backup_info)
+
+    async def receive(self, stream: AsyncIterator[bytes]):
+        """接收原始请求体（application/octet-stream）"""
+        async for chunk in stream:
+            await self.feed(chunk)
+        await self.flush()
+
+    async def receive_multipart(self, stream: AsyncIterator[bytes], content_type: str):
+        """流式解析multipart/form-data：file字段写入存储，description字段作为备注（需在file字段之前）"""
+        _, params = parse_options_header(content_type)
+        boundary = params.get(b'boundary')
+        if not boundary:
+            raise ValueError("multipart请求缺少boundary")
+
+        events = []
+        header_field = bytearray()
+        header_value = bytearray()
+        headers = {}
+
+        def on_header_end():
+            headers[bytes(header_field).lower()] = bytes(header_value)
+            header_field.clear()
+            header_value.clear()
+
+        parser = MultipartParser(boundary, {
+            "on_part_begin": lambda: headers.clear(),
+            "on_header_field": lambda data, start, end: header_field.extend(data[start:end]),
+            "on_header_value": lambda data, start, end: header_value.extend(data[start:end]),
+            "on_header_end": on_header_end,
+            "on_headers_finished": lambda: events.append(("begin", dict(headers))),
+            "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+            "on_part_end": lambda: events.append(("end", None)),
+        })
+
+        field = None
+        value = bytearray()
+        received_file = False
+        async for chunk in stream:
+            parser.write(chunk)
+            for kind, payload in events:
+                if kind == "begin":
+                    _, options = parse_options_header(payload.get(b'content-disposition', b''))
+                    field = options.get(b'name', b'').decode('utf-8')
+                    value.clear()
+                    if field == "file":
+                        received_file = True
+                        if b'filename' in options and not self.original_name:
+                            self.original_name = options[b'filename'].decode('utf-8', errors='replace')
+                elif kind == "data":
+                    if field == "file":
+                        await self.feed(payload)
+                    elif len(value) < 4096:
+                        value.extend(payload)
+                elif field == "description" and not self.description:
+                    self.description = value.decode('utf-8', errors='replace').strip() or None
+            events.clear()
+        parser.finalize()
+        if not received_file:
+            raise ValueError("multipart请求中缺少file字段")
+        await self.flush()
@@ -0,0 +1,186 @@
+"""HTTP API负载基准：进程内驱动FastAPI应用（ASGI transport），不需要数据库
+
+备份目录由大量合成元数据文件组成，使用真实的 BackupManager 读取，
+RestoreManager/ConfigManager 使用替身，便于在上线前发现备份目录规模带来的问题：
+
+    python -m benchmarks.bench_api --catalog-sizes 100,1000,10000 --concurrency 16 --requests 500
+
+依赖 httpx（pip install httpx）。
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+
+from app import main
+from app.backup import BackupManager
+from app.config_manager import ConfigManager
+from app.models import BackupConfig, BackupInfo, BackupStatus, DatabaseConfig
+from app.restore import RestoreManager
+from app.scheduler import BackupScheduler
+
+
+ENDPOINTS = ("/api/backups", "/api/backups/{id}", "/api/database/info", "/api/health", "/api/schedule/status")
+
+
+class StubConfigManager(ConfigManager):
+    """不读写config.json、始终认为数据库可用的配置管理器"""
+    def __init__(self, db_config: DatabaseConfig, backup_config: BackupConfig):
+        self.config_file = os.devnull
+        self.config = self.create_default_config()
+        self.config.database = db_config
+        self.config.backup = backup_config
+
+    def is_database_available(self) -> bool:
+        return True
+
+
+class StubRestoreManager(RestoreManager):
+    """返回合成数据库信息的恢复管理器"""
+    def __init__(self, db_config: DatabaseConfig, backup_config: BackupConfig, table_count: int):
+        super().__init__(db_config, backup_config)
+        self.database_info = {
+            "database_size": "42 GB",
+            "table_count": table_count,
+            "tables": {
+                f"table_{t}": [
+                    {"column_name": f"c{c}", "data_type": "text", "is_nullable": "YES", "column_default": None}
+                    for c in range(12)
+                ]
+                for t in range(table_count)
+            },
+        }
+
+    async def get_database_info(self) -> dict:
+        return self.database_info
+
+    async def test_connection(self) -> bool:
+        return True
+
+
+def build_catalog(manager: BackupManager, size: int) -> List[str]:
+    """写入合成备份元数据，返回备份ID列表"""
+    start = datetime(2024, 1, 1)
+    ids = []
+    for i in range(size):
+        created_at = start + timedelta(hours=i)
+        backup_id = created_at.strftime('%Y%m%d_%H%M%S')
+        manager.save_backup_info(BackupInfo(
+            id=backup_id,
+            filename=f"backup_{backup_id}.sql.gz",
+            created_at=created_at,
+            size=random.randint(10 ** 6, 10 ** 10),
+            status=BackupStatus.COMPLETED if i % 50 else BackupStatus.FAILED,
+            compressed=True,
+            description="自动备份",
+            timings={"connect": 0.01, "dump": 12.5, "compress": 3.2, "write": 0.4, "total": 16.1},
+        ))
+        ids.append(backup_id)
+    return ids
+
+
+async def drive(client: httpx.AsyncClient, path_template: str, ids: List[str],
+                concurrency: int, total_requests: int) -> dict:
+    """以固定并发数发送请求，统计延迟分位数和吞吐量"""
+    latencies = []
+    errors = 0
+    remaining = total_requests
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            path = path_template.replace("{id}", random.choice(ids)) if "{id}" in path_template else path_template
+            start = time.perf_counter()
+            response = await client.get(path)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "endpoint": path_template,
+        "requests": len(latencies),
+        "errors": errors,
+        "requests_per_second": len(latencies) / elapsed if elapsed else None,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000,
+        "max_ms": latencies[-1] * 1000,
+    }
+
+
+async def run_catalog(args, catalog_size: int) -> List[dict]:
+    storage = tempfile.mkdtemp(prefix="pgbackup-api-bench-")
+    try:
+        db_config = DatabaseConfig(host="localhost", database="bench", username="bench", password="")
+        backup_config = BackupConfig(storage_path=storage, max_backups=catalog_size + 1)
+        main.config_manager = StubConfigManager(db_config, backup_config)
+        main.backup_manager = BackupManager(db_config, backup_config)
+        main.restore_manager = StubRestoreManager(db_config, backup_config, args.tables)
+        main.scheduler = BackupScheduler(db_config, backup_config)
+        await main.scheduler.start()
+        ids = build_catalog(main.backup_manager, catalog_size)
+
+        results = []
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            for endpoint in args.endpoints.split(","):
+                # 预热一次，避免首次导入/编译影响结果
+                await drive(client, endpoint, ids, 1, 1)
+                result = await drive(client, endpoint, ids, args.concurrency, args.requests)
+                result["catalog_size"] = catalog_size
+                results.append(result)
+                print(f"catalog={catalog_size:<7} {endpoint:<24} {result['requests_per_second']:>9.1f} req/s "
+                      f"p50 {result['p50_ms']:>8.2f} ms  p99 {result['p99_ms']:>8.2f} ms  errors {result['errors']}")
+        await main.scheduler.stop()
+        return results
+    finally:
+        shutil.rmtree(storage, ignore_errors=True)
+
+
+async def run(args) -> List[dict]:
+    results = []
+    for size in [int(s) for s in args.catalog_sizes.split(",")]:
+        results.extend(await run_catalog(args, size))
+    return results
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description="进程内HTTP API负载基准")
+    parser.add_argument("--catalog-sizes", default="100,1000,5000", help="合成备份目录规模，逗号分隔")
+    parser.add_argument("--tables", type=int, default=200, help="/api/database/info返回的表数量")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=300, help="每个接口的请求数")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS))
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    random.seed(42)
+    results = asyncio.run(run(args))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({
+                "python": sys.version,
+                "platform": platform.platform(),
+                "parameters": vars(args),
+                "results": results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main_cli()
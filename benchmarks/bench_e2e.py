@@ -0,0 +1,252 @@
+"""端到端基准：在临时本地PostgreSQL集群上测量完整备份/恢复吞吐量
+
+在一台Linux机器上离线运行：用 initdb 在临时目录创建集群，pgbench 生成数据，
+然后直接调用 BackupManager.create_backup 和 RestoreManager.restore_backup：
+
+    python -m benchmarks.bench_e2e --scale 10 --engines pg_dump,parallel_copy --jobs 1,4 \\
+        --restore-types normal,full,incremental --report e2e_report
+
+需要 PATH（或 --pg-bin 指定目录）中存在 initdb、pg_ctl、pgbench、pg_dump、psql。
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from app.backup import BackupManager
+from app.models import BackupConfig, DatabaseConfig
+from app.restore import RestoreManager
+
+
+REQUIRED_BINARIES = ("initdb", "pg_ctl", "pgbench", "pg_dump", "psql")
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK")
+
+
+class LocalCluster:
+    """临时PostgreSQL集群（trust认证，仅监听127.0.0.1）"""
+    def __init__(self, base_dir: str, pg_bin: Optional[str]):
+        self.base_dir = base_dir
+        self.pg_bin = pg_bin
+        self.data_dir = os.path.join(base_dir, "data")
+        self.socket_dir = os.path.join(base_dir, "socket")
+        self.log_file = os.path.join(base_dir, "postgres.log")
+        self.port = self.find_free_port()
+        self.user = "bench"
+        self.database = "bench"
+
+    @staticmethod
+    def find_free_port() -> int:
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            return sock.getsockname()[1]
+
+    def binary(self, name: str) -> str:
+        return os.path.join(self.pg_bin, name) if self.pg_bin else name
+
+    def run(self, *args: str):
+        subprocess.run(args, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+
+    def start(self):
+        os.makedirs(self.socket_dir, exist_ok=True)
+        self.run(self.binary("initdb"), "-D", self.data_dir, "-U", self.user, "--auth=trust",
+                 "-E", "UTF8", "--no-sync")
+        options = (f"-p {self.port} -k {self.socket_dir} -c listen_addresses=127.0.0.1 "
+                   f"-c fsync=off -c synchronous_commit=off -c full_page_writes=off")
+        self.run(self.binary("pg_ctl"), "-D", self.data_dir, "-o", options, "-l", self.log_file, "-w", "start")
+        self.psql("postgres", f"CREATE DATABASE {self.database}")
+
+    def stop(self):
+        if os.path.exists(os.path.join(self.data_dir, "postmaster.pid")):
+            self.run(self.binary("pg_ctl"), "-D", self.data_dir, "-m", "fast", "-w", "stop")
+
+    def psql(self, database: str, command: str):
+        self.run(self.binary("psql"), "-h", "127.0.0.1", "-p", str(self.port), "-U", self.user,
+                 "-d", database, "-v", "ON_ERROR_STOP=1", "-q", "-c", command)
+
+    def load_pgbench(self, scale: int):
+        self.run(self.binary("pgbench"), "-i", "-s", str(scale), "-q", "-h", "127.0.0.1",
+                 "-p", str(self.port), "-U", self.user, self.database)
+        self.psql(self.database, "ANALYZE")
+
+    def server_cpu_seconds(self) -> float:
+        """postmaster及其子进程（含已退出后端，计入cutime/cstime）的CPU时间"""
+        with open(os.path.join(self.data_dir, "postmaster.pid")) as f:
+            postmaster = int(f.readline())
+        total = 0
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+            except OSError:
+                continue
+            pid, ppid = int(entry), int(fields[1])
+            if pid == postmaster:
+                total += sum(int(value) for value in fields[11:15])
+            elif ppid == postmaster:
+                total += int(fields[11]) + int(fields[12])
+        return total / CLOCK_TICKS
+
+    def database_config(self) -> DatabaseConfig:
+        return DatabaseConfig(host="127.0.0.1", port=self.port, database=self.database,
+                              username=self.user, password="")
+
+
+class Measurement:
+    """记录一次操作的墙钟时间、客户端/服务端CPU和最大RSS"""
+    def __init__(self, cluster: LocalCluster):
+        self.cluster = cluster
+
+    def __enter__(self):
+        self.wall = time.perf_counter()
+        self.self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        self.child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.server_cpu = self.cluster.server_cpu_seconds()
+        return self
+
+    def __exit__(self, *exc):
+        self_usage = resource.getrusage(resource.RUSAGE_SELF)
+        child_usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+        self.result = {
+            "wall_seconds": time.perf_counter() - self.wall,
+            "cpu_seconds_app": (self_usage.ru_utime + self_usage.ru_stime)
+                               - (self.self_usage.ru_utime + self.self_usage.ru_stime),
+            "cpu_seconds_tools": (child_usage.ru_utime + child_usage.ru_stime)
+                                 - (self.child_usage.ru_utime + self.child_usage.ru_stime),
+            "cpu_seconds_server": self.cluster.server_cpu_seconds() - self.server_cpu,
+            # ru_maxrss为进程生命周期内的最大值（KiB）
+            "max_rss_mb_app": self_usage.ru_maxrss / 1024,
+            "max_rss_mb_tools": child_usage.ru_maxrss / 1024,
+        }
+        return False
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽备份/恢复过程中的print输出"""
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+async def run_scenarios(args, cluster: LocalCluster, storage: str) -> List[dict]:
+    db_config = cluster.database_config()
+    results = []
+    for engine in args.engines.split(","):
+        for compress in [value == "on" for value in args.compress.split(",")]:
+            job_counts = [int(j) for j in args.jobs.split(",")] if engine == "parallel_copy" else [1]
+            for jobs in job_counts:
+                backup_config = BackupConfig(storage_path=storage, max_backups=1000, parallel_jobs=jobs,
+                                             split_threshold_mb=args.split_threshold_mb)
+                backup_manager = BackupManager(db_config, backup_config)
+                restore_manager = RestoreManager(db_config, backup_config)
+                label = f"{engine} compress={'on' if compress else 'off'} jobs={jobs}"
+
+                with quiet(), Measurement(cluster) as measurement:
+                    backup_info = await backup_manager.create_backup(f"bench {label}", compress, engine)
+                results.append({
+                    "operation": "backup", "engine": engine, "compress": compress, "jobs": jobs,
+                    "restore_type": None, "bytes_on_disk": backup_info.size,
+                    "timings": backup_info.timings, **measurement.result,
+                })
+                print(f"backup  {label:<40} {measurement.result['wall_seconds']:>8.2f}s "
+                      f"{backup_info.size / 1024 / 1024:>9.1f} MiB")
+
+                for restore_type in args.restore_types.split(","):
+                    if restore_type == "incremental":
+                        # 删除部分行，使增量恢复有实际需要补齐的数据
+                        cluster.psql(cluster.database, "DELETE FROM pgbench_accounts WHERE aid % 10 = 0")
+                    with quiet(), Measurement(cluster) as measurement:
+                        response = await restore_manager.restore_backup(backup_info.id, restore_type, force=True)
+                    results.append({
+                        "operation": "restore", "engine": engine, "compress": compress, "jobs": jobs,
+                        "restore_type": restore_type, "bytes_on_disk": backup_info.size,
+                        "success": response.success, "message": response.message,
+                        "timings": response.timings, **measurement.result,
+                    })
+                    print(f"restore {label + ' ' + restore_type:<40} {measurement.result['wall_seconds']:>8.2f}s "
+                          f"{'ok' if response.success else 'FAILED: ' + response.message}")
+
+                backup_manager.delete_backup(backup_info.id)
+    return results
+
+
+def write_reports(path: str, args, results: List[dict]):
+    report = {
+        "python": sys.version,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "parameters": vars(args),
+        "results": results,
+    }
+    with open(path + ".json", "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    lines = [
+        f"# 端到端备份/恢复基准 (pgbench scale={args.scale})",
+        "",
+        "| 操作 | 引擎 | 压缩 | 并行数 | 恢复类型 | 墙钟(s) | 应用CPU(s) | 工具CPU(s) | 服务端CPU(s) | 应用RSS(MiB) | 落盘(MiB) |",
+        "|---|---|---|---|---|---|---|---|---|---|---|",
+    ]
+    for r in results:
+        lines.append(
+            f"| {r['operation']} | {r['engine']} | {'on' if r['compress'] else 'off'} | {r['jobs']} "
+            f"| {r['restore_type'] or '-'} | {r['wall_seconds']:.2f} | {r['cpu_seconds_app']:.2f} "
+            f"| {r['cpu_seconds_tools']:.2f} | {r['cpu_seconds_server']:.2f} | {r['max_rss_mb_app']:.0f} "
+            f"| {r['bytes_on_disk'] / 1024 / 1024:.1f} |"
+        )
+    with open(path + ".md", "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(f"报告已写入 {path}.json 和 {path}.md")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="临时本地集群上的端到端备份/恢复基准")
+    parser.add_argument("--scale", type=int, default=10, help="pgbench规模因子")
+    parser.add_argument("--engines", default="pg_dump,parallel_copy")
+    parser.add_argument("--compress", default="on,off", help="压缩开关组合，逗号分隔的on/off")
+    parser.add_argument("--jobs", default="1,4", help="parallel_copy引擎的并行连接数，逗号分隔")
+    parser.add_argument("--split-threshold-mb", type=int, default=1024)
+    parser.add_argument("--restore-types", default="normal,full,incremental")
+    parser.add_argument("--pg-bin", help="PostgreSQL二进制目录")
+    parser.add_argument("--workdir", help="集群和备份的工作目录（默认临时目录，结束后删除）")
+    parser.add_argument("--report", default="e2e_report", help="报告文件路径前缀（生成.json和.md）")
+    args = parser.parse_args()
+
+    if sys.platform != "linux":
+        parser.error("该基准依赖/proc统计服务端CPU，仅支持Linux")
+    for name in REQUIRED_BINARIES:
+        if not shutil.which(os.path.join(args.pg_bin, name) if args.pg_bin else name):
+            parser.error(f"找不到 {name}，请安装PostgreSQL或通过 --pg-bin 指定目录")
+    # BackupManager/RestoreManager直接调用pg_dump/psql，确保使用同一套二进制
+    if args.pg_bin:
+        os.environ["PATH"] = args.pg_bin + os.pathsep + os.environ["PATH"]
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="pgbackup-bench-")
+    cluster = LocalCluster(os.path.join(workdir, "cluster"), args.pg_bin)
+    storage = os.path.join(workdir, "backups")
+    try:
+        print(f"初始化临时集群: {cluster.data_dir} (端口 {cluster.port})")
+        cluster.start()
+        print(f"加载pgbench数据 scale={args.scale}...")
+        cluster.load_pgbench(args.scale)
+        results = asyncio.run(run_scenarios(args, cluster, storage))
+        write_reports(args.report, args, results)
+    finally:
+        cluster.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""离线基准：备份解析、过滤与压缩热点路径
+
+无需数据库，在本机即可运行，用于检查 restore.py 中的优化是否带来回归：
+
+    python -m benchmarks.bench_parsing --tables 20 --rows 50000 --escape-ratio 0.3 --json result.json
+"""
+import argparse
+import contextlib
+import gc
+import gzip
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+from app.compression import open_codec
+from app.encryption import DEFAULT_CHUNK_SIZE, EncryptingWriter, new_cipher, open_decrypting
+from app.models import BackupConfig, DatabaseConfig
+from app.dump_scanner import iter_copy_blocks, map_file
+from app.restore import COPY_BLOCK_PATTERN, RestoreManager
+from app.sql_filter import batch_lines, filter_sql_lines, iter_lines
+from benchmarks.synthetic_dump import COLUMN_TYPES, generate_plain_dump
+
+
+def _run_quietly(func: Callable):
+    """屏蔽被测函数中的print输出，避免终端I/O影响计时"""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        return func()
+
+
+def measure(name: str, func: Callable, input_bytes: int, rows: int, repeat: int) -> dict:
+    """多次计时取中位数，再单独运行一次统计tracemalloc峰值内存"""
+    durations = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        _run_quietly(func)
+        durations.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    _run_quietly(func)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(durations)
+    return {
+        "name": name,
+        "seconds_median": median,
+        "seconds_min": min(durations),
+        "mb_per_second": input_bytes / 1024 / 1024 / median if median else None,
+        "rows_per_second": rows / median if median and rows else None,
+        "peak_memory_mb": peak / 1024 / 1024,
+    }
+
+
+def run_benchmarks(args) -> List[dict]:
+    column_types = args.column_types.split(",")
+    content = generate_plain_dump(args.tables, args.rows, column_types, args.escape_ratio, args.seed)
+    content_bytes = content.encode("utf-8")
+    compressed = gzip.compress(content_bytes)
+    total_rows = args.tables * args.rows
+    size = len(content_bytes)
+    print(f"合成备份: {args.tables} 表 x {args.rows} 行, {size / 1024 / 1024:.1f} MiB "
+          f"(gzip {len(compressed) / 1024 / 1024:.1f} MiB)")
+
+    with tempfile.TemporaryDirectory() as storage:
+        manager = RestoreManager(
+            DatabaseConfig(host="localhost", database="bench", username="bench", password=""),
+            BackupConfig(storage_path=storage)
+        )
+        gz_path = os.path.join(storage, "bench.sql.gz")
+        with open(gz_path, "wb") as f:
+            f.write(compressed)
+        plain_path = os.path.join(storage, "bench.sql")
+        with open(plain_path, "wb") as f:
+            f.write(content_bytes)
+
+        def read_gzip_stream():
+            with gzip.open(gz_path, "rb") as f:
+                while f.read(1024 * 1024):
+                    pass
+
+        def mmap_copy_scan():
+            # 未压缩备份的COPY块定位：mmap + find，不解码
+            with map_file(plain_path) as buf:
+                for block in iter_copy_blocks(buf):
+                    block.data.release()
+
+        key = os.urandom(32)
+        encrypted_path = os.path.join(storage, "bench.sql.enc")
+        with open(encrypted_path, "wb") as f:
+            writer = EncryptingWriter(f, key)
+            writer.write(content_bytes)
+            writer.close()
+        encrypted_gz_path = os.path.join(storage, "bench.sql.gz.enc")
+        with open_codec(encrypted_gz_path, "gzip", "wb", key=key) as f:
+            f.write(content_bytes)
+
+        def aesgcm_raw():
+            # 硬件AES速度基线：同样按1MB分块直接调用AESGCM，不含文件和分块格式的开销
+            cipher = new_cipher(key)
+            nonce = os.urandom(12)
+            view = memoryview(content_bytes)
+            for offset in range(0, size, DEFAULT_CHUNK_SIZE):
+                cipher.encrypt(nonce, view[offset:offset + DEFAULT_CHUNK_SIZE], None)
+
+        def encrypt_stream():
+            # 与备份时相同：按64KB写入加密流，密文写入丢弃
+            with open(os.devnull, "wb") as sink:
+                writer = EncryptingWriter(sink, key)
+                view = memoryview(content_bytes)
+                for offset in range(0, size, 64 * 1024):
+                    writer.write(view[offset:offset + 64 * 1024])
+                writer.close()
+
+        def decrypt_stream():
+            with open(encrypted_path, "rb") as f:
+                reader = open_decrypting(f, key)
+                while reader.read(1024 * 1024):
+                    pass
+
+        def read_encrypted_gzip_stream():
+            # 恢复加密备份时的管道：解密 -> 解压，与gzip_stream_read对比即为加密的额外开销
+            with open_codec(encrypted_gz_path, "gzip", "rb", key=key) as f:
+                while f.read(1024 * 1024):
+                    pass
+
+        def filter_gzip_stream():
+            # 与恢复时相同的管道：解压 -> 逐行过滤 -> 合并为写入psql的块
+            with gzip.open(gz_path, "rb") as f:
+                for _ in batch_lines(filter_sql_lines(iter_lines(f), "cleanup")):
+                    pass
+
+        cases = [
+            ("parse_backup_data", lambda: manager.parse_backup_data(content), size, total_rows),
+            ("filter_cleanup_commands", lambda: manager.filter_cleanup_commands(content), size, total_rows),
+            ("filter_for_incremental_restore", lambda: manager.filter_for_incremental_restore(content), size, total_rows),
+            ("copy_block_regex", lambda: sum(1 for _ in COPY_BLOCK_PATTERN.finditer(content)), size, total_rows),
+            ("mmap_copy_scan", mmap_copy_scan, size, total_rows),
+            ("load_copy_tables", lambda: manager.load_copy_tables(content), size, total_rows),
+            ("utf8_decode", lambda: content_bytes.decode("utf-8"), size, total_rows),
+            ("gzip_compress_level9", lambda: gzip.compress(content_bytes), size, total_rows),
+            ("gzip_compress_level1", lambda: gzip.compress(content_bytes, compresslevel=1), size, total_rows),
+            ("gzip_decompress", lambda: gzip.decompress(compressed), size, total_rows),
+            ("gzip_stream_read", read_gzip_stream, size, total_rows),
+            ("filter_gzip_stream", filter_gzip_stream, size, total_rows),
+            ("aesgcm_raw", aesgcm_raw, size, total_rows),
+            ("encrypt_stream", encrypt_stream, size, total_rows),
+            ("decrypt_stream", decrypt_stream, size, total_rows),
+            ("encrypted_gzip_stream_read", read_encrypted_gzip_stream, size, total_rows),
+        ]
+        selected = set(args.only.split(",")) if args.only else None
+        results = []
+        for name, func, input_bytes, rows in cases:
+            if selected and name not in selected:
+                continue
+            result = measure(name, func, input_bytes, rows, args.repeat)
+            results.append(result)
+            print(f"{name:<32} {result['seconds_median']:>9.4f}s {result['mb_per_second']:>9.1f} MB/s "
+                  f"{result['rows_per_second'] or 0:>12.0f} rows/s {result['peak_memory_mb']:>9.1f} MiB peak")
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="备份解析/过滤/压缩离线基准")
+    parser.add_argument("--tables", type=int, default=10, help="表数量")
+    parser.add_argument("--rows", type=int, default=20000, help="每个表的行数")
+    parser.add_argument("--column-types", default="int,text,numeric,date,bool",
+                        help=f"逗号分隔的列类型，可选: {','.join(COLUMN_TYPES)}")
+    parser.add_argument("--escape-ratio", type=float, default=0.1, help="含转义字符的文本值比例")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取中位数）")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--only", help="只运行指定的基准项，逗号分隔")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    for ctype in args.column_types.split(","):
+        if ctype not in COLUMN_TYPES:
+            parser.error(f"未知列类型: {ctype}")
+
+    results = run_benchmarks(args)
+    if args.json:
+        report = {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "parameters": vars(args),
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
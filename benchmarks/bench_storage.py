@@ -0,0 +1,119 @@
+"""对象存储基准：分段上传与范围下载吞吐量随并行分段数的变化
+
+需要一个S3兼容服务（如本地MinIO）和boto3，对每个并行数上传一个随机数据对象再下载校验：
+
+    docker run -p 9000:9000 minio/minio server /data
+    python -m benchmarks.bench_storage --endpoint-url http://127.0.0.1:9000 --bucket bench \\
+        --access-key minioadmin --secret-key minioadmin --size-mb 512 --concurrency 1,4,8,16
+"""
+import argparse
+import hashlib
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from typing import List
+
+from app.storage import S3Storage
+
+
+WRITE_CHUNK_SIZE = 1024 * 1024
+
+
+def upload(storage: S3Storage, key: str, size: int, block: bytes) -> str:
+    """按pg_dump管道的方式以1MB为单位写入，返回内容的sha256"""
+    digest = hashlib.sha256()
+    writer = storage.open_writer(key)
+    try:
+        written = 0
+        while written < size:
+            chunk = block[:min(WRITE_CHUNK_SIZE, size - written)]
+            writer.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+        writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
+    return digest.hexdigest()
+
+
+def download(storage: S3Storage, key: str) -> str:
+    digest = hashlib.sha256()
+    with storage.open_reader(key) as reader:
+        while True:
+            chunk = reader.read(WRITE_CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def run_benchmarks(args) -> List[dict]:
+    size = args.size_mb * 1024 * 1024
+    # 随机数据块循环写入，避免生成随机数的耗时计入上传
+    block = os.urandom(WRITE_CHUNK_SIZE)
+    results = []
+    for concurrency in [int(value) for value in args.concurrency.split(",")]:
+        storage = S3Storage(
+            bucket=args.bucket, prefix=args.prefix, endpoint_url=args.endpoint_url, region=args.region,
+            access_key=args.access_key, secret_key=args.secret_key,
+            part_size_mb=args.part_size_mb, max_concurrency=concurrency
+        )
+        key = f"bench-{uuid.uuid4().hex[:8]}.bin"
+        try:
+            start = time.perf_counter()
+            expected = upload(storage, key, size, block)
+            upload_seconds = time.perf_counter() - start
+            start = time.perf_counter()
+            actual = download(storage, key)
+            download_seconds = time.perf_counter() - start
+        finally:
+            storage.delete(key)
+        result = {
+            "concurrency": concurrency,
+            "size_mb": args.size_mb,
+            "upload_seconds": round(upload_seconds, 3),
+            "upload_mb_s": round(args.size_mb / upload_seconds, 1),
+            "download_seconds": round(download_seconds, 3),
+            "download_mb_s": round(args.size_mb / download_seconds, 1),
+            "verified": expected == actual,
+        }
+        results.append(result)
+        print(f"并行 {concurrency:>3}: 上传 {result['upload_mb_s']:>8} MB/s  "
+              f"下载 {result['download_mb_s']:>8} MB/s  校验{'通过' if result['verified'] else '失败'}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="S3兼容对象存储上传/下载吞吐量基准")
+    parser.add_argument("--bucket", required=True)
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--endpoint-url", default="")
+    parser.add_argument("--region", default="")
+    parser.add_argument("--access-key", default="")
+    parser.add_argument("--secret-key", default="")
+    parser.add_argument("--size-mb", type=int, default=256, help="测试对象大小（MB）")
+    parser.add_argument("--part-size-mb", type=int, default=16)
+    parser.add_argument("--concurrency", default="1,4,8", help="并行分段数，逗号分隔")
+    parser.add_argument("--json", help="将结果写入JSON文件")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+    if args.json:
+        parameters = {k: v for k, v in vars(args).items() if k not in ("access_key", "secret_key")}
+        report = {
+            "python": sys.version,
+            "platform": platform.platform(),
+            "parameters": parameters,
+            "results": results,
+        }
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"结果已写入 {args.json}")
+
+
+if __name__ == "__main__":
+    main()
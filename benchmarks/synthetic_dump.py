@@ -0,0 +1,87 @@
+import random
+from datetime import date, timedelta
+from typing import List
+
+
+COLUMN_TYPES = ("int", "bigint", "numeric", "text", "bool", "date", "jsonb")
+
+_SQL_TYPES = {
+    "int": "integer",
+    "bigint": "bigint",
+    "numeric": "numeric(12,2)",
+    "text": "text",
+    "bool": "boolean",
+    "date": "date",
+    "jsonb": "jsonb",
+}
+
+_WORDS = ("alpha", "beta", "gamma", "delta", "DROP TABLE", "CREATE INDEX", "SELECT", "VALUES", "中文", "数据")
+
+
+def _escape_copy_text(value: str) -> str:
+    """按COPY文本格式转义"""
+    return (value.replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+def _random_text(rng: random.Random, escape_ratio: float) -> str:
+    words = [rng.choice(_WORDS) for _ in range(rng.randint(2, 8))]
+    text = " ".join(words)
+    if rng.random() < escape_ratio:
+        text += rng.choice(("\tcol\tsep", "\nline\nbreak", "C:\\path\\to\\file", "tab\tand\\slash\n"))
+    return _escape_copy_text(text)
+
+
+def _random_value(rng: random.Random, column_type: str, row_id: int, escape_ratio: float) -> str:
+    if rng.random() < 0.05 and column_type != "int":
+        return "\\N"
+    if column_type == "int":
+        return str(rng.randint(-100000, 100000))
+    if column_type == "bigint":
+        return str(rng.randint(0, 2 ** 62))
+    if column_type == "numeric":
+        return f"{rng.uniform(-1e6, 1e6):.2f}"
+    if column_type == "bool":
+        return rng.choice(("t", "f"))
+    if column_type == "date":
+        return (date(2020, 1, 1) + timedelta(days=rng.randint(0, 2000))).isoformat()
+    if column_type == "jsonb":
+        return _escape_copy_text(f'{{"id": {row_id}, "tag": "{rng.choice(_WORDS)}", "n": {rng.random():.4f}}}')
+    return _random_text(rng, escape_ratio)
+
+
+def generate_plain_dump(tables: int = 10, rows: int = 10000, column_types: List[str] = None,
+                        escape_ratio: float = 0.1, seed: int = 42) -> str:
+    """生成与 pg_dump --clean --if-exists --create 纯文本输出结构一致的合成备份"""
+    rng = random.Random(seed)
+    column_types = column_types or ["int", "text", "numeric", "date", "bool"]
+    parts = [
+        "--\n-- PostgreSQL database dump\n--\n\n",
+        "SET statement_timeout = 0;\nSET lock_timeout = 0;\nSET client_encoding = 'UTF8';\n",
+        "SET standard_conforming_strings = on;\n",
+        "SELECT pg_catalog.set_config('search_path', '', false);\n\n",
+        "DROP DATABASE IF EXISTS bench;\nCREATE DATABASE bench WITH TEMPLATE = template0 ENCODING = 'UTF8';\n",
+        "\\connect bench\n\n",
+    ]
+    for t in range(tables):
+        parts.append(f"DROP TABLE IF EXISTS public.table_{t};\n")
+    for t in range(tables):
+        columns = ["id"] + [f"c{i}_{ctype}" for i, ctype in enumerate(column_types)]
+        definitions = ["    id bigint NOT NULL"] + [
+            f"    c{i}_{ctype} {_SQL_TYPES[ctype]}" for i, ctype in enumerate(column_types)
+        ]
+        parts.append(f"\n--\n-- Name: table_{t}; Type: TABLE; Schema: public\n--\n\n")
+        parts.append(f"CREATE TABLE public.table_{t} (\n" + ",\n".join(definitions) + "\n);\n\n")
+        parts.append(f"COMMENT ON TABLE public.table_{t} IS 'synthetic';\n\n")
+        parts.append(f"COPY public.table_{t} ({', '.join(columns)}) FROM stdin;\n")
+        lines = []
+        for row_id in range(1, rows + 1):
+            values = [str(row_id)] + [_random_value(rng, ctype, row_id, escape_ratio) for ctype in column_types]
+            lines.append("\t".join(values))
+        parts.append("\n".join(lines))
+        parts.append("\n\\.\n\n")
+    for t in range(tables):
+        parts.append(f"ALTER TABLE ONLY public.table_{t}\n    ADD CONSTRAINT table_{t}_pkey PRIMARY KEY (id);\n\n")
+        parts.append(f"CREATE INDEX table_{t}_c0_idx ON public.table_{t} USING btree (c0_{column_types[0]});\n\n")
+    parts.append("--\n-- PostgreSQL database dump complete\n--\n\n")
+    return "".join(parts)
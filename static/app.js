@@ -101,6 +101,11 @@ class BackupTool {
                                         ${backup.status !== 'completed' ? 'disabled' : ''}>
                                     <i class="fas fa-undo"></i>
                                 </button>
+                                ${backup.status === 'completed' && backup.format !== 'parallel_copy' ? `
+                                    <a class="btn btn-primary" href="/api/backups/${backup.id}/download" title="下载">
+                                        <i class="fas fa-download"></i>
+                                    </a>
+                                ` : ''}
                                 <button class="btn btn-danger" onclick="app.deleteBackup('${backup.id}')">
                                     <i class="fas fa-trash"></i>
                                 </button>
@@ -342,10 +347,14 @@ class BackupTool {
                 body: JSON.stringify({ backup_ids: backupIds })
             });
             
-            if (response.success) {
-                this.showNotification(response.message, 'success');
+            this.showNotification(response.message, response.success ? 'info' : 'warning');
+            
+            // 删除在后台执行，等待任务结束后再刷新列表
+            const job = await this.waitForJob(response.job_id);
+            if (job.status === 'completed' && job.failed_count === 0) {
+                this.showNotification(`成功删除 ${job.deleted_count} 个备份`, 'success');
             } else {
-                this.showNotification(response.message, 'warning');
+                this.showNotification(`删除完成：成功 ${job.deleted_count} 个，失败 ${job.failed_count} 个`, 'warning');
             }
             
             await this.loadBackups();
@@ -354,6 +363,17 @@ class BackupTool {
         }
     }
 
+    async waitForJob(jobId) {
+        // 轮询后台删除任务直到结束
+        while (true) {
+            const job = await this.apiRequest(`/api/jobs/${jobId}`);
+            if (job.status === 'completed' || job.status === 'failed') {
+                return job;
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000));
+        }
+    }
+
     resetSelection() {
         const selectAllCheckbox = document.getElementById('selectAll');
         const batchDeleteBtn = document.getElementById('batchDeleteBtn');
@@ -645,7 +665,12 @@ class BackupTool {
             });
 
             if (result.success) {
-                this.showNotification(result.message, 'success');
+                if (result.job_id) {
+                    const job = await this.waitForJob(result.job_id);
+                    this.showNotification(`清理完成，删除了 ${job.deleted_count} 个备份文件`, job.failed_count ? 'warning' : 'success');
+                } else {
+                    this.showNotification(result.message, 'success');
+                }
                 
                 // 刷新备份列表
                 await this.loadBackups();
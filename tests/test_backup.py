@@ -0,0 +1,25 @@
+from datetime import datetime
+
+from app.backup import BackupManager
+from app.models import BackupConfig, BackupInfo, BackupStatus, DatabaseConfig
+
+
+DB_CONFIG = DatabaseConfig(host="localhost", port=5432, database="db", username="u", password="p")
+
+
+def test_concurrent_reservations_get_distinct_ids(tmp_path):
+    # 同一备份目录的两个管理器实例（如API和调度器）共享预留
+    first_manager = BackupManager(DB_CONFIG, BackupConfig(storage_path=str(tmp_path)))
+    second_manager = BackupManager(DB_CONFIG, BackupConfig(storage_path=str(tmp_path)))
+    started = datetime(2024, 1, 1, 12, 0, 0, 500000)
+
+    first = first_manager.reserve_backup_timestamp(started)
+    second = second_manager.reserve_backup_timestamp(started)
+    assert (first, second) == (datetime(2024, 1, 1, 12, 0, 0), datetime(2024, 1, 1, 12, 0, 1))
+
+    # 释放后信息文件仍然占用该ID
+    first_manager.save_backup_info(BackupInfo(id="20240101_120000", filename="backup_20240101_120000.sql",
+                                              created_at=first, size=0, status=BackupStatus.RUNNING))
+    first_manager.release_backup_id("20240101_120000")
+    second_manager.release_backup_id("20240101_120001")
+    assert first_manager.reserve_backup_timestamp(started) == second
@@ -0,0 +1,126 @@
+import asyncio
+
+import pytest
+
+from app.coordinator import OperationCoordinator, OperationSkipped
+
+
+async def settle():
+    # 让排队的任务有机会检查能否开始
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def hold(coordinator, operation, log, release: asyncio.Event):
+    """在任务中获取操作名额，记录开始顺序，直到release被设置"""
+    async def run():
+        async with coordinator.acquire(operation):
+            log.append(operation.description)
+            await release.wait()
+    return asyncio.ensure_future(run())
+
+
+def test_restore_waits_for_backup_and_blocks_later_backups():
+    async def scenario():
+        coordinator = OperationCoordinator()
+        log = []
+        events = {name: asyncio.Event() for name in ("b1", "restore", "b2")}
+        b1 = coordinator.submit("db", "backup", "manual", "b1", max_concurrent=2)
+        restore = coordinator.submit("db", "restore", "manual", "restore")
+        b2 = coordinator.submit("db", "backup", "manual", "b2", max_concurrent=2)
+        tasks = [hold(coordinator, op, log, events[op.description]) for op in (b1, restore, b2)]
+        await settle()
+        # 先到先得：b2虽然有并发名额，也不能越过排队的恢复
+        assert log == ["b1"]
+        assert coordinator.status(restore).queue_position == 1
+        assert coordinator.status(b2).queue_position == 2
+        events["b1"].set()
+        await settle()
+        assert log == ["b1", "restore"]
+        events["restore"].set()
+        await settle()
+        assert log == ["b1", "restore", "b2"]
+        events["b2"].set()
+        await asyncio.gather(*tasks)
+        assert [op.status for op in (b1, restore, b2)] == ["completed"] * 3
+    asyncio.run(scenario())
+
+
+def test_backups_share_global_and_host_limits():
+    async def scenario():
+        coordinator = OperationCoordinator()
+        coordinator.configure(2, 1)
+        log = []
+        release = asyncio.Event()
+        ops = [
+            coordinator.submit("a", "backup", "manual", "a", host="h1"),
+            coordinator.submit("b", "backup", "manual", "b", host="h1"),
+            coordinator.submit("c", "backup", "manual", "c", host="h2"),
+            coordinator.submit("d", "backup", "manual", "d", host="h3"),
+        ]
+        tasks = [hold(coordinator, op, log, release) for op in ops]
+        await settle()
+        # h1每个主机只允许一个，全局只允许两个
+        assert log == ["a", "c"]
+        assert [op.status for op in ops] == ["running", "queued", "running", "queued"]
+        coordinator.configure(0, 0)
+        await settle()
+        assert sorted(log) == ["a", "b", "c", "d"]
+        release.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(scenario())
+
+
+def test_scheduled_backups_are_coalesced():
+    coordinator = OperationCoordinator()
+    first = coordinator.submit("db", "backup", "scheduled")
+    with pytest.raises(OperationSkipped) as excinfo:
+        coordinator.submit("db", "backup", "trigger")
+    assert excinfo.value.existing is first
+    # 手动备份和其他数据库不受影响
+    coordinator.submit("db", "backup", "manual")
+    coordinator.submit("other", "backup", "scheduled")
+
+
+def test_abandon_allows_next_scheduled_backup():
+    coordinator = OperationCoordinator()
+    waiting = coordinator.submit("db", "backup", "scheduled")
+    coordinator.abandon(waiting, RuntimeError("cancelled"))
+    assert waiting.status == "failed" and waiting.error == "cancelled"
+    coordinator.submit("db", "backup", "scheduled")
+
+
+def test_failed_operation_is_recorded_and_releases_database():
+    async def scenario():
+        coordinator = OperationCoordinator()
+        failing = coordinator.submit("db", "restore", "manual")
+        with pytest.raises(RuntimeError):
+            async with coordinator.acquire(failing):
+                raise RuntimeError("restore failed")
+        assert failing.status == "failed" and failing.error == "restore failed"
+        following = coordinator.submit("db", "backup", "manual")
+        async with coordinator.acquire(following):
+            assert following.status == "running"
+        assert following.status == "completed"
+        assert [op.operation_id for op in coordinator.list(active_only=True)] == []
+    asyncio.run(scenario())
+
+
+def test_set_host_frees_slot_on_previous_host():
+    async def scenario():
+        coordinator = OperationCoordinator()
+        coordinator.configure(0, 1)
+        log = []
+        release = asyncio.Event()
+        first = coordinator.submit("a", "backup", "manual", "a", host="primary")
+        second = coordinator.submit("b", "backup", "manual", "b", host="primary")
+        tasks = [hold(coordinator, op, log, release) for op in (first, second)]
+        await settle()
+        assert log == ["a"]
+        # 第一个备份改从副本导出后，主库的名额让给排队的备份
+        await coordinator.set_host(first, "replica")
+        await settle()
+        assert log == ["a", "b"]
+        release.set()
+        await asyncio.gather(*tasks)
+    asyncio.run(scenario())
@@ -0,0 +1,59 @@
+from datetime import datetime
+
+import pytest
+
+from app.download import RangeNotSatisfiable, build_etag, etag_matches, parse_range
+from app.models import BackupInfo, BackupStatus
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 100)),
+    ("bytes=10-", (10, 1000)),
+    ("bytes=990-2000", (990, 1000)),
+    ("bytes=-100", (900, 1000)),
+    ("bytes=-5000", (0, 1000)),
+    ("bytes=5-5", (5, 6)),
+])
+def test_parse_range_satisfiable(header, expected):
+    assert parse_range(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "items=0-10", "bytes=0-10,20-30", "bytes=abc-", "bytes=5", "bytes=-",
+    "bytes=5-3",
+])
+def test_parse_range_ignored(header):
+    assert parse_range(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_parse_range_not_satisfiable(header):
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range(header, 1000)
+
+
+def test_parse_range_empty_file():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=0-", 0)
+
+
+def test_etag_matches_weak_comparison_and_lists():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('W/"abc"', etag)
+    assert etag_matches('"x", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"abcd"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_build_etag_changes_with_file():
+    info = BackupInfo(id="20240101_000000", filename="backup_20240101_000000.sql.gz",
+                      created_at=datetime(2024, 1, 1), size=10, status=BackupStatus.COMPLETED)
+    etag = build_etag(info, 10, 1)
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == build_etag(info, 10, 1)
+    assert etag != build_etag(info, 11, 1)
+    assert etag != build_etag(info, 10, 2)
+    moved = info.model_copy(update={"filename": "backup_20240101_000000.sql.xz"})
+    assert etag != build_etag(moved, 10, 1)
@@ -0,0 +1,58 @@
+from app.dump_scanner import iter_copy_blocks, iter_slices, map_file
+
+
+DUMP = (b"SET client_encoding = 'UTF8';\n"
+        b"COPY public.users (id, \"name\") FROM stdin;\n"
+        b"1\talice\n"
+        b"2\tbob\n"
+        b"\\.\n"
+        b"\n"
+        b"COPY public.empty (id) FROM stdin;\n"
+        b"\\.\n"
+        b"-- COPY public.fake (id) FROM stdin;\n"
+        b"COPY public.events (id, payload) FROM stdin;\n"
+        b"7\t{\"x\": \"\\\\.\"}\n"
+        b"\\.\n")
+
+
+def test_iter_copy_blocks_headers_and_data():
+    blocks = list(iter_copy_blocks(DUMP))
+    assert [b.table for b in blocks] == ["users", "empty", "events"]
+    assert blocks[0].columns == ["id", "name"]
+    assert bytes(blocks[0].data) == b"1\talice\n2\tbob"
+    assert blocks[0].offset == DUMP.index(b"COPY public.users")
+
+
+def test_iter_copy_blocks_empty_table():
+    empty = list(iter_copy_blocks(DUMP))[1]
+    assert empty.columns == ["id"]
+    assert bytes(empty.data) == b""
+
+
+def test_iter_copy_blocks_ignores_header_not_at_line_start():
+    assert "fake" not in [b.table for b in iter_copy_blocks(DUMP)]
+
+
+def test_iter_copy_blocks_escaped_backslash_is_not_end_marker():
+    events = list(iter_copy_blocks(DUMP))[2]
+    assert bytes(events.data) == b"7\t{\"x\": \"\\\\.\"}"
+
+
+def test_iter_copy_blocks_unterminated_block_is_dropped():
+    assert list(iter_copy_blocks(b"COPY public.t (id) FROM stdin;\n1\n2\n")) == []
+
+
+def test_iter_slices_covers_buffer():
+    slices = list(iter_slices(b"abcdefghij", chunk_size=4))
+    assert [bytes(s) for s in slices] == [b"abcd", b"efgh", b"ij"]
+
+
+def test_map_file(tmp_path):
+    empty = tmp_path / "empty.sql"
+    empty.write_bytes(b"")
+    with map_file(str(empty)) as buf:
+        assert buf == b""
+    dump = tmp_path / "dump.sql"
+    dump.write_bytes(DUMP)
+    with map_file(str(dump)) as buf:
+        assert [b.table for b in iter_copy_blocks(buf)] == ["users", "empty", "events"]
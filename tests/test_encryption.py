@@ -0,0 +1,80 @@
+import base64
+import io
+
+import pytest
+
+from app.encryption import EncryptingWriter, EncryptionError, HEADER, is_encrypted, open_decrypting, parse_key
+
+
+KEY = bytes(range(32))
+
+
+def encrypt(data: bytes, key: bytes = KEY, chunk_size: int = 16) -> bytes:
+    out = io.BytesIO()
+    writer = EncryptingWriter(out, key, chunk_size=chunk_size)
+    writer.write(data)
+    writer.close()
+    return out.getvalue()
+
+
+def decrypt(blob: bytes, key: bytes = KEY) -> bytes:
+    return open_decrypting(io.BytesIO(blob), key).read()
+
+
+@pytest.mark.parametrize("size", [0, 1, 15, 16, 17, 32, 100])
+def test_round_trip(size):
+    data = bytes(i % 251 for i in range(size))
+    blob = encrypt(data)
+    assert is_encrypted(blob)
+    assert decrypt(blob) == data
+
+
+def test_incremental_writes_match_single_write():
+    data = b"0123456789" * 10
+    out = io.BytesIO()
+    writer = EncryptingWriter(out, KEY, chunk_size=16)
+    for offset in range(0, len(data), 7):
+        writer.write(data[offset:offset + 7])
+    writer.close()
+    assert decrypt(out.getvalue()) == data
+
+
+def test_tampered_chunk_detected():
+    blob = bytearray(encrypt(b"x" * 40))
+    blob[HEADER.size + 8] ^= 1
+    with pytest.raises(EncryptionError, match="校验失败"):
+        decrypt(bytes(blob))
+
+
+def test_truncated_file_detected():
+    blob = encrypt(b"x" * 40)
+    # 去掉结束块：读到文件尾仍未见结束块
+    chunk = 4 + 16 + 16
+    with pytest.raises(EncryptionError, match="不完整"):
+        decrypt(blob[:HEADER.size + 2 * chunk])
+    with pytest.raises(EncryptionError, match="不完整"):
+        decrypt(blob[:-3])
+
+
+def test_trailing_data_detected():
+    with pytest.raises(EncryptionError, match="多余数据"):
+        decrypt(encrypt(b"x" * 40) + b"junk")
+
+
+def test_wrong_key_detected():
+    with pytest.raises(EncryptionError, match="密钥不匹配"):
+        decrypt(encrypt(b"secret"), key=bytes(32))
+
+
+def test_not_encrypted():
+    with pytest.raises(EncryptionError, match="不是加密的备份文件"):
+        decrypt(b"-- plain sql dump" + b"\0" * HEADER.size)
+
+
+def test_parse_key():
+    assert parse_key(KEY) == KEY
+    assert parse_key(base64.b64encode(KEY) + b"\n") == KEY
+    with pytest.raises(EncryptionError):
+        parse_key(b"too short")
+    with pytest.raises(EncryptionError):
+        parse_key(base64.b64encode(b"x" * 16))
@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from app.metrics import CatalogCollector
+from app.models import BackupInfo, BackupStatus
+
+
+def backup(backup_id: str, size: int, status: BackupStatus = BackupStatus.COMPLETED) -> BackupInfo:
+    return BackupInfo(id=backup_id, filename=f"{backup_id}.sql.gz", created_at=datetime(2024, 1, 1),
+                      size=size, status=status)
+
+
+def gauges(collector: CatalogCollector):
+    count, size = collector.collect()
+    return ({tuple(s.labels.values()): s.value for s in count.samples},
+            {tuple(s.labels.values()): s.value for s in size.samples})
+
+
+def test_catalog_scanned_once_then_updated_incrementally():
+    scans = []
+
+    def list_backups():
+        scans.append(1)
+        return [backup("a", 10), backup("b", 5, BackupStatus.FAILED)]
+
+    collector = CatalogCollector()
+    collector.source = lambda: {"default": ("/backups", list_backups)}
+    assert gauges(collector) == ({("default", "completed"): 1, ("default", "failed"): 1},
+                                 {("default", "completed"): 10, ("default", "failed"): 5})
+    collector.record("/backups", backup("c", 20))
+    collector.forget("/backups", ["b"])
+    collector.record("/other", backup("ignored", 1))
+    assert gauges(collector) == ({("default", "completed"): 2}, {("default", "completed"): 30})
+    assert len(scans) == 1
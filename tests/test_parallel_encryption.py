@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import secrets
+
+import pytest
+
+from app.backup import (
+    PARALLEL_MANIFEST, PARALLEL_SCHEMA_POST, PARALLEL_SCHEMA_PRE, PARALLEL_SEQUENCES, BackupManager
+)
+from app.encryption import EncryptionError
+from app.models import BackupConfig, DatabaseConfig
+from app.restore import RestoreManager
+
+
+SCHEMA_PRE = b"CREATE TABLE public.users (id integer NOT NULL, name text);\n"
+SCHEMA_POST = b"ALTER TABLE ONLY public.users ADD CONSTRAINT users_pkey PRIMARY KEY (id);\n"
+SEQUENCES = b"SELECT pg_catalog.setval('public.users_id_seq', 42, true);\n"
+
+
+@pytest.fixture
+def managers(tmp_path):
+    db_config = DatabaseConfig(host="localhost", port=5432, database="app", username="u", password="p")
+    backup_config = BackupConfig(storage_path=str(tmp_path / "backups"))
+    return BackupManager(db_config, backup_config), RestoreManager(db_config, backup_config)
+
+
+def write_parallel_backup(manager, backup_dir, key):
+    os.makedirs(backup_dir)
+    for name, data in ((PARALLEL_SCHEMA_PRE, SCHEMA_PRE), (PARALLEL_SCHEMA_POST, SCHEMA_POST),
+                       (PARALLEL_SEQUENCES, SEQUENCES)):
+        manager.write_parallel_file(os.path.join(backup_dir, name), data, key)
+    manifest = {
+        "format": "parallel_copy", "codec": "none", "encrypted": key is not None,
+        "schema_encrypted": key is not None, "schema_pre": PARALLEL_SCHEMA_PRE,
+        "schema_post": PARALLEL_SCHEMA_POST, "sequences": PARALLEL_SEQUENCES, "tables": []
+    }
+    with open(os.path.join(backup_dir, PARALLEL_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f)
+
+
+def capture_psql(monkeypatch, restorer):
+    applied = []
+
+    async def pipe_to_psql(chunks):
+        applied.append(b"".join(bytes(chunk) for chunk in chunks))
+
+    monkeypatch.setattr(restorer, "pipe_to_psql", pipe_to_psql)
+    monkeypatch.setattr(restorer, "copy_tables_parallel", lambda *args: None)
+    return applied
+
+
+def test_encrypted_schema_files_round_trip(managers, tmp_path, monkeypatch):
+    manager, restorer = managers
+    key = secrets.token_bytes(32)
+    backup_dir = str(tmp_path / "backup.dir")
+    write_parallel_backup(manager, backup_dir, key)
+
+    for name in (PARALLEL_SCHEMA_PRE, PARALLEL_SCHEMA_POST, PARALLEL_SEQUENCES):
+        with open(os.path.join(backup_dir, name), 'rb') as f:
+            assert b"public" not in f.read()
+
+    applied = capture_psql(monkeypatch, restorer)
+    asyncio.run(restorer.execute_parallel_restore(backup_dir, key=key))
+    assert applied == [SCHEMA_PRE, SCHEMA_POST, SEQUENCES]
+
+
+def test_encrypted_schema_files_reject_wrong_key(managers, tmp_path, monkeypatch):
+    manager, restorer = managers
+    backup_dir = str(tmp_path / "backup.dir")
+    write_parallel_backup(manager, backup_dir, secrets.token_bytes(32))
+
+    capture_psql(monkeypatch, restorer)
+    with pytest.raises(EncryptionError):
+        asyncio.run(restorer.execute_parallel_restore(backup_dir, key=secrets.token_bytes(32)))
+
+
+def test_unencrypted_schema_files_are_plain_sql(managers, tmp_path, monkeypatch):
+    manager, restorer = managers
+    backup_dir = str(tmp_path / "backup.dir")
+    write_parallel_backup(manager, backup_dir, None)
+
+    with open(os.path.join(backup_dir, PARALLEL_SCHEMA_PRE), 'rb') as f:
+        assert f.read() == SCHEMA_PRE
+    applied = capture_psql(monkeypatch, restorer)
+    asyncio.run(restorer.execute_parallel_restore(backup_dir))
+    assert applied == [SCHEMA_PRE, SCHEMA_POST, SEQUENCES]
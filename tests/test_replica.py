@@ -0,0 +1,17 @@
+from app import replica
+from app.models import BackupConfig, DatabaseConfig
+from app.replica import BackupSource, dump_host, replica_config
+
+
+DB_CONFIG = DatabaseConfig(host="primary", port=5432, database="db", username="u", password="p",
+                           replica_host="replica", replica_port=5432)
+
+
+def test_dump_host_follows_replica_availability(monkeypatch):
+    config = BackupConfig()
+    monkeypatch.setattr(replica, "check_replica",
+                        lambda db, backup: (BackupSource("replica", replica_config(db)), "", ""))
+    assert dump_host(DB_CONFIG, config) == "replica"
+    monkeypatch.setattr(replica, "check_replica", lambda db, backup: (None, "lag", "too far behind"))
+    assert dump_host(DB_CONFIG, config) == "primary"
+    assert dump_host(DB_CONFIG.model_copy(update={"replica_host": ""}), config) == "primary"
@@ -0,0 +1,26 @@
+import asyncio
+import gzip
+
+from app.models import BackupConfig, DatabaseConfig
+from app.restore import RestoreManager
+
+
+def test_full_restore_streams_dump_through_cleanup_filter(tmp_path, monkeypatch):
+    manager = RestoreManager(DatabaseConfig(host="localhost", port=5432, database="db", username="u", password="p"),
+                             BackupConfig(storage_path=str(tmp_path)))
+    backup_file = tmp_path / "backup.sql.gz"
+    with gzip.open(backup_file, 'wb') as f:
+        f.write(b"DROP TABLE IF EXISTS public.t;\nCREATE TABLE public.t (id integer);\n"
+                b"COPY public.t (id) FROM stdin;\n1\n\\.\n")
+    written = []
+
+    async def clear_database():
+        written.append(b"<clear>")
+
+    async def pipe_to_psql(chunks):
+        written.extend(chunks)
+
+    monkeypatch.setattr(manager, "clear_database", clear_database)
+    monkeypatch.setattr(manager, "pipe_to_psql", pipe_to_psql)
+    asyncio.run(manager.execute_full_restore(str(backup_file), "gzip"))
+    assert b"".join(written) == b"<clear>CREATE TABLE public.t (id integer);\nCOPY public.t (id) FROM stdin;\n1\n\\.\n"
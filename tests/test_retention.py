@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+from app.models import BackupConfig, BackupInfo, BackupStatus
+from app.retention import plan_retention, select_gfs_survivors
+
+
+def backup(backup_id: str, created_at: str, status: BackupStatus = BackupStatus.COMPLETED, size: int = 10) -> BackupInfo:
+    return BackupInfo(id=backup_id, filename=f"{backup_id}.sql.gz", created_at=datetime.fromisoformat(created_at),
+                      size=size, status=status)
+
+
+GFS_BACKUPS = [
+    backup("a", "2024-03-10T12:00"),
+    backup("b", "2024-03-10T06:00"),
+    backup("c", "2024-03-09T12:00"),
+    backup("d", "2024-03-08T12:00"),
+    backup("e", "2024-02-20T12:00"),
+    backup("f", "2024-01-15T12:00"),
+]
+
+
+def test_select_gfs_survivors():
+    limits = {"hourly": 1, "daily": 3, "weekly": 0, "monthly": 3}
+    assert select_gfs_survivors(GFS_BACKUPS, limits) == {
+        "a": ["hourly", "daily", "monthly"],
+        "c": ["daily"],
+        "d": ["daily"],
+        "e": ["monthly"],
+        "f": ["monthly"],
+    }
+
+
+def test_select_gfs_survivors_weekly_keeps_newest_of_each_week():
+    limits = {"hourly": 0, "daily": 0, "weekly": 2, "monthly": 0}
+    # 2024-03-10是星期日，与03-08同属第10周
+    assert select_gfs_survivors(GFS_BACKUPS, limits) == {"a": ["weekly"], "e": ["weekly"]}
+
+
+def test_plan_retention_gfs():
+    config = BackupConfig(retention_policy="gfs", gfs_hourly=1, gfs_daily=3, gfs_weekly=0, gfs_monthly=0)
+    plan = plan_retention(list(reversed(GFS_BACKUPS)), config)
+    assert plan.keep == ["a", "c", "d"]
+    assert plan.delete == ["b", "e", "f"]
+    assert plan.reclaim_bytes == 30
+
+
+def test_plan_retention_count_handles_failed_and_running():
+    backups = [
+        backup("new", "2024-03-10T12:00"),
+        backup("failed_new", "2024-03-10T09:00", BackupStatus.FAILED),
+        backup("mid", "2024-03-10T06:00"),
+        backup("old", "2024-03-09T12:00"),
+        backup("failed_old", "2024-03-09T06:00", BackupStatus.FAILED),
+        backup("running", "2024-03-01T00:00", BackupStatus.RUNNING),
+    ]
+    plan = plan_retention(backups, BackupConfig(max_backups=2))
+    assert plan.keep == ["new", "mid"]
+    assert plan.delete == ["old", "failed_old"]
+
+
+def test_plan_retention_always_keeps_latest():
+    config = BackupConfig(retention_policy="gfs", gfs_hourly=0, gfs_daily=0, gfs_weekly=0, gfs_monthly=0)
+    plan = plan_retention(GFS_BACKUPS, config)
+    assert plan.keep == ["a"]
+    assert plan.reasons == {"a": ["latest"]}
+
+
+def test_plan_retention_without_completed_backups_deletes_nothing():
+    backups = [backup("failed", "2024-03-10T12:00", BackupStatus.FAILED)]
+    assert plan_retention(backups, BackupConfig(max_backups=1)).delete == []
+
+
+def test_expired_backups_keep_gfs_survivors(tmp_path):
+    from app.backup import BackupManager
+    from app.models import DatabaseConfig
+
+    config = BackupConfig(storage_path=str(tmp_path), retention_policy="gfs", gfs_hourly=0, gfs_daily=2,
+                          gfs_weekly=0, gfs_monthly=3, cleanup_keep_days=30)
+    manager = BackupManager(DatabaseConfig(host="localhost", port=5432, database="db", username="u", password="p"),
+                            config)
+    old_day = (datetime.now() - timedelta(days=70)).replace(hour=0, minute=0, second=0, microsecond=0)
+    for backup_id, created_at in [("new", datetime.now() - timedelta(days=1)),
+                                  ("monthly", old_day.replace(hour=12)),
+                                  ("expired", old_day.replace(hour=6))]:
+        manager.save_backup_info(backup(backup_id, created_at.isoformat()))
+    # 每月保留的备份早于cleanup_keep_days，也不能被按天清理删除
+    assert [b.id for b in manager.find_expired_backups()] == ["expired"]
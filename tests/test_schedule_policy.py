@@ -0,0 +1,91 @@
+from datetime import datetime
+
+import pytest
+
+from app.models import BackupConfig
+from app.schedule_policy import (AUTO_JITTER_SECONDS, backup_jitter, blackout_end, cron_trigger,
+                                 crontab_day_of_week, parse_blackout_window, window_end)
+
+
+# 2024-01-01是星期一
+MONDAY = datetime(2024, 1, 1)
+
+
+def test_parse_blackout_window():
+    assert parse_blackout_window("mon-fri 08:00-20:00") == (frozenset(range(5)), 8 * 60, 20 * 60)
+    assert parse_blackout_window("sat,sun 00:00-24:00") == (frozenset({5, 6}), 0, 24 * 60)
+    assert parse_blackout_window("fri-mon 01:00-02:00")[0] == frozenset({4, 5, 6, 0})
+    assert parse_blackout_window("22:00-02:00") == (frozenset(range(7)), 22 * 60, 2 * 60)
+
+
+@pytest.mark.parametrize("spec", ["", "08:00", "08:00-08:00", "mon 08:00-25:00", "08:60-09:00",
+                                  "xyz 08:00-09:00", "mon fri 08:00-09:00"])
+def test_parse_blackout_window_rejects_invalid(spec):
+    with pytest.raises(ValueError, match="无效的时间窗口"):
+        parse_blackout_window(spec)
+
+
+def test_window_end_same_day():
+    window = parse_blackout_window("mon-fri 08:00-20:00")
+    assert window_end(window, MONDAY.replace(hour=9)) == MONDAY.replace(hour=20)
+    assert window_end(window, MONDAY.replace(hour=20)) is None
+    assert window_end(window, datetime(2024, 1, 6, 9)) is None  # 星期六
+
+
+def test_window_end_overnight_belongs_to_start_day():
+    window = parse_blackout_window("fri 22:00-02:00")
+    assert window_end(window, datetime(2024, 1, 5, 23)) == datetime(2024, 1, 6, 2)
+    assert window_end(window, datetime(2024, 1, 6, 1)) == datetime(2024, 1, 6, 2)
+    # 星期一凌晨不属于星期日开始的窗口
+    assert window_end(window, MONDAY.replace(hour=1)) is None
+
+
+def test_blackout_end_skips_adjacent_windows():
+    windows = ["mon 08:00-12:00", "mon 12:00-14:00", "mon 14:30-15:00"]
+    assert blackout_end(windows, MONDAY.replace(hour=9)) == MONDAY.replace(hour=14)
+    assert blackout_end(windows, MONDAY.replace(hour=14, minute=10)) is None
+    assert blackout_end([], MONDAY) is None
+
+
+def test_blackout_end_whole_weekend():
+    windows = ["sat 00:00-24:00", "sun 00:00-24:00"]
+    assert blackout_end(windows, datetime(2024, 1, 6, 10)) == datetime(2024, 1, 8)
+
+
+@pytest.mark.parametrize("field, expected", [
+    ("*", "*"),
+    ("mon-fri", "mon-fri"),
+    ("0", "sun"),
+    ("7", "sun"),
+    ("1-5", "mon,tue,wed,thu,fri"),
+    ("0,6", "sun,sat"),
+    ("*/2", "*/2"),
+    ("1/2", "mon,wed,fri,sun"),
+    ("5-7", "fri,sat,sun"),
+])
+def test_crontab_day_of_week(field, expected):
+    assert crontab_day_of_week(field) == expected
+
+
+def test_crontab_day_of_week_rejects_invalid():
+    with pytest.raises(ValueError):
+        crontab_day_of_week("8")
+
+
+def test_cron_trigger_uses_crontab_weekdays():
+    trigger = cron_trigger("30 2 * * 0")
+    fire = trigger.get_next_fire_time(None, MONDAY.astimezone())
+    assert fire.weekday() == 6 and (fire.hour, fire.minute) == (2, 30)
+
+
+@pytest.mark.parametrize("expr", ["* * * *", "0 0 * * * *"])
+def test_cron_trigger_requires_five_fields(expr):
+    with pytest.raises(ValueError, match="5段"):
+        cron_trigger(expr)
+
+
+def test_backup_jitter():
+    assert backup_jitter(BackupConfig()) == 0
+    assert backup_jitter(BackupConfig(schedule_cron=["0 1 * * *"])) == 0
+    assert backup_jitter(BackupConfig(schedule_cron=["0 1 * * *", "0 13 * * *"])) == AUTO_JITTER_SECONDS
+    assert backup_jitter(BackupConfig(schedule_cron=["0 1 * * *", "0 13 * * *"], schedule_jitter_seconds=0)) == 0
@@ -0,0 +1,27 @@
+import json
+
+from app.models import BackupConfig, DatabaseConfig
+from app.schedule_state import flush_state_writes
+from app.scheduler import BackupScheduler
+
+
+DB_CONFIG = DatabaseConfig(host="localhost", port=5432, database="db", username="u", password="p")
+
+
+def test_state_saved_under_storage_dir_only_on_change(tmp_path, monkeypatch):
+    scheduler = BackupScheduler(DB_CONFIG, BackupConfig(storage_path=str(tmp_path)))
+    writes = []
+    save = scheduler.state_store.save
+    monkeypatch.setattr(scheduler.state_store, "save", lambda key, state: (writes.append(key), save(key, state)))
+
+    scheduler.save_state()
+    scheduler.save_state()
+    scheduler.paused = True
+    scheduler.save_state()
+    flush_state_writes().result()
+
+    assert writes == ["default", "default"]
+    state_file = tmp_path / ".state" / "scheduler_state.json"
+    assert json.loads(state_file.read_text(encoding='utf-8'))["default"]["paused"] is True
+    # 状态目录不会被当作备份信息扫描
+    assert scheduler.backup_manager.get_backup_list() == []
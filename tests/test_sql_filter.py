@@ -0,0 +1,108 @@
+import io
+
+import pytest
+
+from app.sql_filter import batch_lines, filter_sql_lines, iter_lines
+
+
+def run_filter(sql: str, mode: str) -> str:
+    lines = iter_lines(io.BytesIO(sql.encode('utf-8')))
+    return b''.join(filter_sql_lines(lines, mode)).decode('utf-8')
+
+
+@pytest.mark.parametrize("mode", ["cleanup", "incremental"])
+@pytest.mark.parametrize("meta", ["\\connect app", "\\restrict abc123"])
+def test_meta_command_is_single_line_statement(mode, meta):
+    sql = f"{meta}\nSET statement_timeout = 0;\nINSERT INTO public.t VALUES (1);\n"
+    assert run_filter(sql, mode) == f"{meta}\nINSERT INTO public.t VALUES (1);\n"
+
+
+def test_meta_command_does_not_carry_skip_decision():
+    sql = "DROP TABLE IF EXISTS public.t;\n\\connect app\nINSERT INTO public.t VALUES (1);\n"
+    assert run_filter(sql, "cleanup") == "\\connect app\nINSERT INTO public.t VALUES (1);\n"
+
+
+def test_setup_statements_skipped_only_before_data():
+    sql = ("SET client_encoding = 'UTF8';\n"
+           "SELECT pg_catalog.set_config('search_path', '', false);\n"
+           "INSERT INTO public.t VALUES (1);\n"
+           "SET search_path = public;\n")
+    assert run_filter(sql, "cleanup") == "INSERT INTO public.t VALUES (1);\nSET search_path = public;\n"
+
+
+def test_comments_and_blank_lines_dropped():
+    sql = "--\n-- PostgreSQL database dump\n--\n\nINSERT INTO public.t VALUES (1);\n"
+    assert run_filter(sql, "cleanup") == "INSERT INTO public.t VALUES (1);\n"
+
+
+def test_multi_line_statement_follows_first_line():
+    sql = ("CREATE TABLE public.t (\n    id integer NOT NULL\n);\n"
+           "DROP TABLE public.old;\n"
+           "ALTER TABLE ONLY public.t\n    ADD CONSTRAINT t_pkey PRIMARY KEY (id);\n")
+    assert run_filter(sql, "cleanup") == (
+        "CREATE TABLE public.t (\n    id integer NOT NULL\n);\n"
+        "ALTER TABLE ONLY public.t\n    ADD CONSTRAINT t_pkey PRIMARY KEY (id);\n"
+    )
+    assert run_filter(sql, "incremental") == ""
+
+
+def test_dollar_quoted_body_semicolons_do_not_end_statement():
+    function = ("CREATE FUNCTION public.f() RETURNS integer\n"
+                "    LANGUAGE plpgsql\n"
+                "    AS $_$\n"
+                "BEGIN\n"
+                "    DROP TABLE public.x;\n"
+                "    RETURN $$nested;$$::text::integer;\n"
+                "END;\n"
+                "$_$;\n")
+    sql = function + "INSERT INTO public.t VALUES (1);\n"
+    assert run_filter(sql, "cleanup") == sql
+    assert run_filter(sql, "incremental") == "INSERT INTO public.t VALUES (1);\n"
+
+
+def test_copy_block_passed_through_unchanged():
+    sql = ("COPY public.t (id, note) FROM stdin;\n"
+           "1\tDROP TABLE public.t;\n"
+           "2\t-- not a comment\n"
+           "3\t\\connect other\n"
+           "\n"
+           "\\.\n"
+           "DROP TABLE public.t;\n")
+    expected = sql[:-len("DROP TABLE public.t;\n")]
+    assert run_filter(sql, "cleanup") == expected
+    assert run_filter(sql, "incremental") == expected
+
+
+def test_copy_block_with_crlf_terminator():
+    sql = "COPY public.t (id) FROM stdin;\r\n1\r\n\\.\r\nSET x = 1;\r\n"
+    assert run_filter(sql, "incremental") == sql
+
+
+def test_batch_lines_joins_up_to_chunk_size():
+    lines = [b"a\n", b"bb\n", b"ccc\n"]
+    assert list(batch_lines(lines, chunk_size=5)) == [b"a\nbb\n", b"ccc\n"]
+
+
+def test_incremental_keeps_post_data_statements_other_than_table_ddl():
+    sql = ("ALTER SEQUENCE public.t_id_seq OWNED BY public.t.id;\n"
+           "COPY public.t (id) FROM stdin;\n1\n\\.\n"
+           "SELECT pg_catalog.setval('public.t_id_seq', 1, true);\n"
+           "ALTER TABLE ONLY public.t\n    ADD CONSTRAINT t_pkey PRIMARY KEY (id);\n"
+           "CREATE INDEX t_idx ON public.t USING btree (id);\n"
+           "CREATE TRIGGER t_trg AFTER INSERT ON public.t FOR EACH ROW EXECUTE FUNCTION public.f();\n"
+           "COMMENT ON TABLE public.t IS 'x';\n")
+    assert run_filter(sql, "incremental") == (
+        "COPY public.t (id) FROM stdin;\n1\n\\.\n"
+        "SELECT pg_catalog.setval('public.t_id_seq', 1, true);\n"
+        "CREATE TRIGGER t_trg AFTER INSERT ON public.t FOR EACH ROW EXECUTE FUNCTION public.f();\n"
+    )
+
+
+def test_cleanup_keeps_schema_ddl_other_than_drops():
+    sql = ("DROP DATABASE IF EXISTS app;\nCREATE DATABASE app WITH TEMPLATE = template0;\n\\connect app\n"
+           "CREATE SCHEMA extra;\nALTER SEQUENCE public.t_id_seq OWNED BY public.t.id;\n"
+           "CREATE INDEX t_idx ON public.t USING btree (id);\n")
+    assert run_filter(sql, "cleanup") == (
+        "\\connect app\nALTER SEQUENCE public.t_id_seq OWNED BY public.t.id;\n"
+        "CREATE INDEX t_idx ON public.t USING btree (id);\n"
+    )
@@ -0,0 +1,115 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import storage
+from app.storage import LocalStorage, MultipartUploadWriter
+
+
+class FakeS3Client:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.parts = {}
+        self.completed = None
+        self.aborted = False
+        self.put = None
+
+    def create_multipart_upload(self, Bucket, Key):
+        return {"UploadId": "upload-1"}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        with self.lock:
+            self.parts[PartNumber] = Body
+        return {"ETag": f"etag-{PartNumber}"}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        self.completed = MultipartUpload["Parts"]
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.aborted = True
+
+    def put_object(self, Bucket, Key, Body):
+        self.put = Body
+
+
+def fake_storage(part_size: int):
+    return SimpleNamespace(client=FakeS3Client(), bucket="bucket", part_size=part_size, max_concurrency=2,
+                           object_key=lambda key: key)
+
+
+def test_small_object_uses_put_object():
+    s3 = fake_storage(part_size=8)
+    with MultipartUploadWriter(s3, "backup.sql") as writer:
+        writer.write(b"abc")
+    assert s3.client.put == b"abc"
+    assert s3.client.completed is None
+
+
+def test_parts_reassemble_in_order():
+    s3 = fake_storage(part_size=4)
+    data = bytes(range(50))
+    with MultipartUploadWriter(s3, "backup.sql") as writer:
+        for i in range(0, len(data), 3):
+            writer.write(data[i:i + 3])
+    numbers = [part["PartNumber"] for part in s3.client.completed]
+    assert numbers == list(range(1, len(numbers) + 1))
+    assert b"".join(s3.client.parts[n] for n in numbers) == data
+
+
+def test_part_size_doubles_every_step(monkeypatch):
+    monkeypatch.setattr(storage, "PARTS_PER_SIZE_STEP", 2)
+    s3 = fake_storage(part_size=4)
+    with MultipartUploadWriter(s3, "backup.sql") as writer:
+        writer.write(b"x" * (4 * 2 + 8 * 2 + 16))
+    sizes = [len(s3.client.parts[n]) for n in sorted(s3.client.parts)]
+    assert sizes == [4, 4, 8, 8, 16]
+
+
+def test_too_many_parts_fails_fast_and_aborts(monkeypatch):
+    monkeypatch.setattr(storage, "MAX_PARTS", 3)
+    monkeypatch.setattr(storage, "PARTS_PER_SIZE_STEP", 1000)
+    s3 = fake_storage(part_size=4)
+    with pytest.raises(Exception, match="分段"):
+        with MultipartUploadWriter(s3, "backup.sql") as writer:
+            writer.write(b"x" * 16)
+    assert s3.client.aborted
+    assert s3.client.completed is None
+
+
+def test_local_writer_commits_atomically(tmp_path):
+    local = LocalStorage(str(tmp_path))
+    with pytest.raises(RuntimeError):
+        with local.open_writer("a/backup.sql") as writer:
+            writer.write(b"partial")
+            raise RuntimeError("dump failed")
+    assert not local.exists("a/backup.sql")
+    assert not (tmp_path / "a" / "backup.sql.tmp").exists()
+
+    with local.open_writer("a/backup.sql") as writer:
+        writer.write(b"complete")
+    assert local.size("a/backup.sql") == len(b"complete")
+
+
+def test_failed_abort_is_raised_with_original_error(monkeypatch):
+    monkeypatch.setattr(storage, "MAX_PARTS", 3)
+    s3 = fake_storage(part_size=4)
+
+    def fail_abort(Bucket, Key, UploadId):
+        raise ConnectionError("network down")
+
+    s3.client.abort_multipart_upload = fail_abort
+    with pytest.raises(Exception, match="放弃分段上传失败") as excinfo:
+        with MultipartUploadWriter(s3, "backup.sql") as writer:
+            writer.write(b"x" * 16)
+    # 导致放弃上传的原始错误保留在异常链中
+    assert "分段上传的上限" in str(excinfo.value.__cause__.__context__)
+
+
+def test_storage_backend_requires_all_methods():
+    class Incomplete(storage.StorageBackend):
+        def exists(self, key):
+            return False
+
+    with pytest.raises(TypeError):
+        Incomplete()
@@ -0,0 +1,37 @@
+import gzip
+import lzma
+from datetime import datetime
+
+from app.backup import BackupManager
+from app.config_manager import ConfigManager
+from app.models import BackupConfig, BackupInfo, BackupStatus, Config, DatabaseConfig
+from app.tiering import move_to_cold
+
+
+DB_CONFIG = DatabaseConfig(host="localhost", port=5432, database="db", username="u", password="p")
+
+
+def test_move_to_cold_with_relative_paths(tmp_path, monkeypatch):
+    # 服务从项目目录以外的目录启动时，相对路径按服务的工作目录解析
+    monkeypatch.chdir(tmp_path)
+    manager = BackupManager(DB_CONFIG, BackupConfig(storage_path="hot", cold_storage_path="cold", cold_codec="xz"))
+    backup_info = BackupInfo(id="b1", filename="b1.sql.gz", created_at=datetime(2024, 1, 1), size=0,
+                             status=BackupStatus.COMPLETED, codec="gzip")
+    with gzip.open(tmp_path / "hot" / "b1.sql.gz", 'wb') as f:
+        f.write(b"SELECT 1;\n")
+    manager.save_backup_info(backup_info)
+
+    cold_info = move_to_cold(manager, backup_info)
+    assert cold_info.filename == "b1.sql.xz"
+    assert lzma.decompress((tmp_path / "cold" / "b1.sql.xz").read_bytes()) == b"SELECT 1;\n"
+    assert not (tmp_path / "hot" / "b1.sql.gz").exists()
+
+
+def test_cold_compression_level_checked_per_codec(tmp_path):
+    manager = ConfigManager(str(tmp_path / "config.json"))
+    config = Config(database=DB_CONFIG, backup=BackupConfig(storage_path=str(tmp_path), cold_codec="bz2",
+                                                            cold_compression_level=0), app=manager.config.app)
+    valid, message = manager.validate_config(config)
+    assert not valid and "1-9" in message
+    config.backup.cold_codec = "xz"
+    assert manager.validate_config(config)[0]